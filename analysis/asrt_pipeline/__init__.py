@@ -0,0 +1,6 @@
+"""Python tools for analysing ASRT session files recorded with asrt.py."""
+
+from .triplets import relabel_triplets, relabel_session_file, find_label_mismatches, parse_sequences
+from .columnar import convert_csv, read_columns, write_columns, load_cohort, concat_cohort
+from .summary import load_sessions, preprocess, summarize, write_tables
+from .cache import PartialCache, combine_partials
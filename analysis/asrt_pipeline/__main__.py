@@ -0,0 +1,14 @@
+import sys
+from . import columnar, summary, triplets
+
+COMMANDS = {
+    'relabel': triplets.main,
+    'convert': columnar.main,
+    'summary': summary.main,
+}
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(f"Usage: python -m asrt_pipeline {{{','.join(COMMANDS)}}} [options]")
+        sys.exit(2)
+    sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from . import summary
+
+CACHE_VERSION = 1
+INDEX_FILENAME = 'index.json'
+
+# Keys of one cell of the partial aggregates
+CELL_KEYS = ['participant', 'block_number', 'epoch', 'triplet_type', 'correct_response']
+
+
+def file_sha256(filename, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def aggregate_cells(rows):
+    """
+    Sums RT powers per participant x block x epoch x triplet type x correctness.
+
+    Args:
+        rows (dict): Columns of the rows that passed all filters.
+
+    Returns:
+        dict: The cell keys plus 'n', 'rt_sum', 'rt_sum_sq' and 'rt_sum_cube' per cell.
+    """
+    if not len(rows['rt_cumulative_s']):
+        return _empty_cells()
+    keys, codes = summary._factorize([rows[k] for k in CELL_KEYS])
+    rt = rows['rt_cumulative_s']
+    n_cells = len(keys[0])
+    cells = dict(zip(CELL_KEYS, keys))
+    cells['n'] = np.bincount(codes, minlength=n_cells)
+    cells['rt_sum'] = np.bincount(codes, weights=rt, minlength=n_cells)
+    cells['rt_sum_sq'] = np.bincount(codes, weights=rt ** 2, minlength=n_cells)
+    cells['rt_sum_cube'] = np.bincount(codes, weights=rt ** 3, minlength=n_cells)
+    return cells
+
+
+def _empty_cells():
+    cells = {'participant': np.zeros(0, dtype='U1'), 'block_number': np.zeros(0, dtype=np.int16), 'epoch': np.zeros(0, dtype=np.int16),
+             'triplet_type': np.zeros(0, dtype='U1'), 'correct_response': np.zeros(0)}
+    cells.update({name: np.zeros(0) for name in ('n', 'rt_sum', 'rt_sum_sq', 'rt_sum_cube')})
+    return cells
+
+
+def _filter_rows(rows):
+    """Applies the per-participant MAD and 0.1-1 s filters to rows that passed the first two steps."""
+    rt = rows['rt_cumulative_s']
+    participant_codes = np.unique(rows['participant'], return_inverse=True)[1].ravel()
+    n_participants = participant_codes.max() + 1 if len(rt) else 0
+    median, mad = summary._group_median_mad(participant_codes, rt, n_participants)
+    lower = median[participant_codes] - summary.MAD_CUTOFF * mad[participant_codes]
+    upper = median[participant_codes] + summary.MAD_CUTOFF * mad[participant_codes]
+    keep = (rt > lower) & (rt < upper) & (rt > summary.RT_MIN_S) & (rt < summary.RT_MAX_S)
+    return {name: values[keep] for name, values in rows.items()}
+
+
+def compute_partials(filename):
+    """
+    Computes the cacheable partial aggregates of one session file.
+
+    Stores the rows that enter the MAD filter (first responses, no X/R/T, RT
+    present) as the per-participant median/MAD inputs, and the cell sums of the
+    rows that pass the filters with this file's own median/MAD. The cell sums are
+    exact for participants who appear in only this file; others are re-filtered
+    from the stored rows when the cohort is combined.
+    """
+    data = summary.load_session(filename)
+    rt = data['rt_cumulative_s'].astype(float)
+    first_responses = (data['is_first_response'] == 1) & ~np.isin(data['triplet_type'], ['X', 'R', 'T'])
+    eligible = first_responses & ~np.isnan(rt)
+
+    rows = {k: data[k][eligible] for k in ('participant', 'block_number', 'epoch', 'triplet_type')}
+    rows['correct_response'] = data['correct_response'][eligible].astype(float)
+    rows['rt_cumulative_s'] = rt[eligible]
+    eligible_rt = rows['rt_cumulative_s']
+
+    partials = {f'row_{name}': values for name, values in rows.items()}
+    partials.update({f'cell_{name}': values for name, values in aggregate_cells(_filter_rows(rows)).items()})
+    partials['counts'] = np.array([len(rt), int(first_responses.sum())])
+    # Power sums of the unfiltered RTs (for the skewness before outlier removal)
+    partials['eligible_rt_sums'] = np.array([len(eligible_rt), eligible_rt.sum(), (eligible_rt ** 2).sum(), (eligible_rt ** 3).sum()])
+    return partials
+
+
+class PartialCache:
+    """
+    Per-file partial aggregates stored in a folder: one .npz per distinct file
+    content (named by its SHA-256) and an index.json mapping each session file to
+    its size, mtime and hash. A file whose size and mtime are unchanged is not
+    read again; a changed mtime with identical content only updates the index.
+    Entries of files that changed or disappeared are evicted by prune().
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = {}
+        index_path = os.path.join(cache_dir, INDEX_FILENAME)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, encoding='utf-8') as f:
+                    stored = json.load(f)
+                if stored.get('version') == CACHE_VERSION:
+                    self.index = stored['files']
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring unreadable cache index {index_path}: {e}")
+
+    def get_partials(self, files, workers=None):
+        """
+        Returns the partial aggregates of every file (in order), computing only
+        the missing ones, in a process pool.
+        """
+        hashes = [self._content_hash(f) for f in files]
+        missing = {}
+        for filename, content_hash in zip(files, hashes):
+            if content_hash not in missing and not os.path.exists(self._partial_path(content_hash)):
+                missing[content_hash] = filename
+        self.misses = sum(1 for h in hashes if h in missing)
+        self.hits = len(files) - self.misses
+
+        if missing:
+            to_compute = list(missing.values())
+            if workers == 1 or len(to_compute) < 2:
+                self._store_all(missing, map(compute_partials, to_compute))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    self._store_all(missing, pool.map(compute_partials, to_compute))
+
+        partials = []
+        for h in hashes:
+            with np.load(self._partial_path(h)) as stored:
+                partials.append({name: stored[name] for name in stored.files})
+        self.prune()
+        return partials
+
+    def prune(self):
+        """Drops index entries of deleted files and removes .npz files no index entry refers to."""
+        self.index = {f: entry for f, entry in self.index.items() if os.path.exists(f)}
+        referenced = {entry['sha256'] for entry in self.index.values()}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz') and name[:-len('.npz')] not in referenced:
+                os.remove(os.path.join(self.cache_dir, name))
+        self._save_index()
+
+    def _content_hash(self, filename):
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        entry = self.index.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+        self.index[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_sha256(path)}
+        return self.index[path]['sha256']
+
+    def _partial_path(self, content_hash):
+        return os.path.join(self.cache_dir, f'{content_hash}.npz')
+
+    def _store_all(self, missing, computed):
+        for content_hash, partials in zip(missing, computed):
+            tmp_path = self._partial_path(content_hash) + '.tmp.npz'
+            np.savez(tmp_path, **partials)
+            os.replace(tmp_path, self._partial_path(content_hash))
+
+    def _save_index(self):
+        index_path = os.path.join(self.cache_dir, INDEX_FILENAME)
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': self.index}, f)
+        os.replace(index_path + '.tmp', index_path)
+
+
+def combine_partials(partials):
+    """
+    Builds the summary tables of summary.summarize() from per-file partials.
+
+    Participants found in a single file use that file's cached cell sums;
+    participants spread over several files are filtered again from their stored
+    rows, since their median/MAD depend on all of their files.
+
+    Returns:
+        dict: Table name -> column dict (same tables as summary.summarize()).
+    """
+    file_participants = [np.unique(p['row_participant']) for p in partials]
+    all_participants, file_counts = np.unique(np.concatenate(file_participants), return_counts=True) if partials else (np.zeros(0, dtype='U1'), np.zeros(0))
+    shared = all_participants[file_counts > 1]
+
+    cell_parts = []
+    shared_rows = []
+    for p in partials:
+        own_cells = ~np.isin(p['cell_participant'], shared)
+        cell_parts.append({k: p[f'cell_{k}'][own_cells] for k in CELL_KEYS + ['n', 'rt_sum', 'rt_sum_sq', 'rt_sum_cube']})
+        shared_row = np.isin(p['row_participant'], shared)
+        if shared_row.any():
+            shared_rows.append({k: p[f'row_{k}'][shared_row] for k in CELL_KEYS + ['rt_cumulative_s']})
+    if shared_rows:
+        merged = {k: np.concatenate([r[k] for r in shared_rows]) for k in shared_rows[0]}
+        cell_parts.append(aggregate_cells(_filter_rows(merged)))
+    cells = {k: np.concatenate([c[k] for c in cell_parts]) for k in cell_parts[0]} if cell_parts else _empty_cells()
+
+    correct = cells['correct_response'] == 1
+    rt_cells = {k: v[correct] for k, v in cells.items()}
+    # For accuracy the summed value is correct_response (0/1), so its sum and sum of squares are the number correct
+    acc_cells = dict(cells, rt_sum=cells['n'] * cells['correct_response'], rt_sum_sq=cells['n'] * cells['correct_response'])
+
+    tables = {}
+    for period in ('block_number', 'epoch'):
+        suffix = 'block' if period == 'block_number' else 'epoch'
+        tables[f'rt_by_{suffix}'] = _summary_from_sums(rt_cells, ['triplet_type', period])
+        tables[f'acc_by_{suffix}'] = _summary_from_sums(acc_cells, ['triplet_type', period])
+        tables[f'rt_learning_scores_by_{suffix}'] = _learning_scores_from_sums(rt_cells, period, 'L_minus_H')
+        tables[f'acc_learning_scores_by_{suffix}'] = _learning_scores_from_sums(acc_cells, period, 'H_minus_L')
+        tables[f'rt_learning_by_{suffix}'] = summary.learning_summary(tables[f'rt_learning_scores_by_{suffix}'], period)
+        tables[f'acc_learning_by_{suffix}'] = summary.learning_summary(tables[f'acc_learning_scores_by_{suffix}'], period)
+
+    counts = np.sum([p['counts'] for p in partials], axis=0)
+    eligible_sums = np.sum([p['eligible_rt_sums'] for p in partials], axis=0)
+    rt_sums = np.array([rt_cells['n'].sum(), rt_cells['rt_sum'].sum(), rt_cells['rt_sum_sq'].sum(), rt_cells['rt_sum_cube'].sum()])
+    tables['filtering'] = {
+        'step': np.array(['loaded', 'first responses, no X/R/T', 'after RT filters (accuracy data)', 'correct responses (RT data)']),
+        'rows': np.array([int(counts[0]), int(counts[1]), int(cells['n'].sum()), int(rt_cells['n'].sum())]),
+        'rt_skewness': np.array([np.nan, _skewness_from_sums(eligible_sums), np.nan, _skewness_from_sums(rt_sums)]),
+    }
+    return tables
+
+
+def _summary_from_sums(cells, keys):
+    (group_keys, n, total, total_sq) = _sum_cells(cells, keys)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / n
+        variance = np.maximum(total_sq - total * mean, 0) / (n - 1)
+        se = np.sqrt(variance) / np.sqrt(n)
+    se[n < 2] = np.nan
+    table = dict(zip(keys, group_keys))
+    table.update({'mean': mean, 'se': se, 'n': n.astype(np.int64)})
+    return table
+
+
+def _learning_scores_from_sums(cells, period, direction):
+    (participant, period_values, triplet), n, total, _ = _sum_cells(cells, ['participant', period, 'triplet_type'])
+    mean = total / n
+    (out_participant, out_period), cell_codes = summary._factorize([participant, period_values])
+    mean_h = np.full(len(out_participant), np.nan)
+    mean_l = np.full(len(out_participant), np.nan)
+    mean_h[cell_codes[triplet == 'H']] = mean[triplet == 'H']
+    mean_l[cell_codes[triplet == 'L']] = mean[triplet == 'L']
+    score = mean_l - mean_h if direction == 'L_minus_H' else mean_h - mean_l
+    return {'participant': out_participant, period: out_period, 'mean_H': mean_h, 'mean_L': mean_l, 'learning_score': score}
+
+
+def _sum_cells(cells, keys):
+    group_keys, codes = summary._factorize([cells[k] for k in keys])
+    n_groups = len(group_keys[0])
+    n = np.bincount(codes, weights=cells['n'], minlength=n_groups)
+    total = np.bincount(codes, weights=cells['rt_sum'], minlength=n_groups)
+    total_sq = np.bincount(codes, weights=cells['rt_sum_sq'], minlength=n_groups)
+    return group_keys, n, total, total_sq
+
+
+def _skewness_from_sums(sums):
+    n, s1, s2, s3 = sums
+    if not n:
+        return np.nan
+    mean = s1 / n
+    m2 = s2 / n - mean ** 2
+    m3 = s3 / n - 3 * mean * s2 / n + 2 * mean ** 3
+    return m3 / m2 ** 1.5
@@ -0,0 +1,300 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import tempfile
+import numpy as np
+
+# File layout: MAGIC, uint32 header length (little endian), JSON header padded to a
+# COLUMN_ALIGNMENT boundary, then the columns as raw little-endian arrays, each
+# starting at a COLUMN_ALIGNMENT boundary. Column offsets in the header are
+# relative to the end of the header.
+MAGIC = b'ASRTCOL\x00'
+SCHEMA_VERSION = 1
+FILE_EXTENSION = '.acol'
+COLUMN_ALIGNMENT = 64
+
+# Storage dtype of the known session columns. 'bool' columns are parsed from
+# True/False, float columns store empty and 'NA' cells as NaN, 'sequence' is
+# stored as an (n, sequence length) int8 array, 'str' columns as category codes.
+# Unknown columns are inferred.
+COLUMN_TYPES = {
+    'participant': 'str',
+    'session': 'str',
+    'block_number': '<i2',
+    'trial_number': '<i4',
+    'trial_in_block_num': '<i2',
+    'trial_type': 'str',
+    'triplet_type': 'str',
+    'probability_type': 'str',
+    'sequence_used': 'sequence',
+    'stimulus_position_num': 'i1',
+    'rt_non_cumulative_s': '<f8',
+    'rt_cumulative_s': '<f8',
+    'correct_key_pressed': 'str',
+    'response_key_pressed': 'str',
+    'correct_response': 'bool',
+    'is_nogo': 'bool',
+    'is_practice': 'bool',
+    'epoch': '<i2',
+    'is_first_response': 'i1',
+    'mind_wandering_rating_1': '<f4',
+    'mind_wandering_rating_2': '<f4',
+    'mind_wandering_rating_3': '<f4',
+    'mind_wandering_rating_4': '<f4',
+}
+
+MISSING_VALUES = ('', 'NA', 'None', 'nan', 'NaN')
+
+
+def columnar_filename(csv_filename):
+    """Returns the name of the binary file that belongs to a session CSV."""
+    return os.path.splitext(csv_filename)[0] + FILE_EXTENSION
+
+
+def _to_float(values):
+    return np.array([float(v) if v not in MISSING_VALUES else np.nan for v in values])
+
+
+def _infer_column(values):
+    try:
+        return np.array([int(v) for v in values], dtype=np.int64)
+    except ValueError:
+        pass
+    try:
+        return _to_float(values)
+    except ValueError:
+        return np.asarray(values, dtype=str)
+
+
+def typed_column(name, values):
+    """
+    Converts the text cells of one CSV column into a NumPy array of its storage type.
+
+    Args:
+        name (str): Column name; looked up in COLUMN_TYPES.
+        values (sequence of str): The cells of the column, in row order.
+
+    Returns:
+        numpy.ndarray: The typed column.
+    """
+    kind = COLUMN_TYPES.get(name)
+    if kind is None:
+        return _infer_column(values)
+    if kind == 'str':
+        return np.asarray(values, dtype=str) if len(values) else np.zeros(0, dtype='U1')
+    if kind == 'bool':
+        return np.array([v.strip().lower() in ('true', '1') for v in values], dtype=bool)
+    if kind == 'sequence':
+        if not len(values):
+            return np.empty((0, 4), dtype=np.int8)
+        # Parse each distinct sequence string only once
+        unique_seqs, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        table = np.array([[int(c) for c in s if c.isdigit()] for s in unique_seqs], dtype=np.int8)
+        return table.reshape(len(unique_seqs), -1)[inverse.ravel()]
+    dtype = np.dtype(kind)
+    if dtype.kind == 'f':
+        return _to_float(values).astype(dtype)
+    return np.array([int(v) for v in values], dtype=dtype)
+
+
+def write_columns(filename, columns, fieldnames=None):
+    """
+    Writes typed columns to a binary columnar file.
+
+    Args:
+        filename (str): Output path.
+        columns (dict): Column name -> NumPy array; all arrays must have the same length.
+        fieldnames (list, optional): Column order of the original CSV (defaults to the dict order).
+    """
+    fieldnames = list(fieldnames or columns)
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+
+    entries = []
+    arrays = []
+    for name in fieldnames:
+        array = np.ascontiguousarray(columns[name])
+        if len(array) != n_rows:
+            raise ValueError(f"Column '{name}' has {len(array)} rows, expected {n_rows}.")
+        entry = {'name': name}
+        if array.dtype.kind == 'U':
+            # Text columns hold a handful of distinct values: store codes plus the categories
+            categories, codes = np.unique(array, return_inverse=True)
+            array = codes.ravel().astype('<u1' if len(categories) <= 256 else '<u4')
+            entry['categories'] = categories.tolist()
+        elif array.dtype.byteorder == '>' or (array.dtype.byteorder == '=' and not np.little_endian):
+            array = array.astype(array.dtype.newbyteorder('<'))
+        entry.update({'dtype': array.dtype.str, 'shape': list(array.shape)})
+        entries.append(entry)
+        arrays.append(array)
+
+    # Column offsets are relative to the start of the data section, which
+    # follows the header (padded with spaces to the alignment boundary)
+    offset = 0
+    for entry, array in zip(entries, arrays):
+        entry['offset'] = offset
+        offset = _align(offset + array.nbytes)
+    header = {'schema_version': SCHEMA_VERSION, 'n_rows': n_rows, 'fieldnames': fieldnames, 'columns': entries}
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(len(MAGIC) + 4 + len(header_bytes))
+    header_bytes = header_bytes.ljust(data_start - len(MAGIC) - 4, b' ')
+
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint32(len(header_bytes)).astype('<u4').tobytes())
+        f.write(header_bytes)
+        for entry, array in zip(entries, arrays):
+            f.seek(data_start + entry['offset'])
+            f.write(array.tobytes())
+    os.replace(tmp_filename, filename)
+
+
+def _align(offset):
+    return -(-offset // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
+
+
+def read_header(filename):
+    """Reads and validates the JSON header of a columnar file; 'data_start' is added to it."""
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} is not an ASRT columnar file.")
+        header_length = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    if header.get('schema_version') != SCHEMA_VERSION:
+        raise ValueError(f"{filename} has schema version {header.get('schema_version')}, expected {SCHEMA_VERSION}.")
+    header['data_start'] = len(MAGIC) + 4 + header_length
+    return header
+
+
+def read_columns(filename, columns=None):
+    """
+    Opens a columnar file as memory-mapped, read-only NumPy arrays (no parsing, no copy).
+    Text columns are stored as category codes and are decoded into small new arrays.
+
+    Args:
+        filename (str): Path of the .acol file.
+        columns (list, optional): Names of the columns to return (default: all).
+
+    Returns:
+        dict: Column name -> read-only array, in the original CSV column order.
+    """
+    header = read_header(filename)
+    wanted = header['fieldnames'] if columns is None else columns
+    missing = [c for c in wanted if c not in header['fieldnames']]
+    if missing:
+        raise KeyError(f"{filename} has no column(s): {', '.join(missing)}")
+
+    raw = np.memmap(filename, dtype=np.uint8, mode='r')
+    entries = {entry['name']: entry for entry in header['columns']}
+    data = {}
+    for name in wanted:
+        entry = entries[name]
+        dtype = np.dtype(entry['dtype'])
+        shape = tuple(entry['shape'])
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        start = header['data_start'] + entry['offset']
+        values = raw[start:start + nbytes].view(dtype).reshape(shape)
+        if 'categories' in entry:
+            values = np.asarray(entry['categories'], dtype=str)[values]
+        data[name] = values
+    return data
+
+
+def convert_csv(csv_filename, output_filename=None):
+    """
+    Converts a session CSV into the columnar format.
+
+    Returns:
+        str: Path of the written .acol file.
+    """
+    output_filename = output_filename or columnar_filename(csv_filename)
+    with open(csv_filename, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        fieldnames = next(reader)
+        cells = list(zip(*reader)) or [()] * len(fieldnames)
+    columns = {name: typed_column(name, list(values)) for name, values in zip(fieldnames, cells)}
+    write_columns(output_filename, columns, fieldnames)
+    return output_filename
+
+
+def load_cohort(paths, columns=None):
+    """
+    Memory-maps many session files.
+
+    Args:
+        paths (list): .acol files or glob patterns.
+        columns (list, optional): Columns to map from each file.
+
+    Returns:
+        dict: File name -> column dict (see read_columns).
+    """
+    files = sorted({f for p in paths for f in (glob.glob(p) or [p])})
+    return {filename: read_columns(filename, columns) for filename in files}
+
+
+def concat_cohort(cohort, columns):
+    """Concatenates the given columns over all sessions of a cohort (copies only these columns)."""
+    return {name: np.concatenate([session[name] for session in cohort.values()]) for name in columns}
+
+
+def main(argv=None):
+    """Command-line entry point: converts session CSVs to .acol files next to them."""
+    parser = argparse.ArgumentParser(prog='python -m asrt_pipeline convert', description="Convert ASRT session CSVs to the binary columnar format.")
+    parser.add_argument('paths', nargs='+', help="Session CSV files or glob patterns (e.g. sample_data/*.csv)")
+    parser.add_argument('--check', action='store_true', help="Read every converted file back and compare it with the CSV")
+    args = parser.parse_args(argv)
+
+    files = sorted({f for p in args.paths for f in (glob.glob(p) or [p])})
+    failed = 0
+    for filename in files:
+        try:
+            output_filename = convert_csv(filename)
+        except (OSError, ValueError) as e:
+            failed += 1
+            print(f"{filename}: conversion failed: {e}")
+            continue
+        message = f"{filename} -> {output_filename} ({os.path.getsize(filename)} -> {os.path.getsize(output_filename)} bytes)"
+        if args.check:
+            problems = _compare_with_csv(filename, output_filename) + _check_zero_rows(filename)
+            failed += bool(problems)
+            message += f", {'differs in ' + ', '.join(problems) if problems else 'verified'}"
+        print(message)
+    print(f"Converted {len(files) - failed} of {len(files)} files.")
+    return 1 if failed else 0
+
+
+def _check_zero_rows(csv_filename):
+    # A session quit before its first response has a header only: convert such a file and read it back
+    with open(csv_filename, newline='', encoding='utf-8-sig') as f:
+        fieldnames = next(csv.reader(f))
+    with tempfile.TemporaryDirectory() as folder:
+        empty_csv = os.path.join(folder, 'empty.csv')
+        with open(empty_csv, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(fieldnames)
+        try:
+            stored = read_columns(convert_csv(empty_csv))
+        except (OSError, ValueError):
+            return ['zero-row round trip']
+        if list(stored) != fieldnames or any(len(values) for values in stored.values()):
+            return ['zero-row round trip']
+    return []
+
+
+def _compare_with_csv(csv_filename, columnar_file):
+    with open(csv_filename, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        fieldnames = next(reader)
+        cells = list(zip(*reader)) or [()] * len(fieldnames)
+    stored = read_columns(columnar_file)
+    problems = []
+    for name, values in zip(fieldnames, cells):
+        expected = typed_column(name, list(values))
+        if expected.dtype.kind == 'f':
+            same = np.allclose(expected, stored[name], equal_nan=True)
+        else:
+            same = np.array_equal(expected, stored[name])
+        if not same:
+            problems.append(name)
+    return problems
@@ -0,0 +1,263 @@
+import argparse
+import csv
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from . import columnar
+
+# Columns used by the summary pipeline
+SUMMARY_COLUMNS = ['participant', 'block_number', 'epoch', 'triplet_type', 'rt_cumulative_s', 'correct_response', 'is_first_response']
+
+# Scale factor that makes the MAD a consistent estimator of the SD (R's mad() default)
+MAD_CONSTANT = 1.4826
+MAD_CUTOFF = 3
+RT_MIN_S = 0.1
+RT_MAX_S = 1.0
+
+
+def load_session(filename):
+    """
+    Reads the summary columns of one session file (CSV or .acol) into typed NumPy arrays.
+    Runs in the worker processes of load_sessions().
+    """
+    if filename.endswith(columnar.FILE_EXTENSION):
+        return {name: np.array(values) for name, values in columnar.read_columns(filename, SUMMARY_COLUMNS).items()}
+
+    with open(filename, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        cells = list(zip(*reader)) or [()] * len(header)
+    missing = [c for c in SUMMARY_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"{filename} is missing required columns: {', '.join(missing)}")
+    return {name: columnar.typed_column(name, list(cells[header.index(name)])) for name in SUMMARY_COLUMNS}
+
+
+def load_sessions(files, workers=None):
+    """
+    Parses session files in parallel and concatenates them, in file order.
+
+    Args:
+        files (list): Session files (CSV or .acol).
+        workers (int, optional): Number of processes (default: CPU count). 1 parses in this process.
+
+    Returns:
+        dict: Column name -> array over all sessions.
+    """
+    if workers == 1 or len(files) < 2:
+        sessions = [load_session(f) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            sessions = list(pool.map(load_session, files, chunksize=max(1, len(files) // (4 * (workers or os.cpu_count() or 1)))))
+    if not sessions:
+        raise ValueError("No session files to load.")
+    return {name: np.concatenate([s[name] for s in sessions]) for name in SUMMARY_COLUMNS}
+
+
+def preprocess(data):
+    """
+    Applies the filtering steps of asrt_analysis.ipynb.
+
+    1. Keep first responses (is_first_response == 1).
+    2. Drop X, R and T triplets.
+    3. Per participant, keep RTs strictly within median +/- 3 * MAD.
+    4. Keep RTs strictly between 0.1 s and 1 s.
+    Rows with a missing RT (unanswered no-go trials) are dropped by step 3, as in R.
+
+    Args:
+        data (dict): Columns as returned by load_sessions().
+
+    Returns:
+        tuple: (asrt, asrt_acc) column dicts. asrt_acc holds all rows left after
+            step 4 (for accuracy), asrt only the correct responses (for RT).
+    """
+    rt = data['rt_cumulative_s'].astype(float)
+    keep = (data['is_first_response'] == 1) & ~np.isin(data['triplet_type'], ['X', 'R', 'T'])
+
+    participant_codes = np.unique(data['participant'], return_inverse=True)[1].ravel()
+    valid = keep & ~np.isnan(rt)
+    median, mad = _group_median_mad(participant_codes[valid], rt[valid], participant_codes.max() + 1 if len(rt) else 0)
+    lower = median[participant_codes] - MAD_CUTOFF * mad[participant_codes]
+    upper = median[participant_codes] + MAD_CUTOFF * mad[participant_codes]
+    with np.errstate(invalid='ignore'):
+        keep &= (rt > lower) & (rt < upper) & (rt > RT_MIN_S) & (rt < RT_MAX_S)
+
+    columns = dict(data, rt_cumulative_s=rt, correct_response=data['correct_response'].astype(float))
+    asrt_acc = {name: values[keep] for name, values in columns.items()}
+    correct = asrt_acc['correct_response'] == 1
+    asrt = {name: values[correct] for name, values in asrt_acc.items()}
+    return asrt, asrt_acc
+
+
+def _group_medians(codes, values, n_groups):
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(n_groups, np.nan)
+    has_rows = counts > 0
+    lo = starts[has_rows] + (counts[has_rows] - 1) // 2
+    hi = starts[has_rows] + counts[has_rows] // 2
+    medians[has_rows] = (sorted_values[lo] + sorted_values[hi]) / 2
+    return medians
+
+
+def _group_median_mad(codes, values, n_groups):
+    medians = _group_medians(codes, values, n_groups)
+    mads = MAD_CONSTANT * _group_medians(codes, np.abs(values - medians[codes]), n_groups)
+    return medians, mads
+
+
+def group_mean_se(keys, values):
+    """
+    Mean and standard error of values per combination of keys.
+
+    Like dplyr's summarise(mean(x, na.rm = TRUE), sd(x, na.rm = TRUE) / sqrt(n())):
+    NaN values are left out of the mean and SD, but n counts every row of the group.
+
+    Args:
+        keys (list): Arrays of equal length to group by.
+        values (array-like): Values to summarise.
+
+    Returns:
+        tuple: (list of key arrays of the groups, sorted; mean; se; n)
+    """
+    values = np.asarray(values, dtype=float)
+    group_keys, codes = _factorize(keys)
+    n_groups = len(group_keys[0])
+    valid = ~np.isnan(values)
+    n = np.bincount(codes, minlength=n_groups)
+    n_valid = np.bincount(codes[valid], minlength=n_groups)
+    sums = np.bincount(codes[valid], weights=values[valid], minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / n_valid
+        squares = np.bincount(codes[valid], weights=(values[valid] - mean[codes[valid]]) ** 2, minlength=n_groups)
+        sd = np.sqrt(squares / (n_valid - 1))
+        sd[n_valid < 2] = np.nan
+        se = sd / np.sqrt(n)
+    return group_keys, mean, se, n
+
+
+def _factorize(keys):
+    key_codes = []
+    key_values = []
+    for key in keys:
+        uniques, inverse = np.unique(key, return_inverse=True)
+        key_values.append(uniques)
+        key_codes.append(inverse.ravel())
+    combined = np.zeros(len(keys[0]), dtype=np.int64)
+    for uniques, inverse in zip(key_values, key_codes):
+        combined = combined * len(uniques) + inverse
+    group_ids, codes = np.unique(combined, return_inverse=True)
+    group_keys = []
+    for uniques in reversed(key_values):
+        group_keys.append(uniques[group_ids % len(uniques)])
+        group_ids = group_ids // len(uniques)
+    return group_keys[::-1], codes.ravel()
+
+
+def triplet_summary(data, value, period):
+    """Mean and SE of value per triplet type and block/epoch (the notebook's asrt_summary tables)."""
+    (triplet, period_values), mean, se, n = group_mean_se([data['triplet_type'], data[period]], data[value])
+    return {'triplet_type': triplet, period: period_values, 'mean': mean, 'se': se, 'n': n}
+
+
+def learning_scores(data, value, period):
+    """
+    Learning scores per participant and block/epoch: mean L - mean H for RT and
+    mean H - mean L for accuracy (the notebook's learning_scores tables). A missing
+    triplet type gives a NaN score.
+    """
+    (participant, period_values, triplet), mean, _, _ = group_mean_se([data['participant'], data[period], data['triplet_type']], data[value])
+    (out_participant, out_period), cell_codes = _factorize([participant, period_values])
+    mean_h = np.full(len(out_participant), np.nan)
+    mean_l = np.full(len(out_participant), np.nan)
+    mean_h[cell_codes[triplet == 'H']] = mean[triplet == 'H']
+    mean_l[cell_codes[triplet == 'L']] = mean[triplet == 'L']
+    score = mean_l - mean_h if value == 'rt_cumulative_s' else mean_h - mean_l
+    return {'participant': out_participant, period: out_period, 'mean_H': mean_h, 'mean_L': mean_l, 'learning_score': score}
+
+
+def learning_summary(scores, period):
+    """Mean and SE of the learning scores per block/epoch (the notebook's learning_summary tables)."""
+    (period_values,), mean, se, n = group_mean_se([scores[period]], scores['learning_score'])
+    return {period: period_values, 'mean_learning': mean, 'se_learning': se, 'n': n}
+
+
+def skewness(values):
+    """Sample skewness as computed by R's moments::skewness (NaNs removed)."""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    deviations = values - values.mean()
+    return np.mean(deviations ** 3) / np.mean(deviations ** 2) ** 1.5
+
+
+def summarize(data):
+    """
+    Runs the whole pipeline of asrt_analysis.ipynb on loaded session data.
+
+    Returns:
+        dict: Table name -> column dict, plus 'filtering' with row counts and RT skewness.
+    """
+    asrt, asrt_acc = preprocess(data)
+    tables = {}
+    for period in ('block_number', 'epoch'):
+        suffix = 'block' if period == 'block_number' else 'epoch'
+        tables[f'rt_by_{suffix}'] = triplet_summary(asrt, 'rt_cumulative_s', period)
+        tables[f'acc_by_{suffix}'] = triplet_summary(asrt_acc, 'correct_response', period)
+        tables[f'rt_learning_scores_by_{suffix}'] = learning_scores(asrt, 'rt_cumulative_s', period)
+        tables[f'acc_learning_scores_by_{suffix}'] = learning_scores(asrt_acc, 'correct_response', period)
+        tables[f'rt_learning_by_{suffix}'] = learning_summary(tables[f'rt_learning_scores_by_{suffix}'], period)
+        tables[f'acc_learning_by_{suffix}'] = learning_summary(tables[f'acc_learning_scores_by_{suffix}'], period)
+
+    first_responses = (data['is_first_response'] == 1) & ~np.isin(data['triplet_type'], ['X', 'R', 'T'])
+    tables['filtering'] = {
+        'step': np.array(['loaded', 'first responses, no X/R/T', 'after RT filters (accuracy data)', 'correct responses (RT data)']),
+        'rows': np.array([len(data['triplet_type']), int(first_responses.sum()), len(asrt_acc['triplet_type']), len(asrt['triplet_type'])]),
+        'rt_skewness': np.array([np.nan, skewness(data['rt_cumulative_s'][first_responses]), np.nan, skewness(asrt['rt_cumulative_s'])]),
+    }
+    return tables
+
+
+def write_tables(tables, output_dir):
+    """Writes every summary table to <output_dir>/<name>.csv ('NA' for missing values)."""
+    os.makedirs(output_dir, exist_ok=True)
+    for name, table in tables.items():
+        with open(os.path.join(output_dir, f'{name}.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(table)
+            writer.writerows(zip(*[_format_column(values) for values in table.values()]))
+
+
+def _format_column(values):
+    if values.dtype.kind == 'f':
+        return ['NA' if np.isnan(v) else repr(float(v)) for v in values]
+    return [str(v) for v in values]
+
+
+def main(argv=None):
+    """Command-line entry point: runs the notebook's summary pipeline on session files."""
+    parser = argparse.ArgumentParser(prog='python -m asrt_pipeline summary', description="Compute the ASRT RT, accuracy and learning score summary tables.")
+    parser.add_argument('paths', nargs='+', help="Session CSV or .acol files, or glob patterns (e.g. sample_data/*.csv)")
+    parser.add_argument('--output-dir', default='summary_tables', help="Folder for the summary CSVs (default: summary_tables)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of parsing processes (default: CPU count)")
+    parser.add_argument('--cache-dir', default=None, help="Keep per-file partial aggregates in this folder and only process new or changed files")
+    args = parser.parse_args(argv)
+
+    files = sorted({f for p in args.paths for f in (glob.glob(p) or [p])})
+    if args.cache_dir:
+        from .cache import PartialCache, combine_partials
+        cache = PartialCache(args.cache_dir)
+        tables = combine_partials(cache.get_partials(files, workers=args.workers))
+        print(f"Cache {args.cache_dir}: {cache.hits} files reused, {cache.misses} processed.")
+    else:
+        tables = summarize(load_sessions(files, workers=args.workers))
+    write_tables(tables, args.output_dir)
+
+    filtering = tables['filtering']
+    print(f"Loaded {len(files)} files.")
+    for step, rows, skew in zip(filtering['step'], filtering['rows'], filtering['rt_skewness']):
+        print(f"  {step}: {rows} rows" + ('' if np.isnan(skew) else f", RT skewness {skew:.4f}"))
+    print(f"Wrote {len(tables)} tables to {args.output_dir}")
+    return 0
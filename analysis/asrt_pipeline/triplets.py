@@ -0,0 +1,162 @@
+import argparse
+import csv
+import glob
+import numpy as np
+from . import columnar
+
+# Columns needed to re-derive the triplet labels of a session
+LABEL_COLUMNS = ['stimulus_position_num', 'trial_in_block_num', 'sequence_used']
+OPTIONAL_LABEL_COLUMNS = ['is_practice', 'epoch', 'triplet_type', 'trial_number']
+
+
+def parse_sequences(sequence_used):
+    """
+    Converts 'sequence_used' strings (e.g. "1,2,3,4" or 1234) into an (n, 4) int8 array.
+    Only the distinct sequences are parsed; rows are filled by fancy indexing.
+    An already parsed (n, 4) integer array (columnar files) is returned as a copy.
+    """
+    sequence_used = np.asarray(sequence_used)
+    if sequence_used.ndim == 2 and sequence_used.dtype.kind in 'iu':
+        return sequence_used.astype(np.int8)
+    if not len(sequence_used):
+        return np.empty((0, 4), dtype=np.int8)
+    unique_seqs, inverse = np.unique(sequence_used.astype(str), return_inverse=True)
+    table = np.array([[int(c) for c in s if c.isdigit()] for s in unique_seqs], dtype=np.int8).reshape(len(unique_seqs), -1)
+    return table[inverse.ravel()]
+
+
+def relabel_triplets(stimulus_position_num, trial_in_block_num, sequence_used, is_practice=None, epoch=None, interference_epoch=None):
+    """
+    Re-derives the triplet type (H, L, T, R, X) of every row of a session in one
+    vectorized pass, following the rules of the task's trial schedule.
+
+    Rows are in file order; consecutive rows with the same trial_in_block_num
+    are responses to the same trial and receive the same label.
+
+    Args:
+        stimulus_position_num (array-like): Target position (1-4) of each row.
+        trial_in_block_num (array-like): Position of the trial within its block.
+        sequence_used (array-like): The participant's pattern sequence of each row.
+        is_practice (array-like, optional): Practice rows are always labelled 'X'.
+        epoch (array-like, optional): Epoch of each row (needed with interference_epoch).
+        interference_epoch (int, optional): Epoch in which the pattern was reversed.
+
+    Returns:
+        numpy.ndarray: Array of one-character labels, one per row.
+    """
+    pos = np.asarray(stimulus_position_num, dtype=np.int8)
+    tib = np.asarray(trial_in_block_num, dtype=np.int32)
+    seq = parse_sequences(sequence_used)
+    if interference_epoch is not None and epoch is not None:
+        reversed_rows = np.asarray(epoch, dtype=np.int32) == interference_epoch
+        seq[reversed_rows] = seq[reversed_rows, ::-1]
+
+    # Collapse the rows to one entry per trial
+    new_trial = np.ones(len(pos), dtype=bool)
+    new_trial[1:] = tib[1:] != tib[:-1]
+    trial_of_row = np.cumsum(new_trial) - 1
+    t_pos = pos[new_trial]
+    t_tib = tib[new_trial]
+    t_seq = seq[new_trial]
+
+    # Shifted position arrays (n-1 and n-2); only read where trial_in_block_num > 2
+    pos_minus_1 = np.zeros_like(t_pos)
+    pos_minus_1[1:] = t_pos[:-1]
+    pos_minus_2 = np.zeros_like(t_pos)
+    pos_minus_2[2:] = t_pos[:-2]
+
+    # Pattern predecessor of the current position
+    cur_idx = (t_seq == t_pos[:, None]).argmax(axis=1)
+    predecessor = t_seq[np.arange(len(t_pos)), (cur_idx - 1) % t_seq.shape[1]]
+
+    labels = np.full(len(t_pos), 'L', dtype='U1')
+    trill = pos_minus_2 == t_pos
+    labels[trill] = 'T'
+    labels[trill & (pos_minus_1 == t_pos)] = 'R'
+    labels[(pos_minus_2 == predecessor) | (t_tib % 2 == 0)] = 'H'
+    labels[t_tib <= 2] = 'X'
+    if is_practice is not None:
+        labels[_as_bool(is_practice)[new_trial]] = 'X'
+
+    return labels[trial_of_row]
+
+
+def find_label_mismatches(stored_triplet_type, relabeled):
+    """Returns the row indices whose stored triplet_type differs from the re-derived label."""
+    return np.flatnonzero(np.asarray(stored_triplet_type, dtype='U1') != relabeled)
+
+
+def load_label_columns(filename):
+    """
+    Reads the columns needed for relabelling from a session CSV into NumPy arrays.
+    Columnar (.acol) files are memory-mapped instead of parsed.
+    """
+    if filename.endswith(columnar.FILE_EXTENSION):
+        header = columnar.read_header(filename)
+        missing = [c for c in LABEL_COLUMNS if c not in header['fieldnames']]
+        if missing:
+            raise ValueError(f"{filename} is missing required columns: {', '.join(missing)}")
+        present = [c for c in LABEL_COLUMNS + OPTIONAL_LABEL_COLUMNS if c in header['fieldnames']]
+        return columnar.read_columns(filename, present)
+
+    with open(filename, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = list(zip(*reader))
+
+    missing = [c for c in LABEL_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"{filename} is missing required columns: {', '.join(missing)}")
+
+    data = {}
+    for name in LABEL_COLUMNS + OPTIONAL_LABEL_COLUMNS:
+        if name in header:
+            data[name] = np.asarray(columns[header.index(name)] if columns else [], dtype=str)
+    return data
+
+
+def relabel_session_file(filename, interference_epoch=None):
+    """
+    Relabels a recorded session file (CSV or .acol).
+
+    Returns:
+        tuple: (data dict of columns, relabelled triplet types, indices of mismatching rows)
+    """
+    data = load_label_columns(filename)
+    relabeled = relabel_triplets(
+        data['stimulus_position_num'],
+        data['trial_in_block_num'],
+        data['sequence_used'],
+        is_practice=data.get('is_practice'),
+        epoch=data.get('epoch'),
+        interference_epoch=interference_epoch
+    )
+    mismatches = find_label_mismatches(data['triplet_type'], relabeled) if 'triplet_type' in data else np.array([], dtype=np.intp)
+    return data, relabeled, mismatches
+
+
+def _as_bool(values):
+    values = np.asarray(values)
+    if values.dtype.kind in 'US':
+        return np.char.lower(values.astype(str)) == 'true'
+    return values.astype(bool)
+
+
+def main(argv=None):
+    """Command-line entry point: relabels session CSVs and reports disagreeing rows."""
+    parser = argparse.ArgumentParser(prog='python -m asrt_pipeline relabel', description="Re-derive triplet types of recorded ASRT sessions and report disagreements.")
+    parser.add_argument('paths', nargs='+', help="Session CSV or .acol files, or glob patterns (e.g. sample_data/*.csv)")
+    parser.add_argument('--interference-epoch', type=int, default=None, help="Epoch in which the pattern sequence was reversed")
+    args = parser.parse_args(argv)
+
+    files = sorted({f for p in args.paths for f in (glob.glob(p) or [p])})
+    total_mismatches = 0
+    for filename in files:
+        data, relabeled, mismatches = relabel_session_file(filename, interference_epoch=args.interference_epoch)
+        total_mismatches += len(mismatches)
+        print(f"{filename}: {len(relabeled)} rows, {len(mismatches)} mismatching triplet labels")
+        for i in mismatches[:20]:
+            trial = data['trial_number'][i] if 'trial_number' in data else i + 1
+            print(f"  row {i + 2} (trial {trial}): stored {data['triplet_type'][i]}, derived {relabeled[i]}")
+    print(f"Checked {len(files)} files, {total_mismatches} mismatching rows in total.")
+    return 1 if total_mismatches else 0
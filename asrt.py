@@ -8,66 +8,102 @@
 
 ######################################################################################################
 
+# Startup is timed from here, imports included (see startup_profiler)
+import time
+STARTUP_START = time.perf_counter()
+
 from psychopy import visual, core, event, gui
 from psychopy.hardware import keyboard
-import random
-import csv
+import argparse
 import configparser
-import numpy as np
 import os
-import io
 import struct
 import sys
 from datetime import datetime
-from nogo_logic import select_nogo_trials_in_block
+from trial_schedule import compile_session_schedule
+from data_writer import DataWriter
+from trial_record import NA_MW_RATING, TRIAL_FIELDNAMES, BlockInfo, TrialRecord
+from block_stats import BlockStats
+from analysis.asrt_pipeline import columnar
 from mind_wandering import show_mind_wandering_probe
-from config_helpers import get_text_with_newlines, set_global_text_config
-import serial
+from config_helpers import get_text_with_newlines, language_filename, load_language_pack, set_language_pack, validate_language_pack
 import experiment_utils as utils
+from triggers import TriggerDispatcher
+from trigger_backends import TRIGGER_BACKENDS, create_trigger_backend, open_trigger_backend
+from response_box import RipondaReader
+from input_events import InputBus, keyboard_clock_offset
+from frame_timing import FrameScheduler, FrameTimingRecorder, measure_frame_period
+from memory_policy import MemoryPolicy
 from mw_instructions import show_mw_instructions_and_quiz
-import gc
-
-# --- GUI for Participant Info ---
-expInfo = {'participant': '1', 'session': '1', 'language': ['es', 'en', 'hu']}
-dlg = gui.DlgFromDict(dictionary=expInfo, title='Experiment Settings')
-if not dlg.OK:
-    core.quit()
+from stimulus_registry import StimulusRegistry
+from startup_profiler import StartupProfiler
+import checkpoint
+
+# --- Command line options ---
+arg_parser = argparse.ArgumentParser(description="ASRT task")
+arg_parser.add_argument('--settings', default='experiment_settings.ini', help="Settings file (default: experiment_settings.ini)")
+arg_parser.add_argument('--data-folder', default='data', help="Folder for the output files (default: data)")
+arg_parser.add_argument('--resume', metavar='CHECKPOINT', help="Continue an interrupted session from its _checkpoint.json file")
+args = arg_parser.parse_args()
+
+startup = StartupProfiler(STARTUP_START)
+startup.mark('imports')
+
+# --- Resumed session: participant info and files come from the checkpoint ---
+resume_checkpoint = None
+if args.resume:
+    try:
+        resume_checkpoint = checkpoint.load_checkpoint(args.resume)
+    except (OSError, ValueError) as e:
+        print(f"Error: Cannot resume the session: {e}")
+        core.quit()
 
-# --- Generate unique filename ---
-timestamp_str = datetime.now().strftime("%Y-%m-%d_%H%M%S")
-data_folder = 'data'
-if not os.path.exists(data_folder):
-    os.makedirs(data_folder)
-unique_filename = os.path.join(
-    data_folder,
-    f"participant_{expInfo['participant']}_session_{expInfo['session']}_{timestamp_str}_data.csv"
-)
+if resume_checkpoint:
+    expInfo = {key: resume_checkpoint[key] for key in ('participant', 'session', 'language')}
+    data_folder = os.path.dirname(args.resume)
+    unique_filename = os.path.join(data_folder, resume_checkpoint['data_file'])
+    resume_count = resume_checkpoint['resume_count'] + 1
+else:
+    # --- GUI for Participant Info ---
+    expInfo = {'participant': '1', 'session': '1', 'language': ['es', 'en', 'hu']}
+    dlg = gui.DlgFromDict(dictionary=expInfo, title='Experiment Settings')
+    if not dlg.OK:
+        core.quit()
+    startup.mark('participant dialog', waiting=True)
+
+    # --- Generate unique filename ---
+    timestamp_str = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    data_folder = args.data_folder
+    if not os.path.exists(data_folder):
+        os.makedirs(data_folder)
+    unique_filename = os.path.join(
+        data_folder,
+        f"participant_{expInfo['participant']}_session_{expInfo['session']}_{timestamp_str}_data.csv"
+    )
+    resume_count = 0
+# Files written once per run get a suffix in resumed runs, so the first run's files are kept
+run_suffix = f'_resumed_{resume_count}' if resume_count else ''
+checkpoint_filename = checkpoint.checkpoint_filename(unique_filename)
 
 # --- START LOGGING HERE ---
 log_filename = unique_filename.replace('.csv', '_console_log.txt')
 print(f"Redirecting output to: {log_filename}")
 
 original_stdout = sys.stdout
-sys.stdout = utils.LogTee(log_filename, original_stdout)
+sys.stdout = utils.LogTee(log_filename, original_stdout, mode='a' if resume_checkpoint else 'w')
+if resume_checkpoint:
+    print(f"Resuming session from {args.resume} (resume {resume_count}): "
+          f"{'practice' if resume_checkpoint['next_is_practice'] else 'main'} block {resume_checkpoint['next_block']}, "
+          f"{resume_checkpoint['total_trial_count']} trials done")
 
 # --- Define Fieldnames for CSV ---
-fieldnames = ['participant', 'session', 'block_number', 'trial_number', 'trial_in_block_num', 'trial_type', 'triplet_type', 'sequence_used', 'stimulus_position_num', 'rt_non_cumulative_s', 'rt_cumulative_s', 'correct_key_pressed', 'response_key_pressed', 'correct_response', 'is_nogo', 'is_practice', 'epoch', 'is_first_response', 
-              'mind_wandering_rating_1', 'mind_wandering_rating_2', 'mind_wandering_rating_3', 'mind_wandering_rating_4']
-
-# --- Write initial CSV Header ---
-try:
-    with open(unique_filename, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-    print(f"Data file initialized: {unique_filename}")
-except Exception as e:
-    print(f"ERROR: Failed to write initial CSV header: {e}")
-    core.quit()
+fieldnames = list(TRIAL_FIELDNAMES)
 
 # --- Load experiment settings ---
 config = configparser.ConfigParser()
 try:
-    config.read('experiment_settings.ini')
+    if not config.read(args.settings):
+        raise FileNotFoundError(f"Settings file '{args.settings}' not found.")
     TRIALS_PER_BLOCK = config.getint('Experiment', 'num_trials')
     NUM_BLOCKS = config.getint('Experiment', 'num_blocks')
     INTERFERENCE_EPOCH_ENABLED = config.getboolean('Experiment', 'interference_epoch_enabled')
@@ -97,34 +133,81 @@ try:
     RIPONDA_ENABLED = config.getboolean('Experiment', 'riponda_enabled', fallback=False)
     RIPONDA_PORT_NAME = config.get('Experiment', 'riponda_port', fallback='COM3')
     RIPONDA_BAUDRATE = config.getint('Experiment', 'riponda_baudrate', fallback=115200)
+
+    DATA_FLUSH_POLICY = config.get('Data', 'flush_policy', fallback='trial')
+    DATA_FSYNC = config.getboolean('Data', 'fsync', fallback=True)
+
+    FLIP_LEAD = config.getfloat('Timing', 'flip_lead_s', fallback=0.004)
+    SPIN_MARGIN = config.getfloat('Timing', 'spin_margin_s', fallback=0.002)
+
+    GC_MODE = config.get('Memory', 'gc_mode', fallback='freeze')
+
+    TRIGGER_BACKEND = config.get('Triggers', 'backend', fallback='serial')
+    TRIGGER_SERIAL_PORT = config.get('Triggers', 'serial_port', fallback='COM3')
+    TRIGGER_SERIAL_BAUDRATE = config.getint('Triggers', 'serial_baudrate', fallback=115200)
+    TRIGGER_SERIAL_FLUSH = config.getboolean('Triggers', 'serial_flush', fallback=True)
+    TRIGGER_PULSE_DURATION = config.getfloat('Triggers', 'pulse_duration_s', fallback=0.05)
+    MARKER_HOST = config.get('Triggers', 'marker_host', fallback='127.0.0.1')
+    MARKER_PORT = config.getint('Triggers', 'marker_port', fallback=5005)
+    if TRIGGER_BACKEND not in TRIGGER_BACKENDS:
+        print(f"Error: Unknown trigger backend '{TRIGGER_BACKEND}' in [Triggers]. Use one of: {', '.join(TRIGGER_BACKENDS)}.")
+        core.quit()
       
 except (configparser.Error, FileNotFoundError) as e:
     print(f"Error reading configuration file: {e}")
     core.quit()
 
-# --- Load experiment text ---
-language_code = expInfo['language']
-text_filename = f'language/experiment_text_{language_code}.ini'
-text_config = configparser.ConfigParser()
+# --- Open the data file ---
+# Rows are written by a background thread; the file stays open for the whole session
+settings_digest = checkpoint.file_digest(args.settings)
+summary_filename = unique_filename.replace('.csv', '_block_summary.jsonl')
+if resume_checkpoint:
+    if settings_digest != resume_checkpoint['settings_digest']:
+        print(f"Error: Cannot resume the session: '{args.settings}' is not the settings file the session started with.")
+        core.quit()
+    try:
+        moved_rows = checkpoint.rewind_output_files(unique_filename, summary_filename, resume_checkpoint)
+    except (OSError, KeyError) as e:
+        print(f"Error: Cannot resume the session: {e}")
+        core.quit()
+    if moved_rows:
+        print(f"{moved_rows} rows of the interrupted block moved to {checkpoint.interrupted_rows_filename(unique_filename)}")
+try:
+    data_writer = DataWriter(unique_filename, fieldnames, flush_policy=DATA_FLUSH_POLICY, fsync=DATA_FSYNC,
+                             summary_filename=summary_filename, checkpoint_filename=checkpoint_filename,
+                             append=bool(resume_checkpoint))
+    print(f"Data file initialized: {unique_filename}")
+except Exception as e:
+    print(f"ERROR: Failed to initialize data file: {e}")
+    core.quit()
 
+# --- Garbage collection policy ---
+# Collections are kept out of the blocks and memory use is logged per block
 try:
-    if not os.path.exists(text_filename):
-        print(f"Error: Language file '{text_filename}' not found.")
-        core.quit()
+    memory_policy = MemoryPolicy(GC_MODE)
+except ValueError as e:
+    print(f"Error reading configuration file: {e}")
+    core.quit()
 
-    with io.open(text_filename, mode='r', encoding='utf-8-sig') as f:
-        file_content = f.read()
-    
-    file_content = file_content.strip()
-    text_config.read_string(file_content)
-    
-    if not text_config.sections():
-        raise FileNotFoundError(f"Text file '{text_filename}' is empty.")
-except Exception as e:
+# --- Load experiment text ---
+language_code = expInfo['language']
+text_filename = language_filename(language_code)
+try:
+    language_pack = load_language_pack(language_code)
+except FileNotFoundError:
+    print(f"Error: Language file '{text_filename}' not found.")
+    core.quit()
+except (OSError, ValueError) as e:
     print(f"Error loading experiment text file: {e}")
     core.quit()
 
-set_global_text_config(text_config)
+missing_texts, defaulted_texts = validate_language_pack(language_pack)
+for section, option in defaulted_texts:
+    print(f"Warning: [{section}] {option} is missing from '{text_filename}', the English default is used.")
+if missing_texts:
+    print(f"Error: '{text_filename}' is missing texts: " + ", ".join(f"[{section}] {option}" for section, option in missing_texts))
+    core.quit()
+set_language_pack(language_pack)
 
 # --- Define sequences ---
 all_sequences = [
@@ -142,6 +225,74 @@ sequence_index = (participant_num - 1) % len(all_sequences)
 pattern_sequence = all_sequences[sequence_index]
 sequence_to_save = str(pattern_sequence).replace('[', '').replace(']', '').replace(' ', '')
 
+# --- Compile session schedule (all practice and main trials) ---
+# A resumed session continues the schedule saved when the session started
+if resume_checkpoint:
+    if resume_checkpoint['sequence_used'] != sequence_to_save:
+        print("Error: Cannot resume the session: the checkpoint was written with another sequence.")
+        core.quit()
+    try:
+        session_schedule = checkpoint.load_schedule(unique_filename, resume_checkpoint)
+    except (OSError, ValueError) as e:
+        print(f"Error: Cannot resume the session: {e}")
+        core.quit()
+    checkpoint.restore_random_state(resume_checkpoint)
+    schedule_digest = resume_checkpoint['schedule_digest']
+else:
+    try:
+        session_schedule = compile_session_schedule(
+            pattern_sequence,
+            TRIALS_PER_BLOCK,
+            NUM_BLOCKS,
+            num_practice_blocks=NUM_PRACTICE_BLOCKS if PRACTICE_ENABLED else 0,
+            no_go_trials_enabled=NO_GO_TRIALS_ENABLED,
+            num_no_go_trials=NUM_NO_GO_TRIALS,
+            interference_epoch_enabled=INTERFERENCE_EPOCH_ENABLED,
+            interference_epoch_num=INTERFERENCE_EPOCH_NUM
+        )
+    except ValueError as e:
+        print(f"Error: Cannot build the trial schedule from the settings: {e}")
+        core.quit()
+    schedule_digest = checkpoint.save_schedule(unique_filename, session_schedule)
+print(f"Session schedule compiled: {len(session_schedule)} trials")
+
+# --- Where the session starts: the first block, or the block after the checkpoint ---
+NUM_SCHEDULED_PRACTICE_BLOCKS = NUM_PRACTICE_BLOCKS if PRACTICE_ENABLED else 0
+first_practice_block, first_main_block, total_trial_count = 1, 1, 0
+resume_in_main = False
+if resume_checkpoint:
+    resume_in_main = not resume_checkpoint['next_is_practice']
+    if resume_in_main:
+        first_practice_block = NUM_PRACTICE_BLOCKS + 1
+        first_main_block = resume_checkpoint['next_block']
+        blocks_done = NUM_SCHEDULED_PRACTICE_BLOCKS + first_main_block - 1
+    else:
+        first_practice_block = resume_checkpoint['next_block']
+        blocks_done = first_practice_block - 1
+    total_trial_count = resume_checkpoint['total_trial_count']
+    if total_trial_count != blocks_done * TRIALS_PER_BLOCK or total_trial_count >= len(session_schedule):
+        print(f"Error: Cannot resume the session: the checkpoint's trial counter ({total_trial_count}) does not match its block.")
+        core.quit()
+# A crash before the first block boundary can also be resumed
+start_position = (True, first_practice_block) if NUM_SCHEDULED_PRACTICE_BLOCKS and not resume_in_main else (False, first_main_block)
+data_writer.write_checkpoint(checkpoint.make_checkpoint(expInfo, unique_filename, settings_digest, schedule_digest, sequence_to_save,
+                                                        start_position, total_trial_count, resume_count))
+startup.mark('config')
+
+# --- Open the trigger backend and the serial ports on worker threads while the window is created ---
+trigger_backend = create_trigger_backend(
+    TRIGGER_BACKEND,
+    serial_port=TRIGGER_SERIAL_PORT,
+    serial_baudrate=TRIGGER_SERIAL_BAUDRATE,
+    serial_flush=TRIGGER_SERIAL_FLUSH,
+    filename=unique_filename.replace('.csv', f'_trigger_record{run_suffix}.csv'),
+    marker_host=MARKER_HOST,
+    marker_port=MARKER_PORT
+)
+startup.run_in_background('trigger backend', open_trigger_backend, trigger_backend)
+if RIPONDA_ENABLED:
+    startup.run_in_background('Riponda port', utils.open_riponda_port, RIPONDA_PORT_NAME, RIPONDA_BAUDRATE)
+
 # --- Setup window and stimuli ---
 win = visual.Window(
     size=[1920, 1080], 
@@ -153,7 +304,30 @@ win = visual.Window(
     numSamples=16,
     waitBlanking=True 
 )
-kb = keyboard.Keyboard()
+# Key-down times must be on the clock of the flips and the response box (core.monotonicClock)
+kb = keyboard.Keyboard(clock=core.monotonicClock)
+if abs(keyboard_clock_offset(kb)) > 0.0005:
+    print(f"Error: The keyboard clock is {keyboard_clock_offset(kb):.3f} s off core.monotonicClock; key times would not match stimulus onsets.")
+    core.quit()
+
+# Every flip is timestamped; ISI, dropped frames and trigger latency are recorded per trial
+frame_period = measure_frame_period(win)
+frame_timing = FrameTimingRecorder(win, frame_period)
+frame_timing_filename = unique_filename.replace('.csv', f'_frame_timing{run_suffix}.npz')
+
+# ISI, no-go windows and feedback screens last whole frames of the measured refresh rate
+FEEDBACK_DURATION = 3.0
+frame_scheduler = FrameScheduler(frame_period, flip_lead=FLIP_LEAD, spin_margin=SPIN_MARGIN)
+ISI_FRAMES = frame_scheduler.frames(ISI_DURATION)
+NOGO_FRAMES = frame_scheduler.frames(NOGO_TRIAL_DURATION)
+FEEDBACK_FRAMES = frame_scheduler.frames(FEEDBACK_DURATION)
+frame_scheduler.describe('ISI', ISI_DURATION)
+if NO_GO_TRIALS_ENABLED:
+    frame_scheduler.describe('No-go window', NOGO_TRIAL_DURATION)
+if FEEDBACK_ENABLED:
+    frame_scheduler.describe('Feedback screen', FEEDBACK_DURATION)
+startup.mark('window')
+
 circle_radius = 60
 y_pos = 0.0
 x_positions = [-240, -80, 80, 240]
@@ -165,53 +339,81 @@ for x, key in zip(x_positions, keys):
 
 image_size = circle_radius * 2 - 3
 border_circles = []
-image_stims = []
 fixation_cross = visual.TextStim(win, text='+', color=FOREGROUND_COLOR, height=50, font='Arial')
 for s in stimuli:
     border = visual.Circle(win=win, radius=circle_radius, fillColor='white', pos=s['stim'].pos)
     border_circles.append(border)
-    img = visual.ImageStim(win=win, image=target_image_path, size=image_size, pos=s['stim'].pos, interpolate=True)
-    image_stims.append(img)
+
+# --- Target / no-go image pool (textures uploaded once) ---
+target_image_pool = utils.build_target_image_pool(
+    win, [s['stim'].pos for s in stimuli], target_image_path, nogo_image_path, image_size
+)
 
 feedback_header = visual.TextStim(win, text='', color=FOREGROUND_COLOR, height=40, pos=(0, 100), wrapWidth=1600, font='Arial')
 feedback_stats = visual.TextStim(win, text='', color=FOREGROUND_COLOR, height=30, pos=(0, 0), wrapWidth=1600, font='Arial')
 feedback_performance = visual.TextStim(win, text='', color='green', height=40, pos=(0, -100), wrapWidth=1600, font='Arial')
 
+# --- Text screens: built once for the session's language, drawn by key ---
+stimulus_registry = StimulusRegistry.build(win, language_pack, fg_color=FOREGROUND_COLOR, mw_testing_involved=MW_TESTING_INVOLVED,
+                                           run_quiz=RUN_COMPREHENSION_QUIZ, warm_up=False)
+stimulus_registry.add_text_screen('welcome_screen', get_text_with_newlines('Instructions', 'welcome_screen').format(keys_list=", ".join([f"'{k}'" for k in keys])), height=30)
+if NO_GO_TRIALS_ENABLED:
+    stimulus_registry.add_text_screen('nogo_screen', get_text_with_newlines('Instructions', 'nogo_screen'), height=30)
+if PRACTICE_ENABLED:
+    stimulus_registry.add_text_screen('start_screen', get_text_with_newlines('Screens', 'start_practice').format(NUM_PRACTICE_BLOCKS=NUM_PRACTICE_BLOCKS))
+else:
+    stimulus_registry.add_text_screen('start_screen', get_text_with_newlines('Screens', 'start_main'))
+stimulus_registry.add_text_screen('countdown_message', get_text_with_newlines('Screens', 'countdown_message'))
+startup.mark('stimuli')
+
+# --- Warm-up: hidden first draw of every stimulus and of the language's glyphs ---
+task_stimuli = [s['stim'] for s in stimuli] + border_circles + list(target_image_pool.values())
+task_stimuli += [fixation_cross, feedback_header, feedback_stats, feedback_performance]
+stimulus_registry.warm_up(language_pack, extra_stimuli=task_stimuli)
+startup.mark('warm-up')
+
 # --- Riponda Byte Map ---
 riponda_byte_map = {48: keys[0], 112: keys[1], 176: keys[2], 240: keys[3]}
 
-# --- Initialize serial ports ---
-ser_port = None
-COM_PORT_NAME = 'COM3'
-try:
-    ser_port = serial.Serial(port=COM_PORT_NAME, baudrate=115200, timeout=1)
-    ser_port.reset_input_buffer()
-    ser_port.reset_output_buffer()
-    ser_port.write(bytes([0]))
-    ser_port.flush()
-except Exception as e:
-    print(f"Serial port {COM_PORT_NAME} not found: {e}")
-    ser_port = None
+# --- Trigger backend and serial ports (opened in the background since before the window) ---
+trigger_backend = startup.result('trigger backend')
 
-riponda_port = None
+# Pulses are reset to 0 by a background thread so the main loop never blocks on them
+trigger_dispatcher = TriggerDispatcher(trigger_backend, pulse_duration=TRIGGER_PULSE_DURATION)
+trigger_log_filename = unique_filename.replace('.csv', f'_trigger_log{run_suffix}.csv')
+
+# The Riponda port is drained by a background thread that timestamps every packet on arrival
+riponda_reader = None
 if RIPONDA_ENABLED:
-    try:
-        riponda_port = serial.Serial(port=RIPONDA_PORT_NAME, baudrate=RIPONDA_BAUDRATE, timeout=0)
-        riponda_port.reset_input_buffer()
-    except Exception as e:
-        print(f"Riponda port {RIPONDA_PORT_NAME} not found: {e}")
-        riponda_port = None
+    riponda_port = startup.result('Riponda port')
+    if riponda_port:
+        riponda_reader = RipondaReader(riponda_port)
+startup.mark('serial open')
+
+# Keyboard and response box events, merged into one time-ordered stream
+input_bus = InputBus(kb, riponda_reader, riponda_byte_map)
 
 # --- Helper Functions ---
 def quit_experiment():
-    if ser_port:
-        try:
-            ser_port.close()
-        except Exception:
-            pass
-    if riponda_port:
+    memory_policy.close()
+    data_writer.close()
+    try:
+        columnar.convert_csv(unique_filename)
+    except Exception as e:
+        print(f"ERROR: Failed to write columnar data file: {e}")
+    utils.print_frame_timing_summary(frame_timing.session_summary(), label='Frame timing (session)')
+    try:
+        frame_timing.save(frame_timing_filename)
+    except Exception as e:
+        print(f"ERROR: Failed to save frame timing file: {e}")
+    trigger_dispatcher.close()
+    try:
+        trigger_dispatcher.save_write_log(trigger_log_filename)
+    except Exception as e:
+        print(f"ERROR: Failed to save trigger log: {e}")
+    if riponda_reader:
         try:
-            riponda_port.close()
+            riponda_reader.close()
         except Exception:
             pass
     if win:
@@ -220,230 +422,175 @@ def quit_experiment():
         except Exception:
             pass
     
+    # Writes the console lines still queued to the log file
     if hasattr(sys.stdout, 'close'):
         sys.stdout.close()
+    sys.stdout = original_stdout
     
     core.quit()
 
+def log_trial_row(block_stats, record):
+    block_stats.add(record)
+    data_writer.write_row(record)
+
+def block_checkpoint(is_practice, block_num):
+    """Returns the checkpoint of the boundary after the given block (written by the data writer with the block)."""
+    next_position = checkpoint.next_block_position(is_practice, block_num, NUM_SCHEDULED_PRACTICE_BLOCKS, NUM_BLOCKS)
+    return checkpoint.make_checkpoint(expInfo, unique_filename, settings_digest, schedule_digest, sequence_to_save,
+                                      next_position, total_trial_count, resume_count)
+
+def collect_garbage_during(duration):
+    """Runs the between-block garbage collection and waits for the rest of duration."""
+    wait_start = core.getTime()
+    memory_policy.collect()
+    core.wait(max(0.0, duration - (core.getTime() - wait_start)))
+
 def wait_for_response():
-    kb.clearEvents()
-    if riponda_port:
-        try:
-            riponda_port.reset_input_buffer()
-        except Exception:
-            pass
-    
-    input_received = False
-    while not input_received:
-        keys_pressed = kb.getKeys(waitRelease=False)
-        if keys_pressed:
-            if 'escape' in [k.name for k in keys_pressed]:
-                quit_experiment()
-            input_received = True
-            
-        if not input_received and riponda_port and riponda_port.in_waiting >= 6:
-            try:
-                packet = riponda_port.read(6)
-                if len(packet) == 6 and packet[0] == 0x6b:
-                    input_received = True
-                elif len(packet) == 6:
-                    riponda_port.reset_input_buffer()
-            except Exception:
-                try:
-                    riponda_port.reset_input_buffer()
-                except Exception:
-                    pass
+    input_bus.clear()
+    response = input_bus.wait_for_any()
+    if response.name == 'escape':
+        quit_experiment()
     core.wait(0.5)
 
-# --- Instructions ---
-instruction_text = get_text_with_newlines('Instructions', 'welcome_screen').format(keys_list=", ".join([f"'{k}'" for k in keys]))
-instruction_message = visual.TextStim(win, text=instruction_text, color=FOREGROUND_COLOR, height=30, wrapWidth=1600, font='Arial')
-instruction_message.draw()
-win.flip()
-wait_for_response()
-
-# --- No-Go instructions ---
-if NO_GO_TRIALS_ENABLED:
-    try:
-        nogo_inst_text = get_text_with_newlines('Instructions', 'nogo_screen')
-    except:
-        nogo_inst_text = "Attention:\n\nPress buttons for DOG, do NOT press for CAT.\n\nPress any button to continue."
-    nogo_message = visual.TextStim(win, text=nogo_inst_text, color=FOREGROUND_COLOR, height=30, wrapWidth=1600, font='Arial')
-    nogo_message.draw()
+if resume_checkpoint:
+    # --- Resumed session: straight to the block after the checkpoint ---
+    stimulus_registry.draw('next_practice' if resume_checkpoint['next_is_practice'] else 'next_main')
     win.flip()
+    startup.report()
     wait_for_response()
-
-# --- MW Instructions & Quiz ---
-if MW_TESTING_INVOLVED:
-    show_mw_instructions_and_quiz(
-        win, 
-        quit_experiment, 
-        RUN_COMPREHENSION_QUIZ, 
-        text_filename, 
-        riponda_port=riponda_port,
-        fg_color=FOREGROUND_COLOR,
-        bg_color=BACKGROUND_COLOR
-    )
-
-# --- Start Experiment Screen ---
-if PRACTICE_ENABLED:
-    start_text = get_text_with_newlines('Screens', 'start_practice').format(NUM_PRACTICE_BLOCKS=NUM_PRACTICE_BLOCKS)
-    start_trigger_value = 90
+    utils.send_trigger_pulse(trigger_dispatcher, 98 if resume_checkpoint['next_is_practice'] else first_main_block)
 else:
-    start_text = get_text_with_newlines('Screens', 'start_main')
-    start_trigger_value = 1
-start_message = visual.TextStim(win, text=start_text, color=FOREGROUND_COLOR, height=40, wrapWidth=1600, font='Arial')
-start_message.draw()
-win.flip()
+    # --- Instructions ---
+    stimulus_registry.draw('welcome_screen')
+    win.flip()
+    startup.report()
+    wait_for_response()
+
+    # --- No-Go instructions ---
+    if NO_GO_TRIALS_ENABLED:
+        stimulus_registry.draw('nogo_screen')
+        win.flip()
+        wait_for_response()
+
+    # --- MW Instructions & Quiz ---
+    if MW_TESTING_INVOLVED:
+        show_mw_instructions_and_quiz(
+            win, 
+            quit_experiment, 
+            RUN_COMPREHENSION_QUIZ, 
+            text_filename, 
+            input_bus,
+            fg_color=FOREGROUND_COLOR,
+            bg_color=BACKGROUND_COLOR,
+            registry=stimulus_registry
+        )
+
+    # --- Start Experiment Screen ---
+    start_trigger_value = 90 if PRACTICE_ENABLED else 1
+    stimulus_registry.draw('start_screen')
+    win.flip()
 
-key_pressed = kb.waitKeys(keyList=['space', 'escape'])
-if 'escape' in [k.name for k in key_pressed]:
-    quit_experiment()
+    input_bus.clear()
+    key_pressed = input_bus.wait_for_any(key_list=['space', 'escape'])
+    if key_pressed.name == 'escape':
+        quit_experiment()
 
-utils.send_trigger_pulse(ser_port, start_trigger_value)
+    utils.send_trigger_pulse(trigger_dispatcher, start_trigger_value)
 
 # --- Countdown ---
-prep_text = get_text_with_newlines('Screens', 'countdown_message')
-prep_message = visual.TextStim(win, text=prep_text, color=FOREGROUND_COLOR, height=40, wrapWidth=1600, font='Arial')
-prep_message.draw()
+stimulus_registry.draw('countdown_message')
 win.flip()
-utils.send_trigger_pulse(ser_port, 180)
-core.wait(10.0)
-
-# --- State variables ---
-total_trial_count = 0
-NA_MW_RATING = 'NA'
+utils.send_trigger_pulse(trigger_dispatcher, 180)
+collect_garbage_during(10.0)
 
 # --- Practice Loop ---
-for practice_block_num in range(1, NUM_PRACTICE_BLOCKS + 1) if PRACTICE_ENABLED else []:
-    block_data = []
-    
-    nogo_trial_indices_in_block = set()
-    if NO_GO_TRIALS_ENABLED:
-        pre_block_trials = []
-        for trial_in_block in range(TRIALS_PER_BLOCK):
-            pre_block_trials.append({'trial_in_block_num': trial_in_block + 1, 'trial_type': 'R'})
-        try:
-            nogo_indices = select_nogo_trials_in_block(range(len(pre_block_trials)), pre_block_trials, 0, NUM_NO_GO_TRIALS)
-            nogo_trial_indices_in_block.update(nogo_indices)
-        except Exception as e:
-            core.quit()
-
-    practice_positions_list = []
-    positions_per_stim = TRIALS_PER_BLOCK // len(stimuli)
-    for pos_num in range(1, len(stimuli) + 1):
-        practice_positions_list.extend([pos_num] * positions_per_stim)
-    random.shuffle(practice_positions_list)
-    practice_list_index = 0
-    
-    na_ratings = [NA_MW_RATING] * 4
+for practice_block_num in range(first_practice_block, NUM_PRACTICE_BLOCKS + 1) if PRACTICE_ENABLED else []:
+    target_prep_times = []
+    block_info = BlockInfo(expInfo['participant'], expInfo['session'], sequence_to_save, practice_block_num, True, 0)
+    block_stats = BlockStats(block_info)
+    memory_policy.start_block()
 
     for trial_in_block in range(TRIALS_PER_BLOCK):
+        trial = session_schedule[total_trial_count]
         total_trial_count += 1
-        kb.clearEvents()
-        if riponda_port: 
-             riponda_port.reset_input_buffer()
+        input_bus.clear()
 
-        trial_in_block_num = trial_in_block + 1
-        is_nogo = (trial_in_block in nogo_trial_indices_in_block)
+        trial_in_block_num = int(trial['trial_in_block_num'])
+        is_nogo = bool(trial['is_nogo'])
+        target_stim_pos = int(trial['stimulus_position_num'])
+        trial_type = str(trial['trial_type'])
+        triplet_type = str(trial['triplet_type'])
+        trial_trigger = int(trial['trigger'])
 
         for stim_dict in stimuli:
             stim_dict['stim'].fillColor = 'white' 
             stim_dict['stim'].draw()
-        win.flip()
-        core.wait(ISI_DURATION)
+        memory_policy.response_window(False)
+        isi_flip_time = win.flip()
+        frame_scheduler.hold(isi_flip_time, ISI_FRAMES)
 
-        target_stim_pos = practice_positions_list[practice_list_index]
-        practice_list_index += 1
-        trial_type = 'R'
-        triplet_type = 'X'
-        
+        prep_start = time.perf_counter()
         target_stim_index = target_stim_pos - 1
-        image_path_to_use = nogo_image_path if is_nogo else target_image_path
-            
         stimuli[target_stim_index]['stim'].fillColor = 'blue'
         border = border_circles[target_stim_index]
-        target_image = image_stims[target_stim_index]
-        target_image.image = image_path_to_use
-        target_image.pos = stimuli[target_stim_index]['stim'].pos
+        target_image = target_image_pool[(target_stim_index, is_nogo)]
         
         for stim_dict in stimuli:
             stim_dict['stim'].draw()
         border.draw()
         target_image.draw()
+        target_prep_times.append(time.perf_counter() - prep_start)
         
         # --- PRECISE ONSET ---
         onset_time = win.flip() 
-        utils.send_trigger_pulse(ser_port, (251 if is_nogo else 151) + target_stim_pos)
+        trigger_time = utils.send_trigger_pulse(trigger_dispatcher, trial_trigger)
+        frame_timing.add_trial(practice_block_num, True, total_trial_count, isi_flip_time, onset_time, ISI_DURATION, trigger_time, ISI_FRAMES)
+        memory_policy.response_window(True)
 
         if is_nogo:
             response_logged = False
-            while (core.getTime() - onset_time) < NOGO_TRIAL_DURATION:
-                responses = kb.getKeys(keyList=keys + ['escape'], waitRelease=False)
-                if not responses and riponda_port and riponda_port.in_waiting >= 6: 
-                    try:
-                        packet = riponda_port.read(6)
-                        if packet[0] == 0x6b and packet[1] in riponda_byte_map:
-                            rt_now = core.getTime() - onset_time
-                            responses = [type('obj', (object,), {'name': riponda_byte_map[packet[1]], 'rt': rt_now})()]
-                    except Exception: pass
-                
+            frame_timing.add_screen('nogo', onset_time, NOGO_FRAMES, total_trial_count)
+            for _ in frame_scheduler.polling(onset_time, NOGO_FRAMES):
+                responses = input_bus.poll(keys + ['escape'])
                 if responses and not response_logged:
                     resp = responses[0]
                     if resp.name == 'escape': quit_experiment()
-                    rt_val = resp.rt if hasattr(resp, 'rt') else core.getTime() - onset_time
-                    utils.send_trigger_pulse(ser_port, 91 + keys.index(resp.name) + 1)
-                    block_data.append({
-                        'participant': expInfo['participant'], 'session': expInfo['session'], 'block_number': practice_block_num, 'trial_number': total_trial_count, 'trial_in_block_num': trial_in_block_num, 'trial_type': trial_type, 'triplet_type': triplet_type, 'sequence_used': sequence_to_save, 'stimulus_position_num': target_stim_pos, 'rt_non_cumulative_s': rt_val, 'rt_cumulative_s': rt_val, 'correct_key_pressed': 'NoGo', 'response_key_pressed': resp.name, 'correct_response': False, 'is_nogo': True, 'is_practice': True, 'epoch': 0, 'is_first_response': 1, 'mind_wandering_rating_1': na_ratings[0], 'mind_wandering_rating_2': na_ratings[1], 'mind_wandering_rating_3': na_ratings[2], 'mind_wandering_rating_4': na_ratings[3]
-                    })
+                    # Presses made during the ISI count from onset
+                    rt_val = max(resp.time, onset_time) - onset_time
+                    utils.send_trigger_pulse(trigger_dispatcher, 91 + keys.index(resp.name) + 1)
+                    log_trial_row(block_stats, TrialRecord(block_info, total_trial_count, trial_in_block_num, trial_type, triplet_type, target_stim_pos, rt_non_cumulative_s=rt_val, rt_cumulative_s=rt_val, correct_key_pressed='NoGo', response_key_pressed=resp.name, correct_response=False, is_nogo=True, is_first_response=1))
                     response_logged = True
             if not response_logged:
-                block_data.append({
-                    'participant': expInfo['participant'], 'session': expInfo['session'], 'block_number': practice_block_num, 'trial_number': total_trial_count, 'trial_in_block_num': trial_in_block_num, 'trial_type': trial_type, 'triplet_type': triplet_type, 'sequence_used': sequence_to_save, 'stimulus_position_num': target_stim_pos, 'rt_non_cumulative_s': None, 'rt_cumulative_s': None, 'correct_key_pressed': 'NoGo', 'response_key_pressed': 'None', 'correct_response': True, 'is_nogo': True, 'is_practice': True, 'epoch': 0, 'is_first_response': 1, 'mind_wandering_rating_1': na_ratings[0], 'mind_wandering_rating_2': na_ratings[1], 'mind_wandering_rating_3': na_ratings[2], 'mind_wandering_rating_4': na_ratings[3]
-                })
+                log_trial_row(block_stats, TrialRecord(block_info, total_trial_count, trial_in_block_num, trial_type, triplet_type, target_stim_pos, rt_non_cumulative_s=None, rt_cumulative_s=None, correct_key_pressed='NoGo', response_key_pressed='None', correct_response=True, is_nogo=True, is_first_response=1))
         else:
             correct_response_given = False
             first_attempt_in_trial = True
             time_of_last_response = 0.0
             while not correct_response_given:
-                res_obj = None
-                kb_res = kb.getKeys(keyList=keys + ['escape'], waitRelease=False)
-                if kb_res:
-                    rt_now = core.getTime() - onset_time
-                    res_obj = type('obj', (object,), {'name': kb_res[0].name, 'rt': rt_now})()
-                elif riponda_port and riponda_port.in_waiting >= 6:
-                    try:
-                        packet = riponda_port.read(6) 
-                        if packet[0] == 0x6b and packet[1] in riponda_byte_map:
-                            rt_now = core.getTime() - onset_time
-                            res_obj = type('obj', (object,), {'name': riponda_byte_map[packet[1]], 'rt': rt_now})()
-                    except Exception: pass
-                
-                if res_obj:
+                for res_obj in input_bus.poll(keys + ['escape']):
                     if res_obj.name == 'escape': quit_experiment()
-                    rt_cumulative = res_obj.rt
+                    # RT from the key-down / packet arrival time; presses made during the ISI count from onset
+                    rt_cumulative = max(res_obj.time, onset_time) - onset_time
                     rt_non_cumulative = rt_cumulative - time_of_last_response
                     was_correct = (res_obj.name == stimuli[target_stim_index]['key'])
-                    utils.send_trigger_pulse(ser_port, (71 if was_correct else 81) + keys.index(res_obj.name) + 1)
-                    block_data.append({
-                        'participant': expInfo['participant'], 'session': expInfo['session'], 'block_number': practice_block_num, 'trial_number': total_trial_count, 'trial_in_block_num': trial_in_block_num, 'trial_type': trial_type, 'triplet_type': triplet_type, 'sequence_used': sequence_to_save, 'stimulus_position_num': target_stim_pos, 'rt_non_cumulative_s': rt_non_cumulative, 'rt_cumulative_s': rt_cumulative, 'correct_key_pressed': stimuli[target_stim_index]['key'], 'response_key_pressed': res_obj.name, 'correct_response': was_correct, 'is_nogo': False, 'is_practice': True, 'epoch': 0, 'is_first_response': 1 if first_attempt_in_trial else 0, 'mind_wandering_rating_1': na_ratings[0], 'mind_wandering_rating_2': na_ratings[1], 'mind_wandering_rating_3': na_ratings[2], 'mind_wandering_rating_4': na_ratings[3]
-                    })
+                    utils.send_trigger_pulse(trigger_dispatcher, (71 if was_correct else 81) + keys.index(res_obj.name) + 1)
+                    log_trial_row(block_stats, TrialRecord(block_info, total_trial_count, trial_in_block_num, trial_type, triplet_type, target_stim_pos, rt_non_cumulative_s=rt_non_cumulative, rt_cumulative_s=rt_cumulative, correct_key_pressed=stimuli[target_stim_index]['key'], response_key_pressed=res_obj.name, correct_response=was_correct, is_nogo=False, is_first_response=1 if first_attempt_in_trial else 0))
                     first_attempt_in_trial = False
                     time_of_last_response = rt_cumulative
-                    if was_correct: correct_response_given = True
-
-    mw_ratings = show_mind_wandering_probe(win, ser_port, MW_TESTING_INVOLVED, NA_MW_RATING, quit_experiment, riponda_port=riponda_port, fg_color=FOREGROUND_COLOR, bg_color=BACKGROUND_COLOR)
-    for d in block_data: d.update({'mind_wandering_rating_1': mw_ratings[0], 'mind_wandering_rating_2': mw_ratings[1], 'mind_wandering_rating_3': mw_ratings[2], 'mind_wandering_rating_4': mw_ratings[3]})
-    try:
-        with open(unique_filename, 'a', newline='') as csvfile: csv.DictWriter(csvfile, fieldnames=fieldnames).writerows(block_data)
-    except: pass
+                    if was_correct:
+                        correct_response_given = True
+                        break
+
+    memory_policy.end_block()
+    utils.print_target_prep_summary(target_prep_times)
+    utils.print_poll_summary(input_bus.reset_poll_stats())
+    utils.print_frame_timing_summary(frame_timing.finish_block())
+    mw_ratings = show_mind_wandering_probe(win, trigger_dispatcher, MW_TESTING_INVOLVED, NA_MW_RATING, quit_experiment, input_bus=input_bus, fg_color=FOREGROUND_COLOR, bg_color=BACKGROUND_COLOR, registry=stimulus_registry)
+    block_info.set_mw_ratings(mw_ratings)
+    data_writer.finish_block(block_stats.summary(), block_checkpoint(True, practice_block_num))
 
     if FEEDBACK_ENABLED:
-        correct_rts = [d['rt_cumulative_s'] for d in block_data if d['correct_response'] and not d['is_nogo']]
-        total_correct = sum(1 for d in block_data if d['correct_response'] and not d['is_nogo'])
-        total_go = len([d for d in block_data if not d['is_nogo']])
-        mean_rt = np.mean(correct_rts) if correct_rts else 0
-        accuracy = (total_correct / total_go) * 100 if total_go > 0 else 0
+        mean_rt, accuracy = block_stats.feedback()
         feedback_header.text = get_text_with_newlines('Screens', 'feedback_header').format(block_num=practice_block_num)
         feedback_stats.text = f"Mean RT: {mean_rt:.2f} s\nAccuracy: {accuracy:.2f} %"
         if accuracy < 90: feedback_performance.text, feedback_performance.color = get_text_with_newlines('Screens', 'feedback_accurate'), 'red'
@@ -452,153 +599,103 @@ for practice_block_num in range(1, NUM_PRACTICE_BLOCKS + 1) if PRACTICE_ENABLED
         feedback_header.draw(); 
         feedback_stats.draw(); 
         feedback_performance.draw(); 
-        win.flip(); 
-        core.wait(3)
+        feedback_flip_time = win.flip()
+        frame_timing.add_screen('feedback', feedback_flip_time, FEEDBACK_FRAMES)
+        frame_scheduler.hold(feedback_flip_time, FEEDBACK_FRAMES)
     
-    gc.collect() 
+    # Garbage is collected during the mandatory wait, or here if there is none
+    if practice_block_num < NUM_PRACTICE_BLOCKS and MANDATORY_WAIT > 0:
+        fixation_cross.draw(); 
+        win.flip(); 
+        collect_garbage_during(MANDATORY_WAIT)
+    else:
+        memory_policy.collect()
     if practice_block_num < NUM_PRACTICE_BLOCKS:
-        if MANDATORY_WAIT > 0: 
-            fixation_cross.draw(); 
-            win.flip(); 
-            core.wait(MANDATORY_WAIT)
-        visual.TextStim(win, text=get_text_with_newlines('Screens', 'next_practice'), color=FOREGROUND_COLOR, height=40, wrapWidth=1600, font='Arial').draw(); win.flip(); wait_for_response(); utils.send_trigger_pulse(ser_port, 98)
+        stimulus_registry.draw('next_practice'); win.flip(); wait_for_response(); utils.send_trigger_pulse(trigger_dispatcher, 98)
 
-if PRACTICE_ENABLED:
-    visual.TextStim(win, text=get_text_with_newlines('Screens', 'end_practice'), color=FOREGROUND_COLOR, height=40, wrapWidth=1600, font='Arial').draw(); win.flip(); wait_for_response(); utils.send_trigger_pulse(ser_port, 99)
+if PRACTICE_ENABLED and not resume_in_main:
+    stimulus_registry.draw('end_practice'); win.flip(); wait_for_response(); utils.send_trigger_pulse(trigger_dispatcher, 99)
 
 # --- Main Experiment Loop ---
-for block_num in range(1, NUM_BLOCKS + 1):
-    block_data = []; pattern_index = 0; pos_minus_1 = None; pos_minus_2 = None; current_pattern_sequence = list(pattern_sequence); random_list_index = 0
-    epoch = ((block_num - 1) // 5) + 1
-    if INTERFERENCE_EPOCH_ENABLED and epoch == INTERFERENCE_EPOCH_NUM:
-        if current_pattern_sequence == list(pattern_sequence): current_pattern_sequence.reverse()
-    elif current_pattern_sequence != list(pattern_sequence) and epoch != INTERFERENCE_EPOCH_NUM:
-        current_pattern_sequence = list(pattern_sequence)
-    
-    num_random_trials = TRIALS_PER_BLOCK - (TRIALS_PER_BLOCK // 2)
-    random_positions_list = []
-    positions_per_stim = num_random_trials // len(stimuli)
-    for pos_num in range(1, len(stimuli) + 1): random_positions_list.extend([pos_num] * positions_per_stim)
-    random.shuffle(random_positions_list)
-    
-    nogo_trial_indices_in_block = set()
-    if NO_GO_TRIALS_ENABLED:
-        pre_block_trials = []
-        for trial_in_block in range(TRIALS_PER_BLOCK):
-            pre_block_trials.append({'trial_in_block_num': trial_in_block + 1, 'trial_type': 'P' if (trial_in_block + 1) % 2 == 0 else 'R'})
-        try:
-            nogo_indices = select_nogo_trials_in_block(range(len(pre_block_trials)), pre_block_trials, NUM_NO_GO_TRIALS // 2, NUM_NO_GO_TRIALS - (NUM_NO_GO_TRIALS // 2))
-            nogo_trial_indices_in_block.update(nogo_indices)
-        except: core.quit()
+for block_num in range(first_main_block, NUM_BLOCKS + 1):
+    target_prep_times = []
+    epoch = int(session_schedule[total_trial_count]['epoch'])
+    block_info = BlockInfo(expInfo['participant'], expInfo['session'], sequence_to_save, block_num, False, epoch)
+    block_stats = BlockStats(block_info)
+    memory_policy.start_block()
 
     for trial_in_block in range(TRIALS_PER_BLOCK):
-        total_trial_count += 1; trial_in_block_num = trial_in_block + 1; is_nogo = (trial_in_block in nogo_trial_indices_in_block)
+        trial = session_schedule[total_trial_count]
+        total_trial_count += 1
+        trial_in_block_num = int(trial['trial_in_block_num']); is_nogo = bool(trial['is_nogo'])
+        target_stim_pos = int(trial['stimulus_position_num']); trial_type = str(trial['trial_type'])
+        triplet_type = str(trial['triplet_type']); trial_trigger = int(trial['trigger'])
         
-        if riponda_port: riponda_port.reset_input_buffer()
-        kb.clearEvents()
+        input_bus.clear()
         
         for stim_dict in stimuli: 
             stim_dict['stim'].fillColor = 'white'
             stim_dict['stim'].draw()
-        win.flip(); 
-        core.wait(ISI_DURATION)
+        memory_policy.response_window(False)
+        isi_flip_time = win.flip()
+        frame_scheduler.hold(isi_flip_time, ISI_FRAMES)
 
-        if trial_in_block_num % 2 == 0:
-            target_stim_pos = current_pattern_sequence[pattern_index]; pattern_index = (pattern_index + 1) % len(current_pattern_sequence); trial_type = 'P'
-        else:
-            target_stim_pos = random_positions_list[random_list_index]; random_list_index += 1; trial_type = 'R'
-
-        triplet_type = 'L'
-        if trial_type == 'P': triplet_type = 'H'
-        elif pos_minus_2 is not None:
-            try:
-                cur_idx = current_pattern_sequence.index(target_stim_pos)
-                if pos_minus_2 == current_pattern_sequence[(cur_idx - 1) % len(current_pattern_sequence)]: triplet_type = 'H'
-                elif pos_minus_2 == target_stim_pos:
-                    triplet_type = 'T'
-                    if pos_minus_1 == target_stim_pos: triplet_type = 'R'
-            except: pass
-        if trial_in_block_num <= 2: triplet_type = 'X'
-        
-        trigger_offset = (200 if is_nogo else 100)
-        if trial_type == 'P' and triplet_type == 'H': trial_trigger = trigger_offset + 1 + target_stim_pos
-        elif trial_type == 'R' and triplet_type == 'H': trial_trigger = trigger_offset + 11 + target_stim_pos
-        elif triplet_type == 'L': trial_trigger = trigger_offset + 21 + target_stim_pos
-        elif triplet_type == 'T': trial_trigger = trigger_offset + 31 + target_stim_pos
-        elif triplet_type == 'R': trial_trigger = trigger_offset + 41 + target_stim_pos
-        else: trial_trigger = trigger_offset + 51 + target_stim_pos
-
-        pos_minus_2, pos_minus_1 = pos_minus_1, target_stim_pos
+        prep_start = time.perf_counter()
         target_stim_index = target_stim_pos - 1
         stimuli[target_stim_index]['stim'].fillColor = 'blue'
-        target_image = image_stims[target_stim_index]
-        target_image.image = nogo_image_path if is_nogo else target_image_path
-        target_image.pos = stimuli[target_stim_index]['stim'].pos
+        target_image = target_image_pool[(target_stim_index, is_nogo)]
         
         for stim_dict in stimuli: stim_dict['stim'].draw()
         border_circles[target_stim_index].draw(); 
         target_image.draw()
+        target_prep_times.append(time.perf_counter() - prep_start)
         
         onset_time = win.flip()
-        utils.send_trigger_pulse(ser_port, trial_trigger)
+        trigger_time = utils.send_trigger_pulse(trigger_dispatcher, trial_trigger)
+        frame_timing.add_trial(block_num, False, total_trial_count, isi_flip_time, onset_time, ISI_DURATION, trigger_time, ISI_FRAMES)
+        memory_policy.response_window(True)
 
         if is_nogo:
             response_logged = False
-            while (core.getTime() - onset_time) < NOGO_TRIAL_DURATION:
-                responses = kb.getKeys(keyList=keys + ['escape'], waitRelease=False)
-                if not responses and riponda_port and riponda_port.in_waiting >= 6:
-                    try:
-                        packet = riponda_port.read(6)
-                        if packet[0] == 0x6b and packet[1] in riponda_byte_map:
-                            rt_now = core.getTime() - onset_time
-                            responses = [type('obj', (object,), {'name': riponda_byte_map[packet[1]], 'rt': rt_now})()]
-                    except: pass
-                    
+            frame_timing.add_screen('nogo', onset_time, NOGO_FRAMES, total_trial_count)
+            for _ in frame_scheduler.polling(onset_time, NOGO_FRAMES):
+                responses = input_bus.poll(keys + ['escape'])
                 if responses and not response_logged:
                     resp = responses[0]
                     if resp.name == 'escape': quit_experiment()
-                    rt_val = resp.rt if hasattr(resp, 'rt') else core.getTime() - onset_time
-                    utils.send_trigger_pulse(ser_port, 91 + keys.index(resp.name) + 1)
-                    block_data.append({'participant': expInfo['participant'], 'session': expInfo['session'], 'block_number': block_num, 'trial_number': total_trial_count, 'trial_in_block_num': trial_in_block_num, 'trial_type': trial_type, 'triplet_type': triplet_type, 'sequence_used': sequence_to_save, 'stimulus_position_num': target_stim_pos, 'rt_non_cumulative_s': rt_val, 'rt_cumulative_s': rt_val, 'correct_key_pressed': 'NoGo', 'response_key_pressed': resp.name, 'correct_response': False, 'is_nogo': True, 'is_practice': False, 'epoch': epoch, 'is_first_response': 1, 'mind_wandering_rating_1': NA_MW_RATING, 'mind_wandering_rating_2': NA_MW_RATING, 'mind_wandering_rating_3': NA_MW_RATING, 'mind_wandering_rating_4': NA_MW_RATING})
+                    # Presses made during the ISI count from onset
+                    rt_val = max(resp.time, onset_time) - onset_time
+                    utils.send_trigger_pulse(trigger_dispatcher, 91 + keys.index(resp.name) + 1)
+                    log_trial_row(block_stats, TrialRecord(block_info, total_trial_count, trial_in_block_num, trial_type, triplet_type, target_stim_pos, rt_non_cumulative_s=rt_val, rt_cumulative_s=rt_val, correct_key_pressed='NoGo', response_key_pressed=resp.name, correct_response=False, is_nogo=True, is_first_response=1))
                     response_logged = True
-            if not response_logged: block_data.append({'participant': expInfo['participant'], 'session': expInfo['session'], 'block_number': block_num, 'trial_number': total_trial_count, 'trial_in_block_num': trial_in_block_num, 'trial_type': trial_type, 'triplet_type': triplet_type, 'sequence_used': sequence_to_save, 'stimulus_position_num': target_stim_pos, 'rt_non_cumulative_s': None, 'rt_cumulative_s': None, 'correct_key_pressed': 'NoGo', 'response_key_pressed': 'None', 'correct_response': True, 'is_nogo': True, 'is_practice': False, 'epoch': epoch, 'is_first_response': 1, 'mind_wandering_rating_1': NA_MW_RATING, 'mind_wandering_rating_2': NA_MW_RATING, 'mind_wandering_rating_3': NA_MW_RATING, 'mind_wandering_rating_4': NA_MW_RATING})
+            if not response_logged: log_trial_row(block_stats, TrialRecord(block_info, total_trial_count, trial_in_block_num, trial_type, triplet_type, target_stim_pos, rt_non_cumulative_s=None, rt_cumulative_s=None, correct_key_pressed='NoGo', response_key_pressed='None', correct_response=True, is_nogo=True, is_first_response=1))
         else:
             correct_response_given = False; first_attempt_in_trial = True; time_of_last_response = 0.0
             while not correct_response_given:
-                res_obj = None; kb_res = kb.getKeys(keyList=keys + ['escape'], waitRelease=False)
-                if kb_res:
-                    rt_now = core.getTime() - onset_time
-                    res_obj = type('obj', (object,), {'name': kb_res[0].name, 'rt': rt_now})()
-                elif riponda_port and riponda_port.in_waiting >= 6:
-                    try:
-                        packet = riponda_port.read(6)
-                        if packet[0] == 0x6b and packet[1] in riponda_byte_map:
-                            rt_now = core.getTime() - onset_time
-                            res_obj = type('obj', (object,), {'name': riponda_byte_map[packet[1]], 'rt': rt_now})()
-                    except: pass
-                if res_obj:
+                for res_obj in input_bus.poll(keys + ['escape']):
                     if res_obj.name == 'escape': quit_experiment()
-                    rt_cumulative = res_obj.rt
+                    # RT from the key-down / packet arrival time; presses made during the ISI count from onset
+                    rt_cumulative = max(res_obj.time, onset_time) - onset_time
                     rt_non_cumulative = rt_cumulative - time_of_last_response
                     was_correct = (res_obj.name == stimuli[target_stim_index]['key'])
-                    utils.send_trigger_pulse(ser_port, (71 if was_correct else 81) + keys.index(res_obj.name) + 1)
-                    block_data.append({'participant': expInfo['participant'], 'session': expInfo['session'], 'block_number': block_num, 'trial_number': total_trial_count, 'trial_in_block_num': trial_in_block_num, 'trial_type': trial_type, 'triplet_type': triplet_type, 'sequence_used': sequence_to_save, 'stimulus_position_num': target_stim_pos, 'rt_non_cumulative_s': rt_non_cumulative, 'rt_cumulative_s': rt_cumulative, 'correct_key_pressed': stimuli[target_stim_index]['key'], 'response_key_pressed': res_obj.name, 'correct_response': was_correct, 'is_nogo': False, 'is_practice': False, 'epoch': epoch, 'is_first_response': 1 if first_attempt_in_trial else 0, 'mind_wandering_rating_1': NA_MW_RATING, 'mind_wandering_rating_2': NA_MW_RATING, 'mind_wandering_rating_3': NA_MW_RATING, 'mind_wandering_rating_4': NA_MW_RATING})
+                    utils.send_trigger_pulse(trigger_dispatcher, (71 if was_correct else 81) + keys.index(res_obj.name) + 1)
+                    log_trial_row(block_stats, TrialRecord(block_info, total_trial_count, trial_in_block_num, trial_type, triplet_type, target_stim_pos, rt_non_cumulative_s=rt_non_cumulative, rt_cumulative_s=rt_cumulative, correct_key_pressed=stimuli[target_stim_index]['key'], response_key_pressed=res_obj.name, correct_response=was_correct, is_nogo=False, is_first_response=1 if first_attempt_in_trial else 0))
                     first_attempt_in_trial = False
                     time_of_last_response = rt_cumulative
-                    if was_correct: correct_response_given = True
-
-    mw_ratings = show_mind_wandering_probe(win, ser_port, MW_TESTING_INVOLVED, NA_MW_RATING, quit_experiment, riponda_port=riponda_port, fg_color=FOREGROUND_COLOR, bg_color=BACKGROUND_COLOR)
-    for d in block_data: d.update({'mind_wandering_rating_1': mw_ratings[0], 'mind_wandering_rating_2': mw_ratings[1], 'mind_wandering_rating_3': mw_ratings[2], 'mind_wandering_rating_4': mw_ratings[3]})
-    try:
-        with open(unique_filename, 'a', newline='') as csvfile: csv.DictWriter(csvfile, fieldnames=fieldnames).writerows(block_data)
-    except: pass
+                    if was_correct:
+                        correct_response_given = True
+                        break
+
+    memory_policy.end_block()
+    utils.print_target_prep_summary(target_prep_times)
+    utils.print_poll_summary(input_bus.reset_poll_stats())
+    utils.print_frame_timing_summary(frame_timing.finish_block())
+    mw_ratings = show_mind_wandering_probe(win, trigger_dispatcher, MW_TESTING_INVOLVED, NA_MW_RATING, quit_experiment, input_bus=input_bus, fg_color=FOREGROUND_COLOR, bg_color=BACKGROUND_COLOR, registry=stimulus_registry)
+    block_info.set_mw_ratings(mw_ratings)
+    data_writer.finish_block(block_stats.summary(), block_checkpoint(False, block_num))
 
     if FEEDBACK_ENABLED:
-        correct_rts = [d['rt_cumulative_s'] for d in block_data if d['correct_response'] and not d['is_nogo']]
-        total_correct = sum(1 for d in block_data if d['correct_response'] and not d['is_nogo'])
-        total_go = len([d for d in block_data if not d['is_nogo']])
-        mean_rt = np.mean(correct_rts) if correct_rts else 0
-        accuracy = (total_correct / total_go) * 100 if total_go > 0 else 0
+        mean_rt, accuracy = block_stats.feedback()
         feedback_header.text = get_text_with_newlines('Screens', 'feedback_header').format(block_num=block_num)
         rt_label = get_text_with_newlines('Screens', 'feedback_rt')
         acc_label = get_text_with_newlines('Screens', 'feedback_acc')
@@ -612,18 +709,20 @@ for block_num in range(1, NUM_BLOCKS + 1):
         feedback_header.draw(); 
         feedback_stats.draw(); 
         feedback_performance.draw(); 
-        win.flip(); 
-        core.wait(3)
+        feedback_flip_time = win.flip()
+        frame_timing.add_screen('feedback', feedback_flip_time, FEEDBACK_FRAMES)
+        frame_scheduler.hold(feedback_flip_time, FEEDBACK_FRAMES)
 
     if block_num < NUM_BLOCKS:
-        if MANDATORY_WAIT > 0: fixation_cross.draw(); win.flip(); core.wait(MANDATORY_WAIT)
-        visual.TextStim(win, text=get_text_with_newlines('Screens', 'next_main'), color=FOREGROUND_COLOR, height=40, wrapWidth=1600, font='Arial').draw(); 
+        # Garbage is collected during the mandatory wait, or here if there is none
+        if MANDATORY_WAIT > 0: fixation_cross.draw(); win.flip(); collect_garbage_during(MANDATORY_WAIT)
+        else: memory_policy.collect()
+        stimulus_registry.draw('next_main'); 
         win.flip(); 
         wait_for_response(); 
-        utils.send_trigger_pulse(ser_port, 0 + (block_num + 1))
-    gc.collect() 
+        utils.send_trigger_pulse(trigger_dispatcher, 0 + (block_num + 1))
 
-visual.TextStim(win, text=get_text_with_newlines('Screens', 'end_experiment'), color=FOREGROUND_COLOR, height=40, wrapWidth=1600, font='Arial').draw(); 
+stimulus_registry.draw('end_experiment'); 
 win.flip(); 
 wait_for_response(); 
 quit_experiment()
\ No newline at end of file
@@ -0,0 +1 @@
+"""Microbenchmarks of the task's hot paths and the analysis pipeline (run with python -m benchmarks)."""
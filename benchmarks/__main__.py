@@ -0,0 +1,68 @@
+import argparse
+import sys
+import time
+from datetime import datetime
+from benchmarks import harness
+
+BENCHMARK_NAMES = ('nogo_selection', 'session_schedule', 'triplet_classification', 'data_writer',
+                   'response_polling', 'trigger_dispatch', 'analysis_pipeline')
+
+
+def load_benchmarks():
+    """Imports the benchmarks (after the headless psychopy modules are in place, see harness.use_headless_psychopy)."""
+    from benchmarks import bench_analysis, bench_io, bench_schedule
+    return {
+        'nogo_selection': bench_schedule.bench_nogo_selection,
+        'session_schedule': bench_schedule.bench_session_schedule,
+        'triplet_classification': bench_schedule.bench_triplet_classification,
+        'data_writer': bench_io.bench_data_writer,
+        'response_polling': bench_io.bench_response_polling,
+        'trigger_dispatch': bench_io.bench_trigger_dispatch,
+        'analysis_pipeline': bench_analysis.bench_analysis_pipeline,
+    }
+
+
+def main(argv=None):
+    """Command-line entry point: runs the benchmarks and saves the results as JSON."""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Time the task's hot paths and the analysis pipeline.")
+    parser.add_argument('names', nargs='*', metavar='NAME', help=f"Benchmarks to run (default: all): {', '.join(BENCHMARK_NAMES)}")
+    parser.add_argument('--quick', action='store_true', help="Fewer cases and repetitions (a smoke test, not for comparisons)")
+    parser.add_argument('--output', default=None, help="Result file (default: benchmarks/results/benchmarks_<date>_<time>.json)")
+    parser.add_argument('--compare', metavar='RESULTS', default=None, help="Print the metrics that changed against an earlier result file")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in BENCHMARK_NAMES]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    baseline = None
+    if args.compare:
+        try:
+            baseline = harness.load_results(args.compare)
+        except (OSError, ValueError) as e:
+            print(f"Error: Cannot compare: {e}")
+            return 1
+
+    harness.use_headless_psychopy()
+    benchmarks = load_benchmarks()
+    results = {
+        'version': harness.RESULTS_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'quick': args.quick,
+        'environment': harness.environment(),
+        'benchmarks': {},
+    }
+    for name in args.names or BENCHMARK_NAMES:
+        start = time.perf_counter()
+        results['benchmarks'][name] = benchmarks[name](quick=args.quick)
+        print(f"{name}: {time.perf_counter() - start:.1f} s")
+
+    output = args.output or harness.results_filename()
+    harness.save_results(output, results)
+    print(f"Results written to {output}")
+    if baseline:
+        harness.compare(baseline, results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
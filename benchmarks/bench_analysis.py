@@ -0,0 +1,75 @@
+import csv
+import glob
+import os
+import tempfile
+import time
+from benchmarks.harness import REPO_DIR
+
+SAMPLE_DATA_FOLDER = os.path.join(REPO_DIR, 'analysis', 'sample_data')
+
+
+def replicate_sample_data(folder, copies):
+    """
+    Writes copies of every session CSV of analysis/sample_data into folder, each
+    copy with its own participant IDs, so the cohort has copies times as many
+    participants as the samples.
+
+    Returns:
+        tuple: (list of the written files, total number of rows)
+    """
+    files, num_rows = [], 0
+    for sample in sorted(glob.glob(os.path.join(SAMPLE_DATA_FOLDER, '*.csv'))):
+        with open(sample, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = list(reader)
+        participant_col = header.index('participant')
+        for copy in range(copies):
+            filename = os.path.join(folder, f'copy{copy + 1}_{os.path.basename(sample)}')
+            with open(filename, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                for row in rows:
+                    row = list(row)
+                    row[participant_col] = f'{copy + 1}{row[participant_col]}'
+                    writer.writerow(row)
+            files.append(filename)
+            num_rows += len(rows)
+    return files, num_rows
+
+
+def bench_analysis_pipeline(quick=False):
+    """
+    Throughput of the analysis pipeline (analysis/asrt_pipeline) on the sample
+    sessions replicated into a cohort: loading the CSVs (in this process and in
+    a process pool), converting them to columnar files, loading those, the
+    summary of the notebook, relabelling the triplets, and the partial-aggregate
+    cache when it is empty and when it is complete.
+    """
+    from analysis.asrt_pipeline import (PartialCache, combine_partials, convert_csv, load_sessions,
+                                        relabel_session_file, summarize)
+
+    copies = 5 if quick else 50
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        csv_files, num_rows = replicate_sample_data(folder, copies)
+        params = {'sessions': len(csv_files), 'rows': num_rows}
+
+        def timed(name, func):
+            start = time.perf_counter()
+            value = func()
+            elapsed = time.perf_counter() - start
+            results[name] = {'params': params, 'total_s': elapsed, 'rows_per_s': num_rows / elapsed}
+            return value
+
+        timed('load_csv', lambda: load_sessions(csv_files, workers=1))
+        data = timed('load_csv_parallel', lambda: load_sessions(csv_files))
+        acol_files = timed('convert_to_columnar', lambda: [convert_csv(f) for f in csv_files])
+        timed('load_columnar', lambda: load_sessions(acol_files, workers=1))
+        timed('summarize', lambda: summarize(data))
+        timed('relabel_triplets', lambda: [relabel_session_file(f) for f in acol_files])
+
+        cache_dir = os.path.join(folder, 'cache')
+        timed('partial_cache_cold', lambda: combine_partials(PartialCache(cache_dir).get_partials(csv_files)))
+        timed('partial_cache_warm', lambda: combine_partials(PartialCache(cache_dir).get_partials(csv_files)))
+    return results
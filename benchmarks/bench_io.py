@@ -0,0 +1,251 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+from benchmarks.harness import distribution
+
+RIPONDA_PACKET = bytes([0x6b, 48, 0, 0, 0, 0])
+
+
+class FakeSerialPort:
+    """
+    A serial port for the benchmarks. Its input is fed by the benchmark (feed());
+    read() and in_waiting behave as pyserial's, including the read timeout.
+    Written bytes are only counted.
+    """
+    def __init__(self):
+        self.timeout = None
+        self.bytes_written = 0
+        self._data = bytearray()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def feed(self, data):
+        with self._cond:
+            self._data += data
+            self._cond.notify()
+
+    @property
+    def in_waiting(self):
+        return len(self._data)
+
+    def read(self, size=1):
+        with self._cond:
+            if not self._data and not self._closed:
+                self._cond.wait(self.timeout)
+            chunk = bytes(self._data[:size])
+            del self._data[:size]
+            return chunk
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        with self._cond:
+            self._data.clear()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+
+class NoKeyboard:
+    """A keyboard without key presses, so a poll measures the response box path only."""
+    def getKeys(self, keyList=None, waitRelease=False):
+        return []
+
+    def clearEvents(self):
+        pass
+
+
+def bench_response_polling(quick=False):
+    """
+    The response loop's input polling (input_events.InputBus.poll) with a
+    Riponda response box on a fake serial port (response_box.RipondaReader),
+    polled back to back as the trial loop does: the cost of each poll without
+    and with a press waiting, the delay from a packet arriving on the port to
+    its timestamp and to the poll that returns it, and how many packets per
+    second the reader thread can parse.
+    """
+    from input_events import BUTTON_NUMBER_MAP, InputBus
+    from response_box import RipondaReader
+
+    key_list = list(BUTTON_NUMBER_MAP.values())
+    port = FakeSerialPort()
+    reader = RipondaReader(port, clock=time.perf_counter)
+    bus = InputBus(NoKeyboard(), reader, clock=time.perf_counter)
+    try:
+        # Polls of an idle response box: the cost of every poll of a trial's response window
+        idle_polls = []
+        for _ in range(20000 if quick else 200000):
+            poll_start = time.perf_counter()
+            bus.poll(key_list)
+            idle_polls.append(time.perf_counter() - poll_start)
+
+        # One press at a time: poll cost with the press waiting and the delay from the port to the poll
+        press_polls, detection_delays, stamp_delays = [], [], []
+        for _ in range(200 if quick else 2000):
+            fed_at = time.perf_counter()
+            port.feed(RIPONDA_PACKET)
+            while True:
+                poll_start = time.perf_counter()
+                events = bus.poll(key_list)
+                poll_end = time.perf_counter()
+                if events:
+                    break
+            press_polls.append(poll_end - poll_start)
+            detection_delays.append(poll_end - fed_at)
+            stamp_delays.append(events[0].time - fed_at)
+
+        # Parsing: bursts of packets (fewer than the reader's buffer holds) fed one by one
+        burst_size = 100
+        num_packets = burst_size * (50 if quick else 500)
+        reader.clear()
+        burst_start = time.perf_counter()
+        for _ in range(num_packets // burst_size):
+            for _ in range(burst_size):
+                port.feed(RIPONDA_PACKET)
+            received = 0
+            while received < burst_size:
+                if reader.get_press() is None:
+                    time.sleep(0.0001)
+                else:
+                    received += 1
+        burst_s = time.perf_counter() - burst_start
+    finally:
+        reader.close()
+
+    return {
+        'idle_poll_s': distribution(idle_polls),
+        'press_poll_s': distribution(press_polls),
+        'port_to_poll_s': distribution(detection_delays),
+        'port_to_timestamp_s': distribution(stamp_delays),
+        'packet_parsing': {'params': {'packets': num_packets}, 'burst_s': burst_s, 'packets_per_s': num_packets / burst_s},
+    }
+
+
+def _trial_records(block, num_trials):
+    from trial_record import TrialRecord
+    records = []
+    for t in range(1, num_trials + 1):
+        records.append(TrialRecord(block, (block.block_number - 1) * num_trials + t, t, 'P' if t % 2 == 0 else 'R',
+                                   'H' if t % 2 == 0 else 'L', (t % 4) + 1, 0.41234567, 0.41234567, 's', 's',
+                                   True, False, 1))
+    return records
+
+
+def bench_data_writer(quick=False):
+    """
+    Writing the session CSV (data_writer.DataWriter) for each flush policy, with
+    and without fsync: the task thread's cost of queuing a trial row, and the
+    latency of a block commit (rows moved to the data file, block summary and
+    checkpoint written) from finish_block() until the checkpoint is on disk.
+    """
+    from data_writer import DataWriter
+    from trial_record import TRIAL_FIELDNAMES, BlockInfo
+
+    num_blocks = 5 if quick else 30
+    trials_per_block = 80
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for flush_policy in ('trial', 'block'):
+            for fsync in (False, True):
+                filename = os.path.join(folder, f'{flush_policy}_{fsync}_data.csv')
+                writer = DataWriter(filename, TRIAL_FIELDNAMES, flush_policy=flush_policy, fsync=fsync,
+                                    summary_filename=filename.replace('.csv', '_block_summary.jsonl'),
+                                    checkpoint_filename=filename.replace('.csv', '_checkpoint.json'))
+                # The writer thread calls _write_checkpoint last for every block: it signals the commit
+                written = threading.Event()
+                write_checkpoint = writer._write_checkpoint
+
+                def write_and_signal(checkpoint, write_checkpoint=write_checkpoint, written=written):
+                    write_checkpoint(checkpoint)
+                    written.set()
+                writer._write_checkpoint = write_and_signal
+
+                row_costs, journal_drains, commits = [], [], []
+                for block_number in range(1, num_blocks + 1):
+                    block = BlockInfo('0001', '1', '1, 3, 2, 4', block_number, False, (block_number - 1) // 5 + 1)
+                    records = _trial_records(block, trials_per_block)
+                    queued_at = time.perf_counter()
+                    for record in records:
+                        row_start = time.perf_counter()
+                        writer.write_row(record)
+                        row_costs.append(time.perf_counter() - row_start)
+
+                    # Wait until the rows are in the journal, as they are long before a real block ends
+                    written.clear()
+                    writer.write_checkpoint({'block': block_number})
+                    written.wait()
+                    journal_drains.append(time.perf_counter() - queued_at)
+
+                    block.set_mw_ratings((1, 2, 3, 4))
+                    written.clear()
+                    commit_start = time.perf_counter()
+                    writer.finish_block({'block_number': block_number}, {'block': block_number})
+                    written.wait()
+                    commits.append(time.perf_counter() - commit_start)
+                writer.close()
+
+                results[f'{flush_policy}_flush{"_fsync" if fsync else ""}'] = {
+                    'params': {'flush_policy': flush_policy, 'fsync': fsync, 'trials_per_block': trials_per_block,
+                               'blocks': num_blocks},
+                    'queue_row_s': distribution(row_costs),
+                    'block_rows_to_journal_s': distribution(journal_drains),
+                    'block_commit_s': distribution(commits),
+                }
+    return results
+
+
+def bench_trigger_dispatch(quick=False):
+    """
+    Sending triggers (triggers.TriggerDispatcher) through the trigger backends
+    that need no hardware: the task thread's cost of a pulse, and for backends
+    that hold a line, how far the reset thread's pulse widths are from the
+    intended one. The file backend runs the same path as a serial port.
+    """
+    from trigger_backends import FileTriggerBackend, MarkerStreamBackend, NullTriggerBackend
+    from triggers import TriggerDispatcher
+
+    num_pulses = 100 if quick else 500
+    pulse_duration = 0.002
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        backends = {
+            'null': NullTriggerBackend(),
+            'file': FileTriggerBackend(os.path.join(folder, 'trigger_record.csv')),
+            'udp': MarkerStreamBackend('udp', '127.0.0.1', receiver.getsockname()[1]),
+        }
+        try:
+            for name, backend in backends.items():
+                backend.open()
+                dispatcher = TriggerDispatcher(backend, pulse_duration=pulse_duration, clock=time.perf_counter)
+                pulse_costs = []
+                for i in range(num_pulses):
+                    pulse_start = time.perf_counter()
+                    dispatcher.pulse(i % 250 + 1)
+                    pulse_costs.append(time.perf_counter() - pulse_start)
+                    if dispatcher.holds_line:
+                        # Trials are far apart: let the line return to 0 before the next pulse
+                        time.sleep(pulse_duration * 2)
+                dispatcher.close()
+
+                case = {'params': {'pulses': num_pulses, 'pulse_duration_s': pulse_duration, 'holds_line': dispatcher.holds_line},
+                        'pulse_call_s': distribution(pulse_costs)}
+                if dispatcher.holds_line:
+                    log = dispatcher.write_log
+                    widths = [log[i + 1][0] - log[i][0] for i in range(len(log) - 1) if log[i][1] and not log[i + 1][1]]
+                    case['pulse_width_error_s'] = distribution([width - pulse_duration for width in widths])
+                results[name] = case
+        finally:
+            receiver.close()
+    return results
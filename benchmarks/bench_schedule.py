@@ -0,0 +1,96 @@
+import math
+import random
+import numpy as np
+from benchmarks.harness import time_calls
+from nogo_logic import NogoSampler
+from trial_schedule import _main_pre_block_trials, classify_triplet, compile_session_schedule
+
+PATTERN_SEQUENCE = [1, 3, 2, 4]
+
+
+def bench_nogo_selection(quick=False):
+    """
+    No-go selection (nogo_logic.NogoSampler) of a main block layout: building the
+    count table and drawing the no-go trials of one block, for several block
+    lengths and no-go densities (no-go trials per block / trials per block).
+    """
+    results = {}
+    for trials_per_block in ((80,) if quick else (40, 80, 160, 320)):
+        pre_block_trials = _main_pre_block_trials(trials_per_block)
+        for density in (0.05, 0.1, 0.2, 0.3):
+            num_nogo = max(2, round(trials_per_block * density))
+            num_nogo_p, num_nogo_r = num_nogo // 2, num_nogo - num_nogo // 2
+            case = {'params': {'trials_per_block': trials_per_block, 'num_no_go_trials': num_nogo, 'density': density}}
+            try:
+                sampler = NogoSampler(pre_block_trials, num_nogo_p, num_nogo_r)
+            except ValueError:
+                case['feasible'] = False
+                results[f'{trials_per_block}_trials_{num_nogo}_nogo'] = case
+                continue
+            rng = random.Random(1)
+            case['feasible'] = True
+            case['params']['valid_sets_log10'] = math.log10(sampler.count)
+            case['build_s'] = time_calls(lambda: NogoSampler(pre_block_trials, num_nogo_p, num_nogo_r),
+                                         number=5 if quick else 20)
+            case['sample_block_s'] = time_calls(lambda: sampler.sample(rng), number=50 if quick else 500)
+            results[f'{trials_per_block}_trials_{num_nogo}_nogo'] = case
+    return results
+
+
+def bench_session_schedule(quick=False):
+    """Compiling the whole trial schedule of a session (trial_schedule.compile_session_schedule)."""
+    results = {}
+    for num_no_go_trials in (0, 8):
+        rng = random.Random(1)
+
+        def compile_schedule():
+            return compile_session_schedule(PATTERN_SEQUENCE, 80, 30, num_practice_blocks=3,
+                                            no_go_trials_enabled=num_no_go_trials > 0, num_no_go_trials=num_no_go_trials,
+                                            rng=rng)
+
+        timing = time_calls(compile_schedule, repeat=3 if quick else 5)
+        results[f'{num_no_go_trials}_nogo'] = {
+            'params': {'trials_per_block': 80, 'num_blocks': 30, 'num_practice_blocks': 3, 'num_no_go_trials': num_no_go_trials},
+            'compile_s': timing,
+            'trials_per_s': 33 * 80 / timing['min'],
+        }
+    return results
+
+
+def bench_triplet_classification(quick=False):
+    """
+    Triplet classification throughput: trial_schedule.classify_triplet, called
+    once per trial as when the schedule is compiled, and the vectorized
+    relabelling of the analysis pipeline (asrt_pipeline.relabel_triplets).
+    """
+    from analysis.asrt_pipeline import relabel_triplets
+
+    schedule = compile_session_schedule(PATTERN_SEQUENCE, 80, 30, rng=random.Random(1))
+    positions = schedule['stimulus_position_num'].tolist()
+    trials_in_block = schedule['trial_in_block_num'].tolist()
+    trial_types = schedule['trial_type'].tolist()
+    num_trials = len(positions)
+
+    def classify_session():
+        for i in range(num_trials):
+            tib = trials_in_block[i]
+            classify_triplet(trial_types[i], tib, positions[i],
+                             positions[i - 1] if tib > 1 else None,
+                             positions[i - 2] if tib > 2 else None,
+                             PATTERN_SEQUENCE)
+
+    classify = time_calls(classify_session, repeat=3 if quick else 7)
+
+    # The relabelling gets a cohort: the session replicated (40 times, 4 with quick)
+    copies = 4 if quick else 40
+    sequence_used = np.full(num_trials * copies, ''.join(map(str, PATTERN_SEQUENCE)))
+    position_column = np.tile(schedule['stimulus_position_num'], copies)
+    trial_in_block_column = np.tile(schedule['trial_in_block_num'], copies)
+    relabel = time_calls(lambda: relabel_triplets(position_column, trial_in_block_column, sequence_used),
+                         repeat=3 if quick else 7)
+
+    return {
+        'classify_triplet': {'params': {'trials': num_trials}, 'session_s': classify, 'trials_per_s': num_trials / classify['min']},
+        'relabel_triplets': {'params': {'rows': num_trials * copies}, 'cohort_s': relabel,
+                             'rows_per_s': num_trials * copies / relabel['min']},
+    }
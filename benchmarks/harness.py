@@ -0,0 +1,173 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FOLDER = os.path.join(REPO_DIR, 'benchmarks', 'results')
+# Bumped when the layout of the result file changes
+RESULTS_VERSION = 1
+
+
+def use_headless_psychopy():
+    """
+    The task modules import psychopy.core (for its clock). Without PsychoPy
+    (e.g. on a headless Linux box), the headless modules of simulation.py stand
+    in for it. The benchmarks pass time.perf_counter as the clock wherever the
+    task takes one, so the results do not depend on which is used.
+    """
+    try:
+        import psychopy.core
+    except ImportError:
+        from simulation import HeadlessBackend
+        sys.modules.update(HeadlessBackend().modules())
+
+
+def time_calls(func, number=1, repeat=5):
+    """
+    Times func() over repeat rounds of number calls.
+
+    Returns:
+        dict: Seconds per call: 'min' (the best round, the least disturbed
+            estimate) and 'median' of the rounds, plus 'calls' in total.
+    """
+    per_call = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - start) / number)
+    per_call.sort()
+    return {'min': per_call[0], 'median': per_call[len(per_call) // 2], 'calls': number * repeat}
+
+
+def distribution(samples):
+    """Returns the mean, median, 99th percentile and maximum of a list of durations (seconds)."""
+    if not samples:
+        return {'n': 0, 'mean': math.nan, 'median': math.nan, 'p99': math.nan, 'max': math.nan}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        'n': n,
+        'mean': sum(ordered) / n,
+        'median': ordered[n // 2],
+        'p99': ordered[min(n - 1, int(n * 0.99))],
+        'max': ordered[-1],
+    }
+
+
+def environment():
+    """Describes the machine and the code the benchmarks ran on."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'numpy': numpy_version,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'hostname': platform.node(),
+        'git_commit': commit,
+    }
+
+
+def results_filename():
+    return os.path.join(RESULTS_FOLDER, f"benchmarks_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}.json")
+
+
+def save_results(filename, results):
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    with open(filename, 'w', encoding='utf-8') as f:
+        # NaN (a metric that could not be measured) is written as null
+        json.dump(_nan_to_none(results), f, indent=2)
+        f.write('\n')
+
+
+def load_results(filename):
+    """
+    Reads a result file written by save_results.
+
+    Raises:
+        ValueError: If the file is not a result file of this version.
+    """
+    with open(filename, encoding='utf-8') as f:
+        results = json.load(f)
+    if not isinstance(results, dict) or results.get('version') != RESULTS_VERSION:
+        raise ValueError(f"'{filename}' is not a version {RESULTS_VERSION} benchmark result file.")
+    return results
+
+
+def flatten_metrics(benchmarks):
+    """
+    Returns ({'benchmark/case/metric/...': value} for every numeric metric of a
+    results 'benchmarks' dict, {'benchmark/case': params} for every case with
+    'params'). The params of a case are not metrics.
+    """
+    flat, params = {}, {}
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            if 'params' in value:
+                params[prefix] = value['params']
+            for key, item in value.items():
+                if key != 'params':
+                    walk(f"{prefix}/{key}" if prefix else str(key), item)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix] = value
+
+    walk('', benchmarks)
+    return flat, params
+
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Prints the metrics that changed by more than threshold (relative) between
+    two result files, e.g. to check a change to the trial loop against the
+    last run. Cases run with different params are skipped, and so are the
+    maxima (a single sample each). For a rate (per_s) higher is better, for
+    anything else lower is better.
+    """
+    old, old_params = flatten_metrics(baseline['benchmarks'])
+    new, new_params = flatten_metrics(current['benchmarks'])
+    print(f"Compared with {baseline['created']} ({baseline['environment'].get('git_commit')}):")
+    if baseline.get('quick') != current.get('quick'):
+        print("  (one of the runs used --quick; only cases with the same params are compared)")
+    changed = 0
+    for key in sorted(old.keys() & new.keys()):
+        if key.endswith(('/calls', '/n', '/max')) or not old[key]:
+            continue
+        case = max((prefix for prefix in old_params if key.startswith(prefix + '/')), key=len, default=None)
+        if case is not None and old_params[case] != new_params.get(case):
+            continue
+        ratio = new[key] / old[key]
+        if abs(ratio - 1) <= threshold:
+            continue
+        better = ratio > 1 if key.endswith('per_s') else ratio < 1
+        print(f"  {key}: {old[key]:.4g} -> {new[key]:.4g} ({(ratio - 1) * 100:+.0f}%, {'better' if better else 'worse'})")
+        changed += 1
+    if not changed:
+        print(f"  no metric changed by more than {threshold * 100:.0f}%")
+
+
+def _nan_to_none(value):
+    if isinstance(value, dict):
+        return {key: _nan_to_none(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_nan_to_none(item) for item in value]
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
@@ -0,0 +1,109 @@
+from trial_record import NA_MW_RATING
+
+# Triplet types (see trial_schedule.classify_triplet) and trial types in the order they are reported
+TRIPLET_TYPES = ('H', 'L', 'T', 'R', 'X')
+TRIAL_TYPES = ('P', 'R')
+
+
+class _Accumulator:
+    """Running counts of go trials (first responses) and RT sum of the correct ones."""
+    __slots__ = ('trials', 'correct', 'rt_sum')
+
+    def __init__(self):
+        self.trials = 0
+        self.correct = 0
+        self.rt_sum = 0.0
+
+    def add(self, correct, rt):
+        self.trials += 1
+        if correct:
+            self.correct += 1
+            self.rt_sum += rt
+
+    def summary(self):
+        return {
+            'trials': self.trials,
+            'accuracy': self.correct / self.trials if self.trials else None,
+            'mean_rt_s': self.rt_sum / self.correct if self.correct else None
+        }
+
+
+class BlockStats:
+    """
+    Block statistics updated as each trial record is logged, so nothing has to be
+    recomputed from the block's rows at the end of the block.
+
+    The feedback values (feedback()) keep the definitions of the block feedback:
+    mean RT of the correct go responses and the percentage of correct go responses
+    among all go responses. The summary (summary()) describes trials by their first
+    response: accuracy and mean RT of the correct first responses per triplet type
+    and per trial type, the L - H differences and the no-go commission errors.
+    """
+    def __init__(self, block_info):
+        self.block_info = block_info
+        self.go_responses = 0
+        self.go_correct = 0
+        self.go_correct_rt_sum = 0.0
+        self.nogo_trials = 0
+        self.commissions = 0
+        self.by_triplet = {triplet_type: _Accumulator() for triplet_type in TRIPLET_TYPES}
+        self.by_trial_type = {trial_type: _Accumulator() for trial_type in TRIAL_TYPES}
+
+    def add(self, record):
+        """Updates the statistics with one TrialRecord."""
+        if record.is_nogo:
+            self.nogo_trials += 1
+            if not record.correct_response:
+                self.commissions += 1
+            return
+        self.go_responses += 1
+        if record.correct_response:
+            self.go_correct += 1
+            self.go_correct_rt_sum += record.rt_cumulative_s
+        if record.is_first_response:
+            rt = record.rt_cumulative_s
+            if record.triplet_type not in self.by_triplet:
+                self.by_triplet[record.triplet_type] = _Accumulator()
+            self.by_triplet[record.triplet_type].add(record.correct_response, rt)
+            if record.trial_type not in self.by_trial_type:
+                self.by_trial_type[record.trial_type] = _Accumulator()
+            self.by_trial_type[record.trial_type].add(record.correct_response, rt)
+
+    def feedback(self):
+        """
+        Returns:
+            tuple: (mean RT of the correct go responses in s, accuracy in %); 0 if there were none.
+        """
+        mean_rt = self.go_correct_rt_sum / self.go_correct if self.go_correct else 0
+        accuracy = self.go_correct / self.go_responses * 100 if self.go_responses else 0
+        return mean_rt, accuracy
+
+    def summary(self):
+        """Returns the block summary as a JSON-serializable dict (one line of the block summary file)."""
+        info = self.block_info
+        by_triplet = {triplet_type: acc.summary() for triplet_type, acc in self.by_triplet.items()}
+        high, low = by_triplet['H'], by_triplet['L']
+        mean_rt, accuracy = self.feedback()
+        return {
+            'participant': info.participant,
+            'session': info.session,
+            'block_number': info.block_number,
+            'is_practice': info.is_practice,
+            'epoch': info.epoch,
+            'go_responses': self.go_responses,
+            'feedback_mean_rt_s': mean_rt,
+            'feedback_accuracy_pct': accuracy,
+            'triplet_types': by_triplet,
+            'trial_types': {trial_type: acc.summary() for trial_type, acc in self.by_trial_type.items()},
+            'rt_l_minus_h_s': _difference(low['mean_rt_s'], high['mean_rt_s']),
+            'accuracy_h_minus_l': _difference(high['accuracy'], low['accuracy']),
+            'nogo_trials': self.nogo_trials,
+            'commission_errors': self.commissions,
+            'mind_wandering_ratings': [None if rating == NA_MW_RATING else rating for rating in info.mw_ratings]
+        }
+
+
+def _difference(a, b):
+    if a is None or b is None:
+        return None
+    return a - b
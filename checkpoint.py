@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import random
+from datetime import datetime
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_filename(data_filename):
+    return data_filename.replace('.csv', '_checkpoint.json')
+
+
+def schedule_filename(data_filename):
+    return data_filename.replace('.csv', '_schedule.npy')
+
+
+def interrupted_rows_filename(data_filename):
+    return data_filename.replace('.csv', '_interrupted_rows.csv')
+
+
+def file_digest(filename):
+    """Returns the SHA-256 of a file's content."""
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def save_schedule(data_filename, schedule):
+    """Saves the compiled session schedule next to the data file and returns the file's digest."""
+    filename = schedule_filename(data_filename)
+    np.save(filename, schedule, allow_pickle=False)
+    return file_digest(filename)
+
+
+def next_block_position(is_practice, block_number, num_practice_blocks, num_blocks):
+    """
+    Returns the block that follows (is_practice, block_number) as (is_practice, block_number),
+    or None if it was the last block of the session.
+    """
+    if is_practice and block_number < num_practice_blocks:
+        return True, block_number + 1
+    if is_practice:
+        return (False, 1) if num_blocks > 0 else None
+    return (False, block_number + 1) if block_number < num_blocks else None
+
+
+def make_checkpoint(exp_info, data_filename, settings_digest, schedule_digest, sequence_used,
+                    next_position, total_trial_count, resume_count=0):
+    """
+    Builds the checkpoint of a block boundary: where the session continues
+    (next_position, see next_block_position; None once the session is complete),
+    the trial counter, the state of the random module and what is needed to
+    check that a resume continues the same session. The DataWriter adds the
+    sizes of the output files when it writes the checkpoint after the block.
+    """
+    version, internal_state, gauss_next = random.getstate()
+    return {
+        'version': CHECKPOINT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'participant': exp_info['participant'],
+        'session': exp_info['session'],
+        'language': exp_info['language'],
+        'data_file': os.path.basename(data_filename),
+        'settings_digest': settings_digest,
+        'schedule_digest': schedule_digest,
+        'sequence_used': sequence_used,
+        'complete': next_position is None,
+        'next_is_practice': next_position[0] if next_position else None,
+        'next_block': next_position[1] if next_position else None,
+        'total_trial_count': total_trial_count,
+        'resume_count': resume_count,
+        'random_state': [version, list(internal_state), gauss_next]
+    }
+
+
+def write_checkpoint(filename, checkpoint):
+    """Writes the checkpoint atomically, so a crash leaves either the old or the new one."""
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_filename, filename)
+
+
+def load_checkpoint(filename):
+    """
+    Reads a checkpoint written by write_checkpoint.
+
+    Raises:
+        ValueError: If the file is not a checkpoint of this version, lacks the
+            output file sizes, or belongs to a session that is already complete.
+    """
+    with open(filename, encoding='utf-8') as f:
+        try:
+            checkpoint = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"'{filename}' is not a valid checkpoint: {e}") from e
+    if not isinstance(checkpoint, dict) or checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"'{filename}' is not a version {CHECKPOINT_VERSION} checkpoint.")
+    if 'data_file_size' not in checkpoint:
+        raise ValueError(f"'{filename}' does not record the data file size.")
+    if checkpoint['complete']:
+        raise ValueError(f"The session of '{filename}' is already complete.")
+    return checkpoint
+
+
+def restore_random_state(checkpoint):
+    version, internal_state, gauss_next = checkpoint['random_state']
+    random.setstate((version, tuple(internal_state), gauss_next))
+
+
+def load_schedule(data_filename, checkpoint):
+    """
+    Loads the schedule saved at the start of the session.
+
+    Raises:
+        ValueError: If the schedule file changed since the checkpoint was written.
+    """
+    filename = schedule_filename(data_filename)
+    if file_digest(filename) != checkpoint['schedule_digest']:
+        raise ValueError(f"'{filename}' does not match the checkpoint.")
+    return np.load(filename, allow_pickle=False)
+
+
+def rewind_output_files(data_filename, summary_filename, checkpoint):
+    """
+    Rewinds the data and block summary files to the checkpoint before the session
+    continues. The data rows of the interrupted block (committed by quit_experiment
+    after escape, or left in the _partial.csv journal by a crash) are moved to
+    <data>_interrupted_rows.csv, so nothing recorded is lost and the block is run
+    again from its first trial.
+
+    Returns:
+        int: The number of interrupted rows moved.
+    """
+    moved = []
+    with open(data_filename, 'r+b') as f:
+        header = f.readline()
+        f.seek(checkpoint['data_file_size'])
+        moved.extend(line for line in f.read().splitlines(keepends=True) if line.strip())
+        f.seek(checkpoint['data_file_size'])
+        f.truncate()
+
+    journal_filename = data_filename.replace('.csv', '_partial.csv')
+    if os.path.exists(journal_filename):
+        with open(journal_filename, 'rb') as f:
+            moved.extend(line for line in f.readlines()[1:] if line.strip())
+        os.remove(journal_filename)
+
+    if moved:
+        interrupted_filename = interrupted_rows_filename(data_filename)
+        is_new = not os.path.exists(interrupted_filename)
+        with open(interrupted_filename, 'ab') as f:
+            if is_new:
+                f.write(header)
+            f.writelines(moved)
+
+    if summary_filename and os.path.exists(summary_filename):
+        with open(summary_filename, 'r+b') as f:
+            f.truncate(checkpoint['summary_file_size'])
+    return len(moved)
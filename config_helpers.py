@@ -1,36 +1,167 @@
 import configparser
+import io
+import marshal
+import os
+import sys
+import types
 
-# Global variable to hold the single, central text configuration
-GLOBAL_TEXT_CONFIG = None
+# Global variable to hold the single, central language pack ((section, option) -> text)
+GLOBAL_TEXT_PACK = None
+
+LANGUAGES = ('en', 'es', 'hu')
+LANGUAGE_FOLDER = 'language'
+# Bumped when the cached pack format changes
+PACK_CACHE_VERSION = 1
+
+_MW_QUESTIONS = ('q1', 'q2_mw', 'q3_mw', 'q4_mw', 'q2_on_task', 'q3_on_task', 'q4_on_task')
+
+# Texts the code looks up without a default: every language must define them
+REQUIRED_TEXT_KEYS = frozenset(
+    [('Instructions', 'welcome_screen'), ('Instructions', 'nogo_screen')]
+    + [('MW_Probes', option) for option in ('mw_intro', 'mw_q1', 'mw_q2_off_task', 'mw_q3_spontaneous', 'mw_q4_affective',
+                                             'mw_on_task_intro', 'mw_on_task_follow_up', 'mw_final_note')]
+    + [('Screens', option) for option in ('start_practice', 'start_main', 'end_practice', 'next_practice', 'next_main',
+                                           'end_experiment', 'countdown_message', 'feedback_header', 'feedback_rt',
+                                           'feedback_acc', 'feedback_accurate', 'feedback_faster', 'feedback_good_job')]
+    + [('Quiz', f'quiz_q{n}_{part}') for n in range(1, 10) for part in ('text', 'answer')]
+    + [('Quiz', option) for option in ('quiz_choices_focus', 'quiz_choices_content', 'quiz_choices_spontaneous',
+                                        'quiz_choices_tone', 'quiz_question_feedback_correct',
+                                        'quiz_question_feedback_incorrect', 'quiz_press_key', 'quiz_failed_retry')]
+)
+
+# Texts the code looks up with an (English) default: a language without them falls back to the default
+OPTIONAL_TEXT_KEYS = frozenset(
+    [('MW_Probe_Content', 'q1_primary_question')]
+    + [('MW_Probe_Content', f'{question}_question') for question in _MW_QUESTIONS[1:]]
+    + [('MW_Probe_Content', f'{question}_label_{n}') for question in _MW_QUESTIONS for n in range(1, 5)]
+    + [('Screens', 'prompt_continue'), ('Screens', 'quiz_failure_continue')]
+    + [('Quiz', option) for option in ('quiz_intro', 'quiz_label_key_1', 'quiz_label_key_4', 'quiz_question_header',
+                                        'quiz_passed_congrats', 'quiz_explanation_page1')]
+)
 
 def set_global_text_config(config_object):
     """
-    Sets the global text config object for all modules to use.
-    This is called from main_experiment.py.
+    Sets the global text for all modules to use from a ConfigParser
+    (compiled into a language pack, see compile_language_pack).
+    """
+    set_language_pack(compile_language_pack(config_object))
+
+def set_language_pack(pack):
+    """Sets the global language pack for all modules to use. This is called from asrt.py."""
+    global GLOBAL_TEXT_PACK
+    GLOBAL_TEXT_PACK = pack
+
+def compile_language_pack(config_object):
+    """
+    Compiles a parsed language file into a read-only mapping of
+    (section, option) -> text, with the escaped newlines (\\n) already converted.
+    """
+    return types.MappingProxyType({
+        (section, option): value.replace('\\n', '\n')
+        for section in config_object.sections()
+        for option, value in config_object.items(section, raw=True)
+    })
+
+def language_filename(language_code, folder=LANGUAGE_FOLDER):
+    return os.path.join(folder, f'experiment_text_{language_code}.ini')
+
+def load_language_pack(language_code, folder=LANGUAGE_FOLDER, use_cache=True):
+    """
+    Loads the language pack of a language. The compiled pack is cached in
+    <folder>/__pycache__ and reused as long as the language file is unchanged
+    (same size and modification time), so the INI file is parsed only once.
+
+    Returns:
+        MappingProxyType: (section, option) -> text.
+
+    Raises:
+        FileNotFoundError: If the language file does not exist.
+        ValueError: If the language file is empty or cannot be parsed.
+    """
+    filename = language_filename(language_code, folder)
+    stat = os.stat(filename)
+    cache_filename = os.path.join(folder, '__pycache__', f'experiment_text_{language_code}.pack')
+    cache_key = (PACK_CACHE_VERSION, stat.st_size, stat.st_mtime_ns)
+
+    if use_cache:
+        try:
+            with open(cache_filename, 'rb') as f:
+                key, texts = marshal.load(f)
+            if tuple(key) == cache_key:
+                return types.MappingProxyType(texts)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+    text_config = configparser.ConfigParser()
+    with io.open(filename, mode='r', encoding='utf-8-sig') as f:
+        file_content = f.read()
+    try:
+        text_config.read_string(file_content.strip())
+    except configparser.Error as e:
+        raise ValueError(f"Text file '{filename}' cannot be parsed: {e}") from e
+    if not text_config.sections():
+        raise ValueError(f"Text file '{filename}' is empty.")
+    pack = compile_language_pack(text_config)
+
+    if use_cache:
+        try:
+            os.makedirs(os.path.dirname(cache_filename), exist_ok=True)
+            temp_filename = cache_filename + '.tmp'
+            with open(temp_filename, 'wb') as f:
+                marshal.dump((cache_key, dict(pack)), f)
+            os.replace(temp_filename, cache_filename)
+        except OSError:
+            # A read-only language folder only costs the parsing at the next startup
+            pass
+    return pack
+
+def validate_language_pack(pack):
     """
-    global GLOBAL_TEXT_CONFIG
-    GLOBAL_TEXT_CONFIG = config_object
+    Checks a language pack against the texts the code uses.
+
+    Returns:
+        tuple: (sorted missing required keys, sorted missing optional keys).
+    """
+    missing_required = sorted(key for key in REQUIRED_TEXT_KEYS if key not in pack)
+    missing_optional = sorted(key for key in OPTIONAL_TEXT_KEYS if key not in pack)
+    return missing_required, missing_optional
 
 def get_text_with_newlines(section, option, default=None):
     """
-    Retrieves text from the GLOBAL config, converts escaped newlines (\n),
+    Retrieves text from the GLOBAL language pack (newlines already converted)
     and provides a default if the option is not found.
-    
-    This version correctly handles special UTF-8 characters.
     """
-    global GLOBAL_TEXT_CONFIG
-    
-    if GLOBAL_TEXT_CONFIG is None:
-        print("Error in config_helpers: GLOBAL_TEXT_CONFIG has not been set.")
+    if GLOBAL_TEXT_PACK is None:
+        print("Error in config_helpers: GLOBAL_TEXT_PACK has not been set.")
         return default if default is not None else "CONFIG_ERROR"
-    
-    try:
-        text_content = GLOBAL_TEXT_CONFIG.get(section, option, raw=True)
-        return text_content.replace('\\n', '\n')
-        
-    except (configparser.NoOptionError, configparser.NoSectionError):
-        if default is not None:
-            return default
-        else:
-            print(f"Error: Missing config text for [{section}] -> {option}")
-            return f"MISSING_TEXT: [{section}] {option}"
\ No newline at end of file
+
+    text_content = GLOBAL_TEXT_PACK.get((section, option))
+    if text_content is not None:
+        return text_content
+    if default is not None:
+        return default
+    print(f"Error: Missing config text for [{section}] -> {option}")
+    return f"MISSING_TEXT: [{section}] {option}"
+
+def main(argv=None):
+    """Checks (and caches) the language packs: python config_helpers.py [language ...]"""
+    languages = (argv if argv is not None else sys.argv[1:]) or LANGUAGES
+    failed = False
+    for language_code in languages:
+        try:
+            missing_required, missing_optional = validate_language_pack(load_language_pack(language_code))
+        except (OSError, ValueError) as e:
+            print(f"{language_code}: {e}")
+            failed = True
+            continue
+        for section, option in missing_required:
+            print(f"{language_code}: missing [{section}] {option}")
+        for section, option in missing_optional:
+            print(f"{language_code}: missing [{section}] {option} (the English default is used)")
+        failed = failed or bool(missing_required)
+        if not missing_required and not missing_optional:
+            print(f"{language_code}: OK")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,153 @@
+import atexit
+import csv
+import json
+import os
+import queue
+import threading
+from checkpoint import write_checkpoint
+
+FLUSH_POLICIES = ('trial', 'block')
+
+
+class DataWriter:
+    """
+    Streams trial rows to the session CSV from a background thread.
+
+    The data file stays open for the whole session. The task only puts records on
+    a queue (write_row); the writer thread formats them and does all disk I/O.
+    A record is any object whose as_row() returns its values in fieldnames order
+    (see trial_record.TrialRecord). Rows of the running block go to a journal file
+    (<data file>_partial.csv) as they arrive, so a crash loses at most the rows not
+    yet flushed. finish_block() appends the block's rows to the data file and
+    empties the journal; the rows are formatted again at that point, so block-level
+    values set after the trials (the MW ratings) are included. close() writes
+    whatever is still pending and closes both files; it is safe to call more than
+    once and also runs at interpreter exit.
+
+    With a summary_filename, finish_block() can also append one JSON line per
+    block (e.g. block_stats.BlockStats.summary()) to that file. With a
+    checkpoint_filename, finish_block() can also write a checkpoint (see
+    checkpoint.make_checkpoint) once the block is on disk; the sizes of the data
+    and summary files are added to it, so a resume can rewind them to this point.
+    append=True continues existing files (a resumed session) instead of
+    starting new ones.
+
+    Flush policy: 'trial' flushes the journal after every row, 'block' only at the
+    end of each block. With fsync=True every flush is also synced to disk.
+    """
+    def __init__(self, filename, fieldnames, flush_policy='trial', fsync=True, summary_filename=None,
+                 checkpoint_filename=None, append=False):
+        if flush_policy not in FLUSH_POLICIES:
+            raise ValueError(f"flush_policy must be one of {FLUSH_POLICIES}, got '{flush_policy}'.")
+        self.filename = filename
+        self.journal_filename = filename.replace('.csv', '_partial.csv')
+        self.fieldnames = fieldnames
+        self.flush_policy = flush_policy
+        self.fsync = fsync
+        self.rows_written = 0
+        self.errors = 0
+
+        self._file = open(filename, 'a' if append else 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if not append:
+            self._writer.writerow(fieldnames)
+            self._sync(self._file)
+        self._journal = open(self.journal_filename, 'w', newline='', encoding='utf-8')
+        self._journal_writer = csv.writer(self._journal)
+        self._journal_writer.writerow(fieldnames)
+        self.summary_filename = summary_filename
+        self._summary_file = open(summary_filename, 'a' if append else 'w', encoding='utf-8') if summary_filename else None
+        self.checkpoint_filename = checkpoint_filename
+
+        self._block_rows = []
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_loop, name='DataWriter', daemon=True)
+        self._thread.start()
+        # Also flush on sys.exit()/core.quit() and uncaught exceptions
+        atexit.register(self.close)
+
+    def write_row(self, record):
+        """Queues one record of the running block. It is not copied, so it must not change afterwards."""
+        if not self._closed:
+            self._queue.put(('row', record))
+
+    def finish_block(self, summary=None, checkpoint=None):
+        """
+        Queues the end of the block: its rows move to the data file, summary (a dict)
+        goes to the summary file and then checkpoint (a dict) to the checkpoint file.
+        """
+        if not self._closed:
+            self._queue.put(('block', (summary, checkpoint)))
+
+    def write_checkpoint(self, checkpoint):
+        """Queues a checkpoint outside a block boundary (e.g. at the start of the session)."""
+        if not self._closed:
+            self._queue.put(('checkpoint', checkpoint))
+
+    def close(self, timeout=10.0):
+        """Writes all queued and pending rows, closes the files and stops the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(('close', None))
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            print(f"ERROR: Data writer did not finish within {timeout} s; see {self.journal_filename}")
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _write_loop(self):
+        while True:
+            kind, payload = self._queue.get()
+            try:
+                if kind == 'row':
+                    self._block_rows.append(payload)
+                    self._journal_writer.writerow(payload.as_row())
+                    if self.flush_policy == 'trial':
+                        self._sync(self._journal)
+                elif kind == 'block':
+                    summary, checkpoint = payload
+                    self._commit_block()
+                    if summary is not None and self._summary_file:
+                        self._summary_file.write(json.dumps(summary) + '\n')
+                        self._sync(self._summary_file)
+                    if checkpoint is not None and self.checkpoint_filename:
+                        self._write_checkpoint(checkpoint)
+                elif kind == 'checkpoint':
+                    if self.checkpoint_filename:
+                        self._write_checkpoint(payload)
+                elif kind == 'close':
+                    # Rows of an unfinished block (escape, crash) are kept as they are
+                    self._commit_block()
+                    self._file.close()
+                    self._journal.close()
+                    if self._summary_file:
+                        self._summary_file.close()
+                    os.remove(self.journal_filename)
+                    return
+            except Exception as e:
+                self.errors += 1
+                print(f"ERROR: Data writer failed ({kind}): {e}")
+                if kind == 'close':
+                    return
+
+    def _write_checkpoint(self, checkpoint):
+        checkpoint = dict(checkpoint)
+        checkpoint['data_file_size'] = os.fstat(self._file.fileno()).st_size
+        checkpoint['summary_file_size'] = os.fstat(self._summary_file.fileno()).st_size if self._summary_file else 0
+        write_checkpoint(self.checkpoint_filename, checkpoint)
+
+    def _commit_block(self):
+        self._writer.writerows(record.as_row() for record in self._block_rows)
+        self._sync(self._file)
+        self.rows_written += len(self._block_rows)
+        self._block_rows = []
+
+        self._journal.seek(0)
+        self._journal.truncate()
+        self._journal_writer.writerow(self.fieldnames)
+        self._sync(self._journal)
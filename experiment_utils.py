@@ -1,60 +1,140 @@
 from psychopy import visual, core
 from datetime import datetime
-import serial
+import atexit
 import csv
+import math
 import os
+import threading
+import time
+from collections import deque
+from triggers import TriggerDispatcher
 
 class LogTee:
-    """Captures stdout, adds timestamps, and writes to both console and file."""
-    def __init__(self, filename, original_stream):
-        self.file = open(filename, 'w', encoding='utf-8')
+    """
+    Captures stdout, adds timestamps, and writes to both console and file.
+
+    write() only appends the message with a perf_counter timestamp to a queue, so
+    a print in the trial loop costs no formatting or I/O. A background thread
+    takes the queued messages every drain_interval seconds, turns the timestamps
+    into wall-clock times, writes them to the console and the file in one batch,
+    and flushes the file at least every flush_interval seconds. close() writes
+    everything still queued before closing the file; it is safe to call more
+    than once and also runs at interpreter exit. Anything printed after close()
+    goes straight to the console.
+    """
+    def __init__(self, filename, original_stream, drain_interval=0.1, flush_interval=0.5, mode='w'):
+        self.file = open(filename, mode, encoding='utf-8')
         self.original_stream = original_stream
-        self.new_line = True 
+        self.drain_interval = drain_interval
+        self.flush_interval = flush_interval
+        self.new_line = True
+        # perf_counter timestamps are turned into wall-clock times from this pair
+        self._wall_start = time.time()
+        self._perf_start = time.perf_counter()
+        # deque.append is atomic, so the writing thread needs no lock
+        self._pending = deque()
+        self._stop = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_loop, name='LogTee', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
 
     def write(self, message):
-        self.original_stream.write(message)
-        self.original_stream.flush()
-
-        if message:
-            timestamp = datetime.now().strftime("[%H:%M:%S.%f]")
-            
-            parts = message.split('\n')
-            
-            for i, part in enumerate(parts):
-                if self.new_line and part:
-                    self.file.write(f"{timestamp} {part}")
-                    self.new_line = False
-                elif part:
-                    self.file.write(part)
-                
-                if i < len(parts) - 1:
-                    self.file.write('\n')
-                    self.new_line = True
-                    
-        self.file.flush()
+        if self._closed:
+            self.original_stream.write(message)
+            return
+        self._pending.append((time.perf_counter(), message))
 
     def flush(self):
-        self.original_stream.flush()
-        self.file.flush()
+        # Flushing is done by the writer thread; a flush request must not block the caller
+        if self._closed:
+            self.original_stream.flush()
+
+    def close(self, timeout=10.0):
+        """Writes all queued messages, closes the file and stops the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        if not self._thread.is_alive():
+            self.file.close()
+
+    def _write_loop(self):
+        last_flush = time.perf_counter()
+        dirty = False
+        while True:
+            stop = self._stop.wait(self.drain_interval)
+            items = []
+            while self._pending:
+                items.append(self._pending.popleft())
+            if items:
+                self.original_stream.write(''.join(message for _, message in items))
+                self.original_stream.flush()
+                self.file.write(''.join(self._format(perf_time, message) for perf_time, message in items))
+                dirty = True
+            now = time.perf_counter()
+            if dirty and (stop or now - last_flush >= self.flush_interval):
+                self.file.flush()
+                last_flush = now
+                dirty = False
+            if stop:
+                return
 
-    def close(self):
-        self.file.close()
+    def _format(self, perf_time, message):
+        if not message:
+            return ''
+        timestamp = datetime.fromtimestamp(self._wall_start + perf_time - self._perf_start).strftime("[%H:%M:%S.%f]")
+        out = []
+        parts = message.split('\n')
+        for i, part in enumerate(parts):
+            if self.new_line and part:
+                out.append(f"{timestamp} {part}")
+                self.new_line = False
+            elif part:
+                out.append(part)
+            if i < len(parts) - 1:
+                out.append('\n')
+                self.new_line = True
+        return ''.join(out)
+
+def open_riponda_port(port_name, baudrate):
+    """
+    Opens the Riponda response box port (non-blocking reads).
+
+    Returns:
+        serial.Serial or None: The open port, or None if it cannot be opened.
+    """
+    try:
+        import serial
+        return serial.Serial(port=port_name, baudrate=baudrate, timeout=0)
+    except Exception as e:
+        print(f"Riponda port {port_name} not found: {e}")
+        return None
 
 def send_trigger_pulse(ser_port, trigger_value, pulse_duration=0.05):
-    """Sends a trigger pulse (value, duration) and resets the port to 0."""
+    """
+    Sends a trigger pulse (value, duration) and resets the port to 0.
+    With a TriggerDispatcher the call returns immediately and the reset happens
+    in the background; with a plain serial port it blocks for pulse_duration.
+    Returns the time the trigger byte was written (None if it was queued or not sent).
+    """
     print(f"Trigger sent: {trigger_value}") 
     
-    if ser_port:
+    if isinstance(ser_port, TriggerDispatcher):
+        return ser_port.pulse(trigger_value)
+    elif ser_port:
         try:
+            write_time = core.getTime()
             ser_port.write(bytes([trigger_value]))
             ser_port.flush()
             core.wait(pulse_duration) 
             ser_port.write(bytes([0]))
             ser_port.flush()
+            return write_time
         except Exception as e:
             print(f"Error writing to serial port: {e}")
-    else:
-        pass
+    return None
 
 def save_and_quit(win, unique_filename, all_data):
     """Saves all collected data to the unique CSV file and quits."""
@@ -69,6 +149,56 @@ def save_and_quit(win, unique_filename, all_data):
     win.close()
     core.quit()
 
+def build_target_image_pool(win, positions, target_image_path, nogo_image_path, image_size):
+    """
+    Creates one ready ImageStim per (position index, is_nogo) pair. The images
+    are resized to image_size once and uploaded as textures here, so choosing
+    the target image during a trial is only a dictionary lookup.
+    """
+    from PIL import Image
+
+    scaled_images = {}
+    for is_nogo, path in ((False, target_image_path), (True, nogo_image_path)):
+        with Image.open(path) as img:
+            scaled_images[is_nogo] = img.convert('RGBA').resize((image_size, image_size), Image.LANCZOS)
+
+    image_pool = {}
+    for pos_index, pos in enumerate(positions):
+        for is_nogo, scaled_image in scaled_images.items():
+            image_pool[(pos_index, is_nogo)] = visual.ImageStim(
+                win=win, image=scaled_image, size=image_size, pos=pos, interpolate=True,
+                name=f"{'nogo' if is_nogo else 'target'}_{pos_index + 1}"
+            )
+    return image_pool
+
+def print_target_prep_summary(prep_times):
+    """Logs how long preparing the target frame (before the onset flip) took in a block."""
+    if not prep_times:
+        return
+    prep_ms = [t * 1000 for t in prep_times]
+    print(f"Target frame preparation: mean {sum(prep_ms) / len(prep_ms):.3f} ms, max {max(prep_ms):.3f} ms ({len(prep_ms)} trials)")
+
+def print_poll_summary(poll_stats):
+    """Logs the cost of the input polls made in a block (see input_events.InputBus)."""
+    if not poll_stats['polls']:
+        return
+    mean_us = poll_stats['total_s'] / poll_stats['polls'] * 1e6
+    print(f"Input polling: {poll_stats['polls']} polls, mean {mean_us:.1f} us, max {poll_stats['max_s'] * 1e6:.1f} us")
+
+def print_frame_timing_summary(summary, label='Frame timing'):
+    """Logs the ISI and trigger timing of a block or session (see frame_timing.summarize)."""
+    if not summary['trials']:
+        return
+    message = (f"{label}: {summary['trials']} trials, {summary['dropped_frames']} dropped frames in "
+               f"{summary['trials_with_drops']} trials, ISI error mean {summary['isi_error_mean_s'] * 1000:.3f} ms, "
+               f"max {summary['isi_error_max_s'] * 1000:.3f} ms")
+    if not math.isnan(summary['trigger_latency_mean_s']):
+        message += (f", flip-to-trigger latency mean {summary['trigger_latency_mean_s'] * 1000:.3f} ms, "
+                    f"max {summary['trigger_latency_max_s'] * 1000:.3f} ms")
+    if summary['screens']:
+        message += f", {summary['screens']} timed screens, max error {summary['screen_error_max_s'] * 1000:.3f} ms"
+    print(message)
+
 def draw_example_buttons(win, details):
     """
     Draws non-interactive buttons for instruction screens.
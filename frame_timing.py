@@ -0,0 +1,253 @@
+import math
+from collections import namedtuple
+import numpy as np
+from psychopy import core
+
+DEFAULT_FRAME_PERIOD = 1.0 / 60
+
+# Timing of one trial. Times are on the PsychoPy clock (s); isi_error_s is the actual
+# ISI minus the intended number of frames; trigger_latency_s is NaN if no trigger time is known.
+TrialTiming = namedtuple('TrialTiming', [
+    'block_number', 'is_practice', 'trial_number', 'isi_flip_s', 'onset_flip_s', 'intended_isi_s',
+    'intended_isi_frames', 'actual_isi_s', 'isi_error_s', 'dropped_frames', 'trigger_latency_s'
+])
+
+# A screen held for a number of frames (no-go window, feedback). Its actual duration
+# runs from its own flip to the next flip; trial_number is 0 outside trials.
+ScreenTiming = namedtuple('ScreenTiming', [
+    'kind', 'trial_number', 'start_flip_s', 'intended_frames', 'actual_s', 'error_s'
+])
+
+
+def measure_frame_period(win, fallback=DEFAULT_FRAME_PERIOD):
+    """
+    Measures the refresh period of the display by timing a run of flips.
+
+    Args:
+        win (psychopy.visual.Window): The experiment window.
+        fallback (float): Period (s) used if no stable rate can be measured.
+
+    Returns:
+        float: The frame period in seconds.
+    """
+    try:
+        rate = win.getActualFrameRate(nIdentical=20, nMaxFrames=240, nWarmUpFrames=20, threshold=1)
+    except Exception as e:
+        print(f"Frame rate measurement failed: {e}")
+        rate = None
+    if not rate:
+        print(f"WARNING: No stable frame rate measured; assuming {1.0 / fallback:.2f} Hz")
+        return fallback
+    print(f"Measured frame rate: {rate:.3f} Hz ({1000.0 / rate:.3f} ms per frame)")
+    return 1.0 / rate
+
+
+class FrameTimingRecorder:
+    """
+    Records the timestamp of every win.flip() and the timing of each trial.
+
+    The recorder wraps win.flip, so all flips of the session (trials, instructions,
+    probes) are timestamped without changing the calling code. For each trial the
+    task reports its ISI flip, onset flip and trigger write time (add_trial); the
+    recorder derives the actual ISI, its error against the intended ISI, the number
+    of frames dropped in the ISI and the flip-to-trigger latency. Everything is kept
+    in memory and written once, as a compressed NumPy sidecar file (save).
+    Screens held for a number of frames are registered with add_screen; their
+    duration is taken from the flip that ends them.
+    """
+    def __init__(self, win, frame_period, clock=core.getTime):
+        self.win = win
+        self.frame_period = frame_period
+        self.clock = clock
+        self.flip_times = []
+        self.trials = []
+        self.screens = []
+        self._block_start = 0
+        self._screen_block_start = 0
+        self._pending_screen = None
+        self._flip = win.flip
+        win.flip = self._record_flip
+
+    def _record_flip(self, *args, **kwargs):
+        flip_time = self._flip(*args, **kwargs)
+        if flip_time is None:
+            flip_time = self.clock()
+        self.flip_times.append(flip_time)
+        if self._pending_screen is not None:
+            kind, trial_number, start_flip_time, intended_frames = self._pending_screen
+            actual = flip_time - start_flip_time
+            self.screens.append(ScreenTiming(kind, trial_number, start_flip_time, intended_frames, actual,
+                                             actual - intended_frames * self.frame_period))
+            self._pending_screen = None
+        return flip_time
+
+    def expected_isi_frames(self, isi_duration):
+        """Frames from the ISI flip to the onset flip for a wait of isi_duration followed by a flip."""
+        return int(math.floor(isi_duration / self.frame_period + 1e-6)) + 1
+
+    def add_trial(self, block_number, is_practice, trial_number, isi_flip_time, onset_flip_time, isi_duration, trigger_time=None, intended_frames=None):
+        """
+        Records the timing of one trial.
+
+        Args:
+            block_number (int): Block of the trial.
+            is_practice (bool): Whether the block is a practice block.
+            trial_number (int): Cumulative trial number.
+            isi_flip_time (float): Return value of the flip that started the ISI.
+            onset_flip_time (float): Return value of the target onset flip.
+            isi_duration (float): Intended ISI (s), as in the settings.
+            trigger_time (float, optional): When the onset trigger was written (None if it was queued or not sent).
+            intended_frames (int, optional): Intended ISI in frames (default: see expected_isi_frames).
+        """
+        if intended_frames is None:
+            intended_frames = self.expected_isi_frames(isi_duration)
+        actual_isi = onset_flip_time - isi_flip_time
+        dropped_frames = max(0, int(round(actual_isi / self.frame_period)) - intended_frames)
+        trigger_latency = trigger_time - onset_flip_time if trigger_time is not None else math.nan
+        self.trials.append(TrialTiming(
+            block_number, is_practice, trial_number, isi_flip_time, onset_flip_time, isi_duration,
+            intended_frames, actual_isi, actual_isi - intended_frames * self.frame_period, dropped_frames, trigger_latency
+        ))
+
+    def add_screen(self, kind, start_flip_time, intended_frames, trial_number=0):
+        """Records a screen shown at start_flip_time for intended_frames frames; it ends with the next flip."""
+        self._pending_screen = (kind, trial_number, start_flip_time, intended_frames)
+
+    def finish_block(self):
+        """Returns the timing summary of the trials and screens added since the last call (see summarize)."""
+        summary = summarize(self.trials[self._block_start:], self.screens[self._screen_block_start:])
+        self._block_start = len(self.trials)
+        self._screen_block_start = len(self.screens)
+        return summary
+
+    def session_summary(self):
+        """Returns the timing summary of all trials and screens of the session."""
+        return summarize(self.trials, self.screens)
+
+    def save(self, filename):
+        """Writes all flip and trial timings plus per-block summaries to a compressed .npz file."""
+        columns = {field: [getattr(t, field) for t in self.trials] for field in TrialTiming._fields}
+        block_keys = sorted({(t.is_practice, t.block_number) for t in self.trials}, key=lambda k: (not k[0], k[1]))
+        blocks = [summarize([t for t in self.trials if (t.is_practice, t.block_number) == key]) for key in block_keys]
+        arrays = {
+            'frame_period_s': np.float64(self.frame_period),
+            'flip_times_s': np.asarray(self.flip_times, dtype=np.float64),
+            'block_number': np.asarray([k[1] for k in block_keys], dtype=np.int16),
+            'block_is_practice': np.asarray([k[0] for k in block_keys], dtype=bool),
+        }
+        for field, values in columns.items():
+            arrays[f"trial_{field}"] = np.asarray(values, dtype=TRIAL_DTYPES.get(field, np.float64))
+        for field in SUMMARY_FIELDS:
+            if not field.startswith('screen'):
+                arrays[f"block_{field}"] = np.asarray([b[field] for b in blocks], dtype=np.float64)
+        for field in ScreenTiming._fields:
+            values = [getattr(screen, field) for screen in self.screens]
+            arrays[f"screen_{field}"] = np.asarray(values, dtype=str if field == 'kind' else TRIAL_DTYPES.get(field, np.float64))
+        np.savez_compressed(filename, **arrays)
+
+
+TRIAL_DTYPES = {'block_number': np.int16, 'is_practice': bool, 'trial_number': np.int32,
+                'intended_isi_frames': np.int16, 'dropped_frames': np.int16, 'intended_frames': np.int16}
+
+SUMMARY_FIELDS = ('trials', 'dropped_frames', 'trials_with_drops', 'isi_error_mean_s', 'isi_error_max_s',
+                  'trigger_latency_mean_s', 'trigger_latency_max_s', 'screens', 'screen_error_max_s')
+
+
+def summarize(trials, screens=()):
+    """
+    Summarizes lists of TrialTiming and ScreenTiming records.
+
+    Returns:
+        dict: Keys in SUMMARY_FIELDS. isi_error_max_s and screen_error_max_s are the
+            largest absolute errors; latencies ignore trials without a trigger time.
+            Means and maxima are NaN if there is nothing to summarize.
+    """
+    summary = dict.fromkeys(SUMMARY_FIELDS, math.nan)
+    summary.update(trials=len(trials), dropped_frames=0, trials_with_drops=0, screens=len(screens))
+    if screens:
+        summary['screen_error_max_s'] = float(max(abs(screen.error_s) for screen in screens))
+    if not trials:
+        return summary
+    dropped = np.array([t.dropped_frames for t in trials])
+    isi_error = np.array([t.isi_error_s for t in trials])
+    latency = np.array([t.trigger_latency_s for t in trials])
+    summary.update(
+        dropped_frames=int(dropped.sum()),
+        trials_with_drops=int(np.count_nonzero(dropped)),
+        isi_error_mean_s=float(isi_error.mean()),
+        isi_error_max_s=float(np.abs(isi_error).max())
+    )
+    latency = latency[~np.isnan(latency)]
+    if len(latency):
+        summary.update(trigger_latency_mean_s=float(latency.mean()), trigger_latency_max_s=float(latency.max()))
+    return summary
+
+
+class FrameScheduler:
+    """
+    Times screens in whole frames instead of seconds.
+
+    Durations from the settings are converted to frame counts of the measured
+    frame period (frames()). A screen whose flip returned start_flip and that
+    should last n frames ends with the flip on the vsync at start_flip + n frame
+    periods: hold() returns flip_lead seconds before that vsync, so the caller can
+    draw the next screen and its flip lands on the intended frame. Every deadline
+    is on the frame grid of the screen's own flip, so the partial frame left over
+    after a fixed-time wait is no longer added to the duration.
+
+    Waiting is hybrid: the scheduler sleeps while the wake-up time is more than
+    spin_margin away and busy-waits only for the last spin_margin, which keeps
+    the CPU mostly idle. While holding a screen it can also poll for input.
+    """
+    def __init__(self, frame_period, clock=core.getTime, flip_lead=0.004, spin_margin=0.002, poll_interval=0.001):
+        self.frame_period = frame_period
+        self.clock = clock
+        self.flip_lead = flip_lead
+        self.spin_margin = spin_margin
+        self.poll_interval = poll_interval
+
+    def frames(self, duration):
+        """Converts a duration (s) into the nearest whole number of frames (at least 1)."""
+        return max(1, int(round(duration / self.frame_period)))
+
+    def describe(self, name, duration):
+        """Logs how a duration from the settings is shown at the measured refresh rate."""
+        n_frames = self.frames(duration)
+        print(f"{name}: {n_frames} frames = {n_frames * self.frame_period * 1000:.1f} ms (setting: {duration * 1000:.1f} ms)")
+
+    def hold(self, start_flip, n_frames):
+        """
+        Waits until the flip that ends a screen shown at start_flip for n_frames frames is due.
+
+        Args:
+            start_flip (float): Return value of the flip that showed the screen.
+            n_frames (int): Number of frames the screen stays up.
+
+        Returns:
+            float: Time of the vsync the next flip is intended for.
+        """
+        for _ in self.polling(start_flip, n_frames, poll_interval=0):
+            pass
+        return start_flip + n_frames * self.frame_period
+
+    def polling(self, start_flip, n_frames, poll_interval=None):
+        """
+        Same wait as hold(), as a loop the caller can poll input in:
+        yields right away and then every poll_interval seconds (default:
+        self.poll_interval; 0 sleeps through) until the flip is due.
+        """
+        if poll_interval is None:
+            poll_interval = self.poll_interval
+        wake = start_flip + n_frames * self.frame_period - self.flip_lead
+        while True:
+            yield
+            remaining = wake - self.clock()
+            if remaining <= 0:
+                return
+            if remaining > self.spin_margin:
+                sleep = remaining - self.spin_margin
+                if poll_interval:
+                    sleep = min(sleep, poll_interval)
+                core.wait(sleep, hogCPUperiod=0)
+            else:
+                core.wait(remaining, hogCPUperiod=remaining)
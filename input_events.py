@@ -0,0 +1,112 @@
+import time
+from collections import namedtuple
+from psychopy import core
+
+# Riponda key bytes of the four buttons (press events), mapped to button numbers
+BUTTON_NUMBER_MAP = {
+    48: '1',  # Button 1 Press
+    112: '2', # Button 2 Press
+    176: '3', # Button 3 Press
+    240: '4'  # Button 4 Press
+}
+
+# A single input event. 'name' is the key name (keyboard) or the mapped button
+# name (response box), 'time' is on the PsychoPy clock, 'source' is 'keyboard' or 'riponda'.
+InputEvent = namedtuple('InputEvent', ['name', 'time', 'source'])
+
+
+def keyboard_clock_offset(kb):
+    """
+    Returns how far (seconds) the clock of a psychopy Keyboard was last reset
+    from core.monotonicClock. PsychoPy's psychtoolbox backend gives key-down
+    times (tDown) relative to the keyboard's own clock in older releases, which
+    by default is reset when the Keyboard is created: key times are only
+    comparable with stimulus onsets if this is 0.
+    """
+    return kb.clock.getLastResetTime() - core.monotonicClock.getLastResetTime()
+
+
+class InputBus:
+    """
+    Merges keyboard and response box input into one time-ordered event stream.
+
+    Keyboard events carry their psychtoolbox key-down time and response box
+    events their packet arrival time (see response_box.RipondaReader); both are
+    on core.monotonicClock, the clock of core.getTime() and win.flip(), as long
+    as the keyboard was created with clock=core.monotonicClock (see
+    keyboard_clock_offset). Every screen polls input through poll()/wait_for_any(),
+    and the cost of each poll is recorded in poll_stats.
+    """
+    def __init__(self, kb, riponda_reader=None, riponda_byte_map=None, clock=core.getTime, poll_interval=0.0005):
+        self.kb = kb
+        self.riponda_reader = riponda_reader
+        self.riponda_byte_map = riponda_byte_map if riponda_byte_map is not None else BUTTON_NUMBER_MAP
+        self.clock = clock
+        self.poll_interval = poll_interval
+        self.poll_stats = {'polls': 0, 'total_s': 0.0, 'max_s': 0.0}
+
+    def clear(self):
+        """Discards all keyboard and response box input received so far."""
+        self.kb.clearEvents()
+        if self.riponda_reader:
+            self.riponda_reader.clear()
+
+    def poll(self, key_list=None, riponda_map=None):
+        """
+        Returns the events received since the last poll, oldest first.
+
+        Args:
+            key_list (list, optional): Accepted event names. None accepts any key
+                and any mapped response box button.
+            riponda_map (dict, optional): Response box byte -> name map for this
+                call; defaults to the bus's riponda_byte_map. If neither key_list
+                nor riponda_map is given, unmapped response box packets are
+                accepted too and named 'riponda_press'.
+        """
+        poll_start = time.perf_counter()
+        events = []
+
+        for key in self.kb.getKeys(keyList=key_list, waitRelease=False):
+            t_down = getattr(key, 'tDown', None)
+            events.append(InputEvent(key.name, t_down if t_down is not None else self.clock(), 'keyboard'))
+
+        if self.riponda_reader:
+            byte_map = self.riponda_byte_map if riponda_map is None else riponda_map
+            press = self.riponda_reader.get_press()
+            while press:
+                name = byte_map.get(press.byte)
+                if name is None and key_list is None and riponda_map is None:
+                    name = 'riponda_press'
+                if name is not None and (key_list is None or name in key_list):
+                    events.append(InputEvent(name, press.time, 'riponda'))
+                press = self.riponda_reader.get_press()
+
+        if len(events) > 1:
+            events.sort(key=lambda e: e.time)
+
+        poll_duration = time.perf_counter() - poll_start
+        self.poll_stats['polls'] += 1
+        self.poll_stats['total_s'] += poll_duration
+        if poll_duration > self.poll_stats['max_s']:
+            self.poll_stats['max_s'] = poll_duration
+        return events
+
+    def wait_for_any(self, key_list=None, riponda_map=None, timeout=None):
+        """
+        Waits for the next accepted event and returns it (None on timeout).
+        Events arriving in the same poll after the first one are discarded.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            events = self.poll(key_list, riponda_map)
+            if events:
+                return events[0]
+            if deadline is not None and self.clock() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def reset_poll_stats(self):
+        """Returns the polling statistics collected so far and starts new ones."""
+        stats = dict(self.poll_stats)
+        self.poll_stats = {'polls': 0, 'total_s': 0.0, 'max_s': 0.0}
+        return stats
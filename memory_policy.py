@@ -0,0 +1,116 @@
+import gc
+import os
+import time
+
+GC_MODES = ('auto', 'disable', 'freeze')
+
+
+def current_rss():
+    """Returns the resident set size of this process in bytes, or None if it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MemoryPolicy:
+    """
+    Keeps garbage collection pauses out of the blocks and logs memory use per block.
+
+    Modes:
+        'auto': the collector runs whenever Python decides; collect() runs a full
+            collection between blocks (the old behaviour).
+        'disable': the collector is off from start_block() to end_block(); objects
+            are still freed by reference counting, only reference cycles wait for
+            the collection between blocks.
+        'freeze': as 'disable', and after each collection between blocks the
+            surviving objects are moved to the permanent generation (gc.freeze), so
+            later collections do not scan the long-lived objects of the task again.
+
+    Every collection is timed through gc.callbacks, and it is noted whether it ran
+    inside a response window (see response_window()). end_block() logs the
+    block's RSS, generation counts and pauses; collect() logs its own pause.
+    """
+    def __init__(self, mode='freeze'):
+        if mode not in GC_MODES:
+            raise ValueError(f"gc mode must be one of {GC_MODES}, got '{mode}'.")
+        self.mode = mode
+        self.in_response_window = False
+        self.pauses = []
+        self.block_start_rss = None
+        self._pause_start = None
+        self._block_pause_start = 0
+        gc.callbacks.append(self._on_gc)
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._pause_start = time.perf_counter()
+        elif self._pause_start is not None:
+            self.pauses.append((info['generation'], time.perf_counter() - self._pause_start, self.in_response_window))
+            self._pause_start = None
+
+    def start_block(self):
+        """Called before the first trial of a block."""
+        self.block_start_rss = current_rss()
+        self._block_pause_start = len(self.pauses)
+        if self.mode != 'auto':
+            gc.disable()
+
+    def response_window(self, is_open):
+        """Marks the start (True) or end (False) of a trial's response window."""
+        self.in_response_window = is_open
+
+    def end_block(self):
+        """Called after the last trial of a block: re-enables the collector and logs the block's memory use."""
+        self.in_response_window = False
+        if self.mode != 'auto':
+            gc.enable()
+        self.print_block_summary(self.pauses[self._block_pause_start:])
+
+    def collect(self):
+        """Runs a full collection (between blocks). In 'freeze' mode the survivors are frozen afterwards."""
+        if self.mode == 'freeze':
+            gc.unfreeze()
+        collect_start = time.perf_counter()
+        collected = gc.collect()
+        duration_ms = (time.perf_counter() - collect_start) * 1000
+        if self.mode == 'freeze':
+            gc.freeze()
+        print(f"Garbage collection between blocks: {collected} objects in {duration_ms:.3f} ms")
+
+    def close(self):
+        """Restores the collector to its normal state and removes the pause timer."""
+        if self.mode == 'freeze':
+            gc.unfreeze()
+        gc.enable()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+    def print_block_summary(self, block_pauses):
+        """Logs the RSS, the generation counts and the collection pauses of the block that just ended."""
+        rss = current_rss()
+        durations_ms = [duration * 1000 for _, duration, _ in block_pauses]
+        by_generation = [sum(1 for generation, _, _ in block_pauses if generation == g) for g in range(3)]
+        in_window = sum(1 for _, _, was_in_window in block_pauses if was_in_window)
+
+        if rss is None:
+            rss_text = "RSS n/a"
+        elif self.block_start_rss is None:
+            rss_text = f"RSS {rss / 2**20:.1f} MB"
+        else:
+            rss_text = f"RSS {rss / 2**20:.1f} MB ({(rss - self.block_start_rss) / 2**20:+.1f} MB in block)"
+        message = f"Memory ({self.mode}): {rss_text}, gc counts {gc.get_count()}"
+        if self.mode == 'freeze':
+            message += f", {gc.get_freeze_count()} frozen objects"
+        if durations_ms:
+            message += (f"; {len(durations_ms)} collections during the block (gen0/1/2: {by_generation[0]}/{by_generation[1]}/{by_generation[2]}), "
+                        f"pauses total {sum(durations_ms):.3f} ms, max {max(durations_ms):.3f} ms, {in_window} in response windows")
+        else:
+            message += "; no collections during the block"
+        print(message)
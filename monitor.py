@@ -0,0 +1,288 @@
+######################################################################################################
+
+# Live experimenter monitor
+#
+# Follows the output files of running sessions and serves a page on localhost with the
+# per-block RT, accuracy, L-H learning and no-go errors, and the triggers sent so far.
+# It runs as its own process and only reads files, so it adds no load to the task.
+#
+# Usage (from the repository folder, in a second terminal):
+#   python monitor.py                       (then open http://localhost:8765)
+#   python monitor.py --data-folder data --port 8765
+
+######################################################################################################
+
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from block_stats import BlockStats
+from trial_record import BlockInfo, TrialRecord
+
+DATA_SUFFIX = '_data.csv'
+TRIGGER_LINE = re.compile(r'Trigger sent: (\d+)')
+
+
+class FileFollower:
+    """
+    Reads a growing text file incrementally: each call returns only the complete
+    lines appended since the previous call. If the file got shorter (it was
+    truncated or replaced), reading starts over from the beginning.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+
+    def read_lines(self):
+        """
+        Returns:
+            tuple: (list of new lines, True if the file was read from the start again).
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return [], False
+        restarted = size < self.offset
+        if restarted:
+            self.offset = 0
+        if size == self.offset:
+            return [], restarted
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        # A line the task is still writing is left for the next call
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        return data[:end].decode('utf-8', errors='replace').splitlines(), restarted
+
+
+class SessionMonitor:
+    """
+    Live state of one session, built from its output files:
+    finished blocks from <data>_block_summary.jsonl, the block in progress from
+    the <data>_partial.csv journal and the trigger counts from the console log.
+    """
+    def __init__(self, data_filename):
+        base = data_filename[:-len('.csv')]
+        self.name = os.path.basename(base)
+        self.data_filename = data_filename
+        self.journal_filename = base + '_partial.csv'
+        self.blocks = []
+        self.current_block = None
+        self.triggers = Counter()
+        self.last_update = None
+        self._summary = FileFollower(base + '_block_summary.jsonl')
+        self._journal = FileFollower(self.journal_filename)
+        self._console = FileFollower(base + '_console_log.txt')
+        self._journal_header = None
+        self._block_key = None
+
+    def update(self):
+        lines, _ = self._summary.read_lines()
+        for line in lines:
+            try:
+                self.blocks.append(json.loads(line))
+            except ValueError:
+                pass
+
+        lines, restarted = self._journal.read_lines()
+        if restarted:
+            self._journal_header = None
+            self.current_block = None
+        for row in csv.reader(lines):
+            if self._journal_header is None:
+                self._journal_header = row
+                self.current_block = None
+                continue
+            self._add_journal_row(dict(zip(self._journal_header, row)))
+        # The block in the journal is finished once its summary has been written
+        if self.current_block is not None and self.blocks and self._block_key == _block_key(self.blocks[-1]):
+            self.current_block = None
+
+        lines, _ = self._console.read_lines()
+        for line in lines:
+            match = TRIGGER_LINE.search(line)
+            if match:
+                self.triggers[int(match.group(1))] += 1
+        self.last_update = time.time()
+
+    def _add_journal_row(self, row):
+        try:
+            key = (row['is_practice'] == 'True', int(row['block_number']))
+            if self.current_block is None or key != self._block_key:
+                info = BlockInfo(row['participant'], row['session'], row['sequence_used'], key[1], key[0], int(row['epoch']))
+                self.current_block = BlockStats(info)
+                self._block_key = key
+            self.current_block.add(TrialRecord(
+                self.current_block.block_info, int(row['trial_number']), int(row['trial_in_block_num']),
+                row['trial_type'], row['triplet_type'], int(row['stimulus_position_num']),
+                rt_non_cumulative_s=_to_float(row['rt_non_cumulative_s']), rt_cumulative_s=_to_float(row['rt_cumulative_s']),
+                correct_key_pressed=row['correct_key_pressed'], response_key_pressed=row['response_key_pressed'],
+                correct_response=row['correct_response'] == 'True', is_nogo=row['is_nogo'] == 'True',
+                is_first_response=int(row['is_first_response'])
+            ))
+        except (KeyError, ValueError):
+            pass
+
+    def snapshot(self):
+        """Returns the session state as a JSON-serializable dict."""
+        running = os.path.exists(self.journal_filename)
+        return {
+            'name': self.name,
+            'running': running,
+            'blocks': self.blocks,
+            'current_block': self.current_block.summary() if running and self.current_block else None,
+            'triggers': {str(value): count for value, count in sorted(self.triggers.items())},
+            'trigger_total': sum(self.triggers.values()),
+            'last_update': self.last_update
+        }
+
+
+def _block_key(summary):
+    return (summary.get('is_practice'), summary.get('block_number'))
+
+
+def _to_float(value):
+    return float(value) if value not in ('', 'None', 'NA') else None
+
+
+class Monitor:
+    """Finds the sessions in a data folder (and its subfolders) and keeps a SessionMonitor for each."""
+    def __init__(self, data_folder, min_interval=0.5):
+        self.data_folder = data_folder
+        self.min_interval = min_interval
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+
+    def refresh(self):
+        with self._lock:
+            if time.monotonic() - self._last_refresh < self.min_interval:
+                return
+            pattern = os.path.join(self.data_folder, '**', '*' + DATA_SUFFIX)
+            for data_filename in glob.glob(pattern, recursive=True):
+                if data_filename not in self.sessions:
+                    self.sessions[data_filename] = SessionMonitor(data_filename)
+            for session in self.sessions.values():
+                session.update()
+            self._last_refresh = time.monotonic()
+
+    def snapshot(self, include_finished=True):
+        self.refresh()
+        with self._lock:
+            sessions = [s.snapshot() for s in self.sessions.values()]
+        if not include_finished:
+            sessions = [s for s in sessions if s['running']]
+        # Running sessions first, then by file name (participant, session, start time)
+        sessions.sort(key=lambda s: (not s['running'], s['name']))
+        return {'data_folder': self.data_folder, 'sessions': sessions}
+
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>ASRT monitor</title>
+<style>
+body { font-family: sans-serif; margin: 1.5em; background: #fafafa; }
+h2 { margin-bottom: 0.2em; }
+table { border-collapse: collapse; margin: 0.5em 0 1.5em 0; }
+td, th { border: 1px solid #ccc; padding: 0.2em 0.6em; text-align: right; }
+th { background: #eee; }
+tr.live td { background: #fff7d6; }
+.status { font-size: 0.8em; padding: 0.1em 0.5em; border-radius: 0.5em; }
+.running { background: #c8f0c8; } .finished { background: #ddd; }
+.triggers { font-size: 0.85em; color: #444; }
+</style></head>
+<body>
+<h1>ASRT monitor</h1>
+<label><input type="checkbox" id="finished"> show finished sessions</label>
+<div id="sessions">Loading...</div>
+<script>
+function fmt(value, scale, digits) {
+  return value === null || value === undefined ? '&ndash;' : (value * scale).toFixed(digits);
+}
+function row(b, live) {
+  var t = b.triplet_types || {};
+  var h = t.H || {}, l = t.L || {};
+  return '<tr' + (live ? ' class="live"' : '') + '><td>' + (b.is_practice ? 'P' : '') + b.block_number + (live ? ' (running)' : '') +
+    '</td><td>' + b.epoch + '</td><td>' + b.go_responses + '</td><td>' + fmt(b.feedback_mean_rt_s, 1000, 0) +
+    '</td><td>' + fmt(b.feedback_accuracy_pct, 1, 1) + '</td><td>' + fmt(h.mean_rt_s, 1000, 0) + '</td><td>' + fmt(l.mean_rt_s, 1000, 0) +
+    '</td><td>' + fmt(b.rt_l_minus_h_s, 1000, 1) + '</td><td>' + fmt(b.accuracy_h_minus_l, 100, 1) +
+    '</td><td>' + b.commission_errors + ' / ' + b.nogo_trials + '</td></tr>';
+}
+function render(data) {
+  if (!data.sessions.length) { return 'No sessions in ' + data.data_folder; }
+  return data.sessions.map(function (s) {
+    var rows = s.blocks.map(function (b) { return row(b, false); }).join('');
+    if (s.current_block) { rows += row(s.current_block, true); }
+    var triggers = Object.keys(s.triggers).map(function (k) { return k + ': ' + s.triggers[k]; }).join(', ');
+    return '<h2>' + s.name + ' <span class="status ' + (s.running ? 'running">running' : 'finished">finished') + '</span></h2>' +
+      '<table><tr><th>Block</th><th>Epoch</th><th>Go resp.</th><th>RT (ms)</th><th>Acc. (%)</th><th>H RT</th><th>L RT</th>' +
+      '<th>L&minus;H RT (ms)</th><th>H&minus;L acc. (%)</th><th>No-go errors</th></tr>' + rows + '</table>' +
+      '<div class="triggers">Triggers sent: ' + s.trigger_total + (triggers ? ' (' + triggers + ')' : '') + '</div>';
+  }).join('');
+}
+function update() {
+  var finished = document.getElementById('finished').checked ? 1 : 0;
+  fetch('/api/sessions?finished=' + finished).then(function (r) { return r.json(); }).then(function (data) {
+    document.getElementById('sessions').innerHTML = render(data);
+  }).catch(function () {});
+}
+update();
+setInterval(update, 2000);
+</script>
+</body></html>
+"""
+
+
+def make_handler(monitor):
+    class MonitorHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/' or self.path.startswith('/index'):
+                self._send(PAGE.encode('utf-8'), 'text/html; charset=utf-8')
+            elif self.path.startswith('/api/sessions'):
+                include_finished = 'finished=0' not in self.path
+                body = json.dumps(monitor.snapshot(include_finished)).encode('utf-8')
+                self._send(body, 'application/json')
+            else:
+                self.send_error(404)
+
+        def _send(self, body, content_type):
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MonitorHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a live view of the running ASRT sessions on localhost.")
+    parser.add_argument('--data-folder', default='data', help="Folder with the session files (default: data)")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1, this computer only)")
+    args = parser.parse_args(argv)
+
+    monitor = Monitor(args.data_folder)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(monitor))
+    print(f"Monitoring {os.path.abspath(args.data_folder)} on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
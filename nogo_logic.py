@@ -1,6 +1,97 @@
 import random
 
-def select_nogo_trials_in_block(block_indices, pre_block_trials, num_nogo_p, num_nogo_r):
+
+class NogoSampler:
+    """
+    Draws no-go trial sets uniformly from all valid sets of a block layout.
+
+    A valid set has exactly num_nogo_p pattern ('P') and num_nogo_r random ('R')
+    trials among the eligible trials (trial_in_block_num > 2), and no two of them
+    are consecutive. The sampler counts the valid sets once, with a table over
+    (eligible trial, P still to place, R still to place): a trial is either
+    skipped, or taken when its type still has quota, in which case the next trial
+    is skipped if it is its neighbour. This is the stars-and-bars count of
+    non-adjacent subsets, split by trial type. With the counts, one pass over the
+    trials takes each trial with the probability that a uniformly drawn valid set
+    contains it, so every draw succeeds and feasibility is known exactly (count > 0)
+    before anything is drawn.
+    """
+    def __init__(self, pre_block_trials, num_nogo_p, num_nogo_r):
+        self.eligible = [(i, trial['trial_type']) for i, trial in enumerate(pre_block_trials) if trial['trial_in_block_num'] > 2]
+        self.num_nogo_p = num_nogo_p
+        self.num_nogo_r = num_nogo_r
+
+        available_p = sum(1 for _, trial_type in self.eligible if trial_type == 'P')
+        available_r = sum(1 for _, trial_type in self.eligible if trial_type == 'R')
+        if num_nogo_p < 0 or num_nogo_r < 0:
+            raise ValueError("Number of no-go trials must not be negative.")
+        if num_nogo_p > available_p:
+            raise ValueError(f"Not enough 'P' trials available for no-go selection. Requested: {num_nogo_p}, Available: {available_p}")
+        if num_nogo_r > available_r:
+            raise ValueError(f"Not enough 'R' trials available for no-go selection. Requested: {num_nogo_r}, Available: {available_r}")
+
+        # After taking eligible trial j, the next trial that may be taken
+        n = len(self.eligible)
+        self._next_free = [j + 2 if j + 1 < n and self.eligible[j + 1][0] == self.eligible[j][0] + 1 else j + 1 for j in range(n)]
+
+        # _counts[j][p][r]: valid ways to place p 'P' and r 'R' no-go trials among eligible[j:]
+        empty = [[0] * (num_nogo_r + 1) for _ in range(num_nogo_p + 1)]
+        empty[0][0] = 1
+        self._counts = [None] * (n + 2)
+        self._counts[n] = self._counts[n + 1] = empty
+        for j in range(n - 1, -1, -1):
+            skip = self._counts[j + 1]
+            take = self._counts[self._next_free[j]]
+            is_p = self.eligible[j][1] == 'P'
+            is_r = self.eligible[j][1] == 'R'
+            table = []
+            for p in range(num_nogo_p + 1):
+                row = list(skip[p])
+                if is_p and p > 0:
+                    for r in range(num_nogo_r + 1):
+                        row[r] += take[p - 1][r]
+                elif is_r:
+                    for r in range(1, num_nogo_r + 1):
+                        row[r] += take[p][r - 1]
+                table.append(row)
+            self._counts[j] = table
+
+        self.count = self._counts[0][num_nogo_p][num_nogo_r]
+        if self.count == 0:
+            raise ValueError(f"{num_nogo_p} pattern and {num_nogo_r} random no-go trials cannot be placed without "
+                             f"two of them being consecutive in a block of {len(pre_block_trials)} trials.")
+
+    def sample(self, rng=random):
+        """Returns one valid set of no-go trial indices, sorted."""
+        selected = []
+        p, r = self.num_nogo_p, self.num_nogo_r
+        j = 0
+        while p or r:
+            index, trial_type = self.eligible[j]
+            total = self._counts[j][p][r]
+            if trial_type == 'P' and p > 0:
+                take = self._counts[self._next_free[j]][p - 1][r]
+            elif trial_type == 'R' and r > 0:
+                take = self._counts[self._next_free[j]][p][r - 1]
+            else:
+                take = 0
+            if take and rng.randrange(total) < take:
+                selected.append(index)
+                if trial_type == 'P':
+                    p -= 1
+                else:
+                    r -= 1
+                j = self._next_free[j]
+            else:
+                j += 1
+        return selected
+
+    def sample_blocks(self, num_blocks, rng=random):
+        """Returns one valid set of no-go trial indices for each of num_blocks blocks with this layout."""
+        return [self.sample(rng) for _ in range(num_blocks)]
+
+
+def select_nogo_trials_in_block(block_indices, pre_block_trials, num_nogo_p, num_nogo_r, rng=random):
     """
     Selects indices for no-go trials from a list of pre-block trials,
     ensuring no two no-go trials are consecutive.
@@ -10,49 +101,26 @@ def select_nogo_trials_in_block(block_indices, pre_block_trials, num_nogo_p, num
         pre_block_trials (list): List of dictionaries containing trial type and number.
         num_nogo_p (int): Number of no-go trials required for 'P' (Pattern) trials.
         num_nogo_r (int): Number of no-go trials required for 'R' (Random) trials.
-        
+        rng: Source of randomness (the `random` module or a `random.Random` instance).
+
     Returns:
         list: A sorted list of indices within the block that should be no-go trials.
+
+    Raises:
+        ValueError: If no such selection exists.
+    """
+    return NogoSampler(pre_block_trials, num_nogo_p, num_nogo_r).sample(rng)
+
+
+def select_nogo_trials_for_blocks(pre_block_trials, num_nogo_p, num_nogo_r, num_blocks, rng=random):
+    """
+    Selects the no-go trials of num_blocks blocks that share one layout (e.g. all
+    main blocks of a session) at once; the counting is done only once.
+
+    Returns:
+        list: One sorted list of no-go indices per block.
+
+    Raises:
+        ValueError: If no selection exists.
     """
-    p_indices = [i for i, trial in enumerate(pre_block_trials) if trial['trial_type'] == 'P' and trial['trial_in_block_num'] > 2]
-    r_indices = [i for i, trial in enumerate(pre_block_trials) if trial['trial_type'] == 'R' and trial['trial_in_block_num'] > 2]
-
-    # Validation checks
-    if num_nogo_p > len(p_indices):
-        raise ValueError(f"Not enough 'P' trials available for no-go selection. Requested: {num_nogo_p}, Available: {len(p_indices)}")
-    if num_nogo_r > len(r_indices):
-        raise ValueError(f"Not enough 'R' trials available for no-go selection. Requested: {num_nogo_r}, Available: {len(r_indices)}")
-
-    # Attempt to sample non-consecutive no-go trials
-    attempts = 0
-    while attempts < 1000:
-        try:
-            selected_p = random.sample(p_indices, num_nogo_p)
-            selected_r = random.sample(r_indices, num_nogo_r)
-            temp_nogo_indices = sorted(selected_p + selected_r)
-            
-            # Check for consecutives
-            is_consecutive = any(temp_nogo_indices[i+1] == temp_nogo_indices[i] + 1 for i in range(len(temp_nogo_indices) - 1))
-            if not is_consecutive:
-                return temp_nogo_indices
-        except ValueError:
-            # Should only happen if sampling fails unexpectedly, but good to catch
-            pass
-        attempts += 1
-    
-    # Fallback to general pool if specific type selection fails repeatedly
-    eligible_indices = p_indices + r_indices
-    if num_nogo_p + num_nogo_r > len(eligible_indices):
-        raise ValueError(f"Not enough eligible trials for no-go selection. Requested: {num_nogo_p + num_nogo_r}, Available: {len(eligible_indices)}")
-
-    attempts = 0
-    while attempts < 1000:
-        temp_nogo_indices = sorted(random.sample(eligible_indices, num_nogo_p + num_nogo_r))
-        is_consecutive = any(temp_nogo_indices[i+1] == temp_nogo_indices[i] + 1 for i in range(len(temp_nogo_indices) - 1))
-        if not is_consecutive:
-            return temp_nogo_indices
-        attempts += 1
-    
-    # Final failure if non-consecutive trials cannot be found
-    raise RuntimeError("Could not find a valid non-consecutive no-go trial distribution after all attempts. "
-                       "Try reducing the number of no-go trials per block to avoid this problem.")
\ No newline at end of file
+    return NogoSampler(pre_block_trials, num_nogo_p, num_nogo_r).sample_blocks(num_blocks, rng)
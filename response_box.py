@@ -0,0 +1,94 @@
+import threading
+from collections import deque, namedtuple
+from psychopy import core
+
+RIPONDA_PACKET_SIZE = 6
+RIPONDA_PACKET_HEADER = 0x6b
+
+# A complete 6-byte Riponda packet. 'byte' is the key code (packet[1]),
+# 'time' is the PsychoPy clock time at which the packet arrived.
+RipondaPress = namedtuple('RipondaPress', ['byte', 'time', 'packet'])
+
+
+class RipondaReader:
+    """
+    Drains a Riponda serial port on a dedicated thread.
+
+    Packets are stamped with the PsychoPy clock as soon as they are read and are
+    put into a bounded ring buffer (a deque, whose append/popleft are atomic), so
+    the task reads timestamped presses instead of polling the port itself.
+    """
+    def __init__(self, port, clock=core.getTime, buffer_size=256, read_timeout=0.005):
+        self.port = port
+        self.clock = clock
+        self.dropped_bytes = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._running = True
+
+        self.port.timeout = read_timeout
+        try:
+            self.port.reset_input_buffer()
+        except Exception:
+            pass
+        self._thread = threading.Thread(target=self._read_loop, name='RipondaReader', daemon=True)
+        self._thread.start()
+
+    def get_press(self, byte_map=None):
+        """
+        Returns the oldest buffered packet (whose key byte is in byte_map, if given),
+        discarding non-matching packets in front of it. Returns None if there is none.
+        """
+        while True:
+            try:
+                press = self._buffer.popleft()
+            except IndexError:
+                return None
+            if byte_map is None or press.byte in byte_map:
+                return press
+
+    def clear(self):
+        """Discards all packets received so far."""
+        self._buffer.clear()
+
+    def close(self):
+        """Stops the reader thread and closes the port."""
+        self._running = False
+        self._thread.join(timeout=1.0)
+        try:
+            self.port.close()
+        except Exception:
+            pass
+
+    def _read_loop(self):
+        pending = bytearray()
+        pending_time = 0.0
+        while self._running:
+            try:
+                chunk = self.port.read(1)
+                if not chunk:
+                    continue
+                arrival_time = self.clock()
+                waiting = self.port.in_waiting
+                if waiting:
+                    chunk += self.port.read(waiting)
+            except Exception as e:
+                print(f"Riponda read error: {e}")
+                return
+
+            if not pending:
+                pending_time = arrival_time
+            pending += chunk
+
+            while len(pending) >= RIPONDA_PACKET_SIZE:
+                if pending[0] != RIPONDA_PACKET_HEADER:
+                    # Resynchronise on the next packet header
+                    header_pos = pending.find(RIPONDA_PACKET_HEADER)
+                    skipped = header_pos if header_pos >= 0 else len(pending)
+                    self.dropped_bytes += skipped
+                    del pending[:skipped]
+                    pending_time = arrival_time
+                    continue
+                packet = bytes(pending[:RIPONDA_PACKET_SIZE])
+                del pending[:RIPONDA_PACKET_SIZE]
+                self._buffer.append(RipondaPress(packet[1], pending_time, packet))
+                pending_time = arrival_time
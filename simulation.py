@@ -0,0 +1,507 @@
+######################################################################################################
+
+# Headless simulated-participant mode for asrt.py
+#
+# Runs the unmodified task script without a display, dialog or keyboard: the psychopy
+# modules are replaced by a headless backend with a virtual clock, and the responses
+# come from a simulated participant. Sessions run much faster than real time and
+# produce the same data files as a real session.
+#
+# Usage (from the repository folder):
+#   python simulation.py --participants 1-4 --seed 1
+#   python simulation.py --set Experiment.num_blocks=5 --set Experiment.no_go_trials_enabled=True --set Experiment.num_no_go_trials=4
+
+######################################################################################################
+
+import argparse
+import configparser
+import heapq
+import math
+import os
+import random
+import runpy
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import namedtuple
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ASRT_SCRIPT = os.path.join(REPO_DIR, 'asrt.py')
+
+# Settings applied to every simulated session unless given with --set
+SIMULATION_SETTINGS = {
+    ('Experiment', 'riponda_enabled'): 'False',
+}
+
+# Parameters of the simulated participant (see SimulatedParticipant)
+ParticipantModel = namedtuple('ParticipantModel', [
+    'mean_rt', 'rt_sd', 'rt_tau', 'min_rt', 'learning_gain', 'learning_rate',
+    'error_rate', 'error_learning_gain', 'correction_delay', 'nogo_commission_rate', 'reading_time'
+])
+DEFAULT_MODEL = ParticipantModel(
+    mean_rt=0.36,               # mean of the Gaussian RT component (s)
+    rt_sd=0.035,                # SD of the Gaussian RT component (s)
+    rt_tau=0.04,                # mean of the exponential RT tail (s)
+    min_rt=0.15,                # no response is faster than this (s)
+    learning_gain=0.12,         # RT speed-up (s) per unit of learned predictability above chance
+    learning_rate=1.0,          # weight of each observed triplet in the learned transition counts
+    error_rate=0.06,            # error probability at chance predictability
+    error_learning_gain=0.08,   # error probability drop per unit of learned predictability above chance
+    correction_delay=0.25,      # time from an error to the corrected response (s)
+    nogo_commission_rate=0.2,   # probability of responding on a no-go trial
+    reading_time=0.8            # time spent on an instruction/rating screen before pressing (s)
+)
+
+
+class VirtualClock:
+    """
+    Simulated time in seconds. It only moves when the task waits, flips or polls input.
+
+    Other threads (the trigger reset thread) wait for a time with wait_until. The
+    clock stops at each such deadline on its way, lets the waiting thread run
+    until it waits again (or for handoff_timeout) and only then moves on, so the
+    thread acts at the right virtual time. Only the task thread moves the clock.
+    """
+    def __init__(self, start=100.0, handoff_timeout=0.001):
+        self.now = start
+        self.handoff_timeout = handoff_timeout
+        self._waits = []
+        self._wait_count = 0
+        self._lock = threading.Lock()
+        self._parked = threading.Event()
+        self._stalled_at = None
+
+    def getTime(self):
+        return self.now
+
+    def advance(self, seconds):
+        if seconds > 0:
+            # Always move, even by less than the float resolution of now
+            self.advance_to(max(self.now + seconds, math.nextafter(self.now, math.inf)))
+
+    def advance_to(self, t):
+        if t > self.now:
+            while self._waits and self._waits[0][0] <= t:
+                with self._lock:
+                    deadline, _, wake = heapq.heappop(self._waits)
+                self.now = max(self.now, deadline)
+                self._parked.clear()
+                wake.set()
+                self._parked.wait(self.handoff_timeout)
+            self.now = t
+
+    def hand_off(self):
+        """Lets a thread the task has just woken (e.g. for a trigger pulse) run until it waits on the clock."""
+        self._parked.clear()
+        self._parked.wait(self.handoff_timeout)
+
+    def wait_until(self, deadline, stall_timeout=0.05):
+        """
+        Waits (from a thread other than the task's) until the task has moved the
+        clock to deadline. If the task stops moving the clock for stall_timeout
+        real seconds (e.g. while it quits), this and all later waits end at once.
+        """
+        if self.now >= deadline or self.now == self._stalled_at:
+            return
+        wake = threading.Event()
+        with self._lock:
+            self._wait_count += 1
+            heapq.heappush(self._waits, (deadline, self._wait_count, wake))
+        self._parked.set()
+        last_now = self.now
+        while not wake.wait(stall_timeout):
+            if self.now == last_now:
+                self._stalled_at = last_now
+                return
+            last_now = self.now
+
+
+class HeadlessStim:
+    """Any visual stimulus: keeps its parameters as attributes and registers itself with the window when drawn."""
+    def __init__(self, win=None, *args, **kwargs):
+        self.win = win
+        self.name = kwargs.pop('name', '')
+        self.text = kwargs.pop('text', '')
+        self.pos = kwargs.pop('pos', (0, 0))
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def draw(self, win=None):
+        (win or self.win).drawn.append(self)
+
+    def setText(self, text):
+        self.text = text
+
+
+class HeadlessWindow:
+    """A window without a display. flip() waits for the next frame of a refresh_rate Hz display."""
+    def __init__(self, backend, *args, **kwargs):
+        self.backend = backend
+        self.size = kwargs.get('size', [1920, 1080])
+        self.color = kwargs.get('color', 'black')
+        self.mouseVisible = True
+        self.drawn = []
+        self.frame_duration = 1.0 / backend.refresh_rate
+        self.flip_count = 0
+
+    def flip(self, clearBuffer=True):
+        clock = self.backend.clock
+        clock.advance_to((math.floor(clock.now / self.frame_duration) + 1) * self.frame_duration)
+        self.flip_count += 1
+        self.backend.participant.on_flip(clock.now, self.drawn)
+        if clearBuffer:
+            self.drawn = []
+        return clock.now
+
+    def clearBuffer(self):
+        self.drawn = []
+
+    def getActualFrameRate(self, nIdentical=10, nMaxFrames=100, nWarmUpFrames=10, threshold=1):
+        for _ in range(nWarmUpFrames + nIdentical):
+            self.flip()
+        return self.backend.refresh_rate
+
+    def close(self):
+        pass
+
+
+class HeadlessClock:
+    """
+    A PsychoPy clock on the virtual clock, last reset at reset_at: 0 for
+    core.monotonicClock, the creation time for the default clock of a Keyboard
+    (as in PsychoPy, so a keyboard created without clock=core.monotonicClock is
+    caught by the task's keyboard clock check).
+    """
+    def __init__(self, clock, reset_at=0.0):
+        self.clock = clock
+        self.reset_at = reset_at
+
+    def getTime(self, applyZero=True):
+        return self.clock.getTime() - (self.reset_at if applyZero else 0.0)
+
+    def getLastResetTime(self):
+        return self.reset_at
+
+
+KeyPress = namedtuple('KeyPress', ['name', 'tDown', 'rt', 'duration'])
+
+
+class HeadlessKeyboard:
+    """Keyboard that returns the simulated participant's key presses once the virtual time has reached them."""
+    def __init__(self, backend, clock=None, *args, **kwargs):
+        self.backend = backend
+        self.clock = clock or HeadlessClock(backend.clock, reset_at=backend.clock.now)
+
+    def getKeys(self, keyList=None, waitRelease=True, clear=True):
+        clock = self.backend.clock
+        participant = self.backend.participant
+        press = participant.next_press(clock.now, keyList)
+        if press is None:
+            clock.advance(self.backend.poll_step)
+            return []
+        # Outside trials nothing else happens before the next press, so the time can jump
+        # to it; during a trial the time moves in poll steps as with a real keyboard
+        if press.time > clock.now:
+            max_step = self.backend.poll_step if participant.trial_screen else press.time - clock.now
+            clock.advance_to(min(press.time, clock.now + max_step))
+        if press.time > clock.now:
+            return []
+        participant.consume(press)
+        return [KeyPress(press.name, press.time, press.time, None)]
+
+    def clearEvents(self):
+        self.backend.participant.clear(self.backend.clock.now)
+
+
+class HeadlessDialog:
+    """Stands in for gui.DlgFromDict: fills in the session info and is always confirmed."""
+    def __init__(self, backend, dictionary, *args, **kwargs):
+        for key, value in backend.session_info.items():
+            if key in dictionary:
+                dictionary[key] = value
+        for key, value in dictionary.items():
+            if isinstance(value, list):
+                dictionary[key] = value[0]
+        self.OK = True
+
+
+class HeadlessBackend:
+    """
+    Builds the psychopy modules used by the task (visual, core, event, gui,
+    hardware.keyboard) on top of a VirtualClock and a simulated participant.
+    """
+    def __init__(self, refresh_rate=60.0, poll_step=0.001):
+        self.clock = VirtualClock()
+        self.refresh_rate = refresh_rate
+        self.poll_step = poll_step
+        self.participant = None
+        self.session_info = {}
+
+    def modules(self):
+        backend = self
+        psychopy = types.ModuleType('psychopy')
+        psychopy.__path__ = []
+
+        visual = types.ModuleType('psychopy.visual')
+        visual.Window = lambda *args, **kwargs: HeadlessWindow(backend, *args, **kwargs)
+        for name in ('TextStim', 'Circle', 'Rect', 'ImageStim', 'ShapeStim', 'Line', 'Polygon'):
+            setattr(visual, name, type(name, (HeadlessStim,), {}))
+
+        core = types.ModuleType('psychopy.core')
+        core.getTime = lambda *args, **kwargs: backend.clock.getTime()
+        core.monotonicClock = HeadlessClock(backend.clock)
+        core.wait = lambda secs, hogCPUperiod=0.2: backend.clock.advance(secs)
+        core.quit = lambda: sys.exit(0)
+
+        event = types.ModuleType('psychopy.event')
+        event.clearEvents = lambda *args, **kwargs: backend.participant.clear(backend.clock.now)
+
+        gui = types.ModuleType('psychopy.gui')
+        gui.DlgFromDict = lambda dictionary, *args, **kwargs: HeadlessDialog(backend, dictionary)
+
+        hardware = types.ModuleType('psychopy.hardware')
+        hardware.__path__ = []
+        keyboard = types.ModuleType('psychopy.hardware.keyboard')
+        keyboard.Keyboard = lambda *args, **kwargs: HeadlessKeyboard(backend, kwargs.get('clock'))
+        hardware.keyboard = keyboard
+
+        psychopy.visual, psychopy.core, psychopy.event, psychopy.gui, psychopy.hardware = visual, core, event, gui, hardware
+        return {'psychopy': psychopy, 'psychopy.visual': visual, 'psychopy.core': core, 'psychopy.event': event,
+                'psychopy.gui': gui, 'psychopy.hardware': hardware, 'psychopy.hardware.keyboard': keyboard}
+
+    def install(self):
+        """Puts the headless modules in sys.modules. Must run before any task module is imported."""
+        sys.modules.update(self.modules())
+        # Trigger pulses are reset on a thread of their own, which has to wait in virtual time
+        import triggers
+        triggers.wait_until = lambda deadline, clock=None, spin_margin=None: self.clock.wait_until(deadline)
+        pulse = triggers.TriggerDispatcher.pulse
+
+        def pulse_and_hand_off(dispatcher, trigger_value):
+            write_time = pulse(dispatcher, trigger_value)
+            if dispatcher.holds_line:
+                self.clock.hand_off()
+            return write_time
+        triggers.TriggerDispatcher.pulse = pulse_and_hand_off
+        # The target images are not decoded: without a display nothing shows them, and Pillow is not needed
+        import experiment_utils
+        experiment_utils.build_target_image_pool = self.build_target_image_pool
+
+    def build_target_image_pool(self, win, positions, target_image_path, nogo_image_path, image_size):
+        """experiment_utils.build_target_image_pool with the image files only named: the same stimuli, undecoded."""
+        visual = sys.modules['psychopy.visual']
+        image_pool = {}
+        for pos_index, pos in enumerate(positions):
+            for is_nogo, path in ((False, target_image_path), (True, nogo_image_path)):
+                image_pool[(pos_index, is_nogo)] = visual.ImageStim(
+                    win=win, image=path, size=image_size, pos=pos, interpolate=True,
+                    name=f"{'nogo' if is_nogo else 'target'}_{pos_index + 1}"
+                )
+        return image_pool
+
+
+Press = namedtuple('Press', ['name', 'time'])
+
+
+class SimulatedParticipant:
+    """
+    Responds to what the task puts on the screen.
+
+    Trial screens (a target image drawn) get responses from an ex-Gaussian RT
+    model. The participant learns online how often each position follows the
+    position two trials back; the more predictable the current target, the faster
+    and more accurate the response (so high-probability triplets become faster
+    than low-probability ones over the session). No-go targets are answered with
+    probability nogo_commission_rate. Any other screen that waits for input gets
+    a key press reading_time after it appeared (space if accepted, otherwise one
+    of the accepted keys at random; never escape).
+    """
+    def __init__(self, keys, model=DEFAULT_MODEL, rng=None):
+        self.keys = keys
+        self.model = model
+        self.rng = rng or random.Random()
+        self.transition_counts = [[1.0] * 4 for _ in range(4)]
+        self.history = []
+        self.pending = []
+        self.screen_onset = 0.0
+        self.trial_screen = False
+        self.stats = {'trials': 0, 'errors': 0, 'commissions': 0, 'screens_answered': 0}
+
+    def predictability(self, pos_index):
+        if len(self.history) < 2:
+            return 0.25
+        counts = self.transition_counts[self.history[-2]]
+        return counts[pos_index] / sum(counts)
+
+    def draw_rt(self, predictability):
+        m = self.model
+        rt = self.rng.gauss(m.mean_rt, m.rt_sd) + self.rng.expovariate(1.0 / m.rt_tau) - m.learning_gain * (predictability - 0.25)
+        return max(rt, m.min_rt)
+
+    def on_flip(self, t, drawn):
+        targets = [s for s in drawn if s.name.startswith(('target_', 'nogo_'))]
+        if not targets:
+            # The circles alone (ISI) keep the current trial; anything else is a new screen
+            if not any(type(s).__name__ == 'Circle' for s in drawn):
+                self.trial_screen = False
+                self.history = []
+            self.screen_onset = t
+            return
+
+        self.trial_screen = True
+        self.screen_onset = t
+        kind, pos_number = targets[0].name.split('_')
+        pos_index = int(pos_number) - 1
+        predictability = self.predictability(pos_index)
+        self.stats['trials'] += 1
+
+        if kind == 'nogo':
+            if self.rng.random() < self.model.nogo_commission_rate:
+                self.stats['commissions'] += 1
+                self.pending.append(Press(self.keys[pos_index], t + self.draw_rt(predictability)))
+        else:
+            response_time = t + self.draw_rt(predictability)
+            error_p = self.model.error_rate - self.model.error_learning_gain * (predictability - 0.25)
+            if self.rng.random() < min(max(error_p, 0.0), 1.0):
+                self.stats['errors'] += 1
+                wrong_key = self.rng.choice([k for i, k in enumerate(self.keys) if i != pos_index])
+                self.pending.append(Press(wrong_key, response_time))
+                response_time += self.model.correction_delay + self.rng.expovariate(1.0 / self.model.rt_tau)
+            self.pending.append(Press(self.keys[pos_index], response_time))
+
+        if len(self.history) >= 2:
+            self.transition_counts[self.history[-2]][pos_index] += self.model.learning_rate
+        self.history.append(pos_index)
+
+    def next_press(self, now, key_list):
+        if not self.pending and not self.trial_screen:
+            self.pending.append(Press(self._screen_key(key_list), max(now, self.screen_onset + self.model.reading_time)))
+            self.stats['screens_answered'] += 1
+        for press in self.pending:
+            if key_list is None or press.name in key_list:
+                return press
+        return None
+
+    def consume(self, press):
+        self.pending.remove(press)
+
+    def clear(self, now):
+        self.pending = [p for p in self.pending if p.time > now]
+
+    def _screen_key(self, key_list):
+        if key_list is None or 'space' in key_list:
+            return 'space'
+        choices = [k for k in key_list if k != 'escape']
+        return self.rng.choice(choices) if choices else 'space'
+
+
+def write_settings(base_settings, overrides, filename):
+    """Writes base_settings with the (section, key) -> value overrides applied to filename."""
+    config = configparser.ConfigParser()
+    if not config.read(base_settings):
+        raise FileNotFoundError(f"Settings file '{base_settings}' not found.")
+    for (section, key), value in overrides.items():
+        if not config.has_section(section):
+            config.add_section(section)
+        config.set(section, key, value)
+    with open(filename, 'w') as f:
+        config.write(f)
+    return config
+
+
+def run_session(backend, participant_id, settings_file, data_folder, model=DEFAULT_MODEL, seed=None, session='1', language='en'):
+    """
+    Runs asrt.py once with a simulated participant.
+
+    Returns:
+        dict: Participant statistics plus 'virtual_s' (session length in task time)
+            and 'wall_s' (how long the simulation took).
+    """
+    config = configparser.ConfigParser()
+    config.read(settings_file)
+    keys = [k.strip() for k in config.get('Experiment', 'response_keys_list').split(',')]
+    participant_seed = None if seed is None else seed * 100003 + int(participant_id)
+
+    # A fresh clock per session, so a seeded session gives the same data whatever ran before it
+    backend.clock = VirtualClock()
+    virtual_start = backend.clock.now
+    backend.participant = SimulatedParticipant(keys, model, random.Random(participant_seed))
+    backend.session_info = {'participant': str(participant_id), 'session': str(session), 'language': language}
+    # The trial schedule uses the global random module
+    random.seed(participant_seed)
+
+    saved_argv, saved_stdout = sys.argv, sys.stdout
+    sys.argv = [ASRT_SCRIPT, '--settings', settings_file, '--data-folder', data_folder]
+    wall_start = time.perf_counter()
+    try:
+        runpy.run_path(ASRT_SCRIPT, run_name='__main__')
+    except SystemExit:
+        pass
+    finally:
+        sys.argv, sys.stdout = saved_argv, saved_stdout
+
+    stats = dict(backend.participant.stats)
+    stats['virtual_s'] = backend.clock.now - virtual_start
+    stats['wall_s'] = time.perf_counter() - wall_start
+    return stats
+
+
+def parse_participants(spec):
+    """Parses '1-4,7' into [1, 2, 3, 4, 7]."""
+    participants = []
+    for part in spec.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            participants.extend(range(int(first), int(last) + 1))
+        else:
+            participants.append(int(part))
+    return participants
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run asrt.py headless with simulated participants.")
+    parser.add_argument('--participants', default='1', help="Participant numbers, e.g. 1-4,7 (default: 1)")
+    parser.add_argument('--session', default='1')
+    parser.add_argument('--language', default='en', choices=['es', 'en', 'hu'])
+    parser.add_argument('--settings', default='experiment_settings.ini', help="Base settings file (default: experiment_settings.ini)")
+    parser.add_argument('--set', action='append', default=[], metavar='SECTION.KEY=VALUE', help="Override a setting, e.g. Experiment.num_blocks=5")
+    parser.add_argument('--data-folder', default=os.path.join('data', 'simulated'), help="Output folder (default: data/simulated)")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for reproducible sessions")
+    for field, default in DEFAULT_MODEL._asdict().items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=float, default=default, help=f"Participant model: {field} (default: {default})")
+    args = parser.parse_args(argv)
+
+    os.chdir(REPO_DIR)
+    overrides = dict(SIMULATION_SETTINGS)
+    for item in args.set:
+        name, _, value = item.partition('=')
+        section, _, key = name.partition('.')
+        if not key:
+            parser.error(f"--set expects SECTION.KEY=VALUE, got '{item}'")
+        overrides[(section, key)] = value
+    model = ParticipantModel(**{field: getattr(args, field) for field in DEFAULT_MODEL._fields})
+
+    backend = HeadlessBackend()
+    backend.install()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        settings_file = os.path.join(tmp_dir, 'simulation_settings.ini')
+        write_settings(args.settings, overrides, settings_file)
+        total_trials = 0
+        total_wall = 0.0
+        for participant_id in parse_participants(args.participants):
+            stats = run_session(backend, participant_id, settings_file, args.data_folder, model, args.seed, args.session, args.language)
+            total_trials += stats['trials']
+            total_wall += stats['wall_s']
+            print(f"Participant {participant_id}: {stats['trials']} trials, {stats['errors']} errors, {stats['commissions']} no-go commissions; "
+                  f"{stats['virtual_s']:.0f} s of task time in {stats['wall_s']:.2f} s "
+                  f"({stats['trials'] / stats['wall_s']:.0f} trials/s, {stats['virtual_s'] / stats['wall_s']:.0f}x real time)")
+    if total_wall > 0:
+        print(f"Total: {total_trials} trials in {total_wall:.2f} s ({total_trials / total_wall:.0f} trials/s). Data in {args.data_folder}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
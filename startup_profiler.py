@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StartupProfiler:
+    """
+    Times the startup phases of a session, from the first line of the script to
+    the first screen the participant sees.
+
+    mark(name) closes the phase that started at the previous mark. Phases that
+    only wait for a person (the participant dialog) are marked with waiting=True:
+    they are reported but not counted in the startup time. Work started in the
+    background (see run_in_background) is reported with its own duration and the
+    time the main thread had to wait for it.
+    """
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.phases = []
+        self._last_mark = self.start
+        self._executor = None
+        self._background = {}
+
+    def mark(self, name, waiting=False):
+        """Ends the current phase and records it under name."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last_mark, waiting))
+        self._last_mark = now
+
+    def run_in_background(self, name, func, *args, **kwargs):
+        """Starts func(*args, **kwargs) on a worker thread; collect the result with result(name)."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='startup')
+
+        # [future, duration of the task, time the main thread waited for it]
+        task = [None, None, None]
+
+        def timed():
+            task_start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                task[1] = time.perf_counter() - task_start
+
+        self._background[name] = task
+        task[0] = self._executor.submit(timed)
+        return task[0]
+
+    def result(self, name):
+        """Waits for a background task and returns its result (exceptions are raised here)."""
+        task = self._background[name]
+        wait_start = time.perf_counter()
+        try:
+            return task[0].result()
+        finally:
+            task[2] = time.perf_counter() - wait_start
+
+    def report(self):
+        """Prints the phases, the background tasks and the total time to the first screen."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        now = time.perf_counter()
+        waiting_total = sum(duration for _, duration, waiting in self.phases if waiting)
+        parts = [f"{name} {duration * 1000:.1f} ms" + (" (waiting)" if waiting else "")
+                 for name, duration, waiting in self.phases]
+        for name, (_, duration, waited) in self._background.items():
+            if duration is not None:
+                parts.append(f"{name} {duration * 1000:.1f} ms in the background"
+                             + (f", {waited * 1000:.1f} ms waited for" if waited is not None else ""))
+        print(f"Startup: {'; '.join(parts)}")
+        print(f"Startup: {(now - self.start - waiting_total) * 1000:.1f} ms to the first screen "
+              f"(without {waiting_total * 1000:.1f} ms of waiting)")
@@ -0,0 +1,266 @@
+import time
+from psychopy import visual
+from config_helpers import get_text_with_newlines
+
+FONT = 'Arial'
+BUTTON_X_POSITIONS = (-300, -100, 100, 300)
+
+# Between-block screens of the [Screens] section
+BLOCK_SCREENS = ('next_practice', 'end_practice', 'next_main', 'end_experiment')
+
+# Label options (with their defaults) of the four rating buttons of each mind-wandering question
+MW_BUTTON_LABELS = {
+    'q1': (('q1_label_1', "Not at all"), ('q1_label_2', ""), ('q1_label_3', ""), ('q1_label_4', "Completely")),
+    'q2_mw': (('q2_mw_label_1', "I was thinking about nothing"), ('q2_mw_label_2', ""), ('q2_mw_label_3', ""),
+              ('q2_mw_label_4', "I was thinking about something in particular")),
+    'q3_mw': (('q3_mw_label_1', "I was completely spontaneous"), ('q3_mw_label_2', ""), ('q3_mw_label_3', ""),
+              ('q3_mw_label_4', "I was completely deliberate")),
+    'q4_mw': (('q4_mw_label_1', "Completely Negative"), ('q4_mw_label_2', ""), ('q4_mw_label_3', ""),
+              ('q4_mw_label_4', "Completely Positive")),
+    'q2_on_task': (('q2_on_task_label_1', "Focus entirely on speed"), ('q2_on_task_label_2', ""), ('q2_on_task_label_3', ""),
+                   ('q2_on_task_label_4', "Focus entirely on accuracy")),
+    'q3_on_task': (('q3_on_task_label_1', "Extremely difficult to concentrate"), ('q3_on_task_label_2', ""), ('q3_on_task_label_3', ""),
+                   ('q3_on_task_label_4', "Extremely easy to concentrate")),
+    'q4_on_task': (('q4_on_task_label_1', "Not at all tiring"), ('q4_on_task_label_2', ""), ('q4_on_task_label_3', ""),
+                   ('q4_on_task_label_4', "Extremely tiring")),
+}
+
+# Probe questions: question key -> (question number, question option, default text)
+MW_PROBE_QUESTIONS = {
+    'q1': (1, 'q1_primary_question', "Q1: To what degree were you focusing on the task?"),
+    'q2_mw': (2, 'q2_mw_question', "To the degree to which you were not focusing on the task, what was the nature of your thoughts?"),
+    'q3_mw': (3, 'q3_mw_question', "Was your mind wandering deliberate or spontaneous?"),
+    'q4_mw': (4, 'q4_mw_question', "What was the affective (emotional) tone of your thoughts?"),
+    'q2_on_task': (2, 'q2_on_task_question', "Did you focus more on speed or accuracy in the previous block?"),
+    'q3_on_task': (3, 'q3_on_task_question', "How difficult was it for you to concentrate on the task in the previous block?"),
+    'q4_on_task': (4, 'q4_on_task_question', "How tiring did you find the task?"),
+}
+
+# Mind-wandering instruction pages in display order: (option in [MW_Probes], example buttons or None)
+MW_INSTRUCTION_PAGES = (
+    ('mw_intro', None),
+    ('mw_q1', 'q1'),
+    ('mw_q2_off_task', 'q2_mw'),
+    ('mw_q3_spontaneous', 'q3_mw'),
+    ('mw_q4_affective', 'q4_mw'),
+    ('mw_on_task_intro', None),
+    ('mw_on_task_follow_up', None),
+    ('mw_final_note', None),
+)
+
+# Comprehension quiz: one question per entry, answered with the buttons of QUIZ_CHOICE_KEYS
+QUIZ_QUESTIONS_DATA = [
+    {'q_key': 'quiz_q1_text', 'a_key': 'quiz_q1_answer', 'c_key': 'quiz_choices_focus'},
+    {'q_key': 'quiz_q2_text', 'a_key': 'quiz_q2_answer', 'c_key': 'quiz_choices_focus'},
+    {'q_key': 'quiz_q3_text', 'a_key': 'quiz_q3_answer', 'c_key': 'quiz_choices_focus'},
+    {'q_key': 'quiz_q4_text', 'a_key': 'quiz_q4_answer', 'c_key': 'quiz_choices_focus'},
+    {'q_key': 'quiz_q5_text', 'a_key': 'quiz_q5_answer', 'c_key': 'quiz_choices_focus'},
+    {'q_key': 'quiz_q6_text', 'a_key': 'quiz_q6_answer', 'c_key': 'quiz_choices_focus'},
+    {'q_key': 'quiz_q7_text', 'a_key': 'quiz_q7_answer', 'c_key': 'quiz_choices_content'},
+    {'q_key': 'quiz_q8_text', 'a_key': 'quiz_q8_answer', 'c_key': 'quiz_choices_spontaneous'},
+    {'q_key': 'quiz_q9_text', 'a_key': 'quiz_q9_answer', 'c_key': 'quiz_choices_tone'},
+]
+QUIZ_CHOICE_KEYS = ('1', '4')
+QUIZ_CHOICE_X_POSITIONS = (-300, 300)
+
+# Quiz screens with one text each: key -> (section, option, default text, colour (None: foreground), height, wrap width)
+QUIZ_TEXT_SCREENS = {
+    'quiz_intro': ('Quiz', 'quiz_intro', "You will now complete a short 9-question comprehension quiz.\n\n(Press SPACE to begin.)",
+                   None, 30, 1200),
+    'quiz_passed': ('Quiz', 'quiz_passed_congrats', "Congratulations, you passed the quiz!\n\n(Press SPACE to continue.)",
+                    'green', 40, 1600),
+    'quiz_retry': ('Quiz', 'quiz_failed_retry', None, 'white', 30, 1600),
+    'quiz_failure': ('Screens', 'quiz_failure_continue',
+                     "Unfortunately, you did not pass the comprehension quiz after 3 attempts.\nThe experiment will now continue.\n\n(Press any key to continue.)",
+                     'red', 30, 1600),
+}
+# Quiz screens whose text depends on the attempt and is set when they are shown (set_text): key -> (colour, height, wrap width)
+QUIZ_ATTEMPT_SCREENS = {
+    'quiz_retry_intro': (None, 30, 1200),
+    'quiz_summary': (None, 22, 1200),
+}
+
+
+def probe_screen_key(question):
+    return f'mw_probe_{question}'
+
+
+def instruction_screen_key(page_option):
+    return f'mw_instructions_{page_option}'
+
+
+def quiz_question_screen_key(question_number):
+    return f'quiz_question_{question_number}'
+
+
+def quiz_feedback_screen_key(is_correct):
+    return 'quiz_feedback_correct' if is_correct else 'quiz_feedback_incorrect'
+
+
+class StimulusRegistry:
+    """
+    Builds the stimuli of the text screens once, after the language file is
+    loaded, so that no text layout or glyph rendering happens while the
+    participant waits between blocks or answers a probe.
+
+    A screen is a list of stimuli drawn in order under one key (draw(key)).
+    Screens with rating buttons also keep the buttons (buttons(key)) as dicts
+    with 'rect', 'number', 'label' and 'rating', as the probe uses them.
+    """
+    def __init__(self, win, fg_color='black'):
+        self.win = win
+        self.fg_color = fg_color
+        self.screens = {}
+        self._buttons = {}
+
+    def add_screen(self, key, stimuli, buttons=None):
+        self.screens[key] = list(stimuli)
+        if buttons is not None:
+            self._buttons[key] = buttons
+            for button in buttons:
+                self.screens[key].extend((button['rect'], button['number'], button['label']))
+
+    def add_text_screen(self, key, text, height=40):
+        """Registers a screen with one centred text."""
+        self.add_screen(key, [self._text(text, height=height)])
+
+    def add_block_screens(self):
+        """Registers the between-block screens (BLOCK_SCREENS)."""
+        for option in BLOCK_SCREENS:
+            self.add_text_screen(option, get_text_with_newlines('Screens', option))
+
+    def add_mw_probe(self):
+        """Registers one screen per mind-wandering probe question (see probe_screen_key)."""
+        for question, (number, option, default) in MW_PROBE_QUESTIONS.items():
+            text = get_text_with_newlines('MW_Probe_Content', option, default=default)
+            if number > 1:
+                text = f"Q{number}: {text}"
+            question_stim = self._text(text, height=40, pos=(0, 200))
+            buttons = self._make_buttons(MW_BUTTON_LABELS[question], y_pos=0, label_offset=100, wrap_width=200)
+            self.add_screen(probe_screen_key(question), [question_stim], buttons)
+
+    def add_mw_instructions(self):
+        """Registers the mind-wandering instruction pages (see instruction_screen_key)."""
+        prompt_text = get_text_with_newlines('Screens', 'prompt_continue', default="(Press any key to continue.)")
+        continue_stim = self._text(prompt_text, height=20, pos=(0, -450), wrap_width=1700)
+        for option, button_labels in MW_INSTRUCTION_PAGES:
+            page_stim = self._text(get_text_with_newlines('MW_Probes', option), height=28, pos=(0, 50))
+            buttons = None
+            if button_labels:
+                buttons = self._make_buttons(MW_BUTTON_LABELS[button_labels], y_pos=-250, label_offset=100, wrap_width=220)
+            self.add_screen(instruction_screen_key(option), [page_stim, continue_stim], buttons)
+
+    def add_quiz(self):
+        """
+        Registers the comprehension quiz: one screen per question with its two
+        answer buttons (see quiz_question_screen_key; 'rating' is the answer
+        key), the correct/incorrect feedback (quiz_feedback_screen_key), the
+        QUIZ_TEXT_SCREENS and the QUIZ_ATTEMPT_SCREENS.
+        """
+        total = len(QUIZ_QUESTIONS_DATA)
+        header_fmt = get_text_with_newlines('Quiz', 'quiz_question_header', default="Question {q_num} of {total}:")
+        for q_num, q_data in enumerate(QUIZ_QUESTIONS_DATA, start=1):
+            header_str = header_fmt.format(q_num=q_num, total=total)
+            question_text = f"{header_str}\n\n{get_text_with_newlines('Quiz', q_data['q_key'])}"
+            question_stim = self._text(question_text, height=35, pos=(0, 200))
+            choices = [c.strip() for c in get_text_with_newlines('Quiz', q_data['c_key']).split(',')]
+            self.add_screen(quiz_question_screen_key(q_num), [question_stim], self._make_quiz_buttons(choices))
+
+        press_key_text = get_text_with_newlines('Quiz', 'quiz_press_key')
+        for is_correct, option, color in ((True, 'quiz_question_feedback_correct', 'green'),
+                                          (False, 'quiz_question_feedback_incorrect', 'red')):
+            feedback_text = get_text_with_newlines('Quiz', option) + press_key_text
+            self.add_screen(quiz_feedback_screen_key(is_correct),
+                            [self._text(feedback_text, height=35, pos=(0, -250), wrap_width=None, color=color)])
+
+        for key, (section, option, default, color, height, wrap_width) in QUIZ_TEXT_SCREENS.items():
+            text = get_text_with_newlines(section, option, default=default)
+            self.add_screen(key, [self._text(text, height=height, wrap_width=wrap_width, color=color)])
+        for key, (color, height, wrap_width) in QUIZ_ATTEMPT_SCREENS.items():
+            self.add_screen(key, [self._text('', height=height, wrap_width=wrap_width, color=color)])
+
+    def set_text(self, key, text):
+        """Sets the text of a one-text screen (e.g. the quiz score); the text is only laid out again if it changed."""
+        stim = self.screens[key][0]
+        if stim.text != text:
+            stim.text = text
+
+    def draw(self, key):
+        """Draws all stimuli of a screen (the caller flips)."""
+        for stim in self.screens[key]:
+            stim.draw()
+
+    def buttons(self, key):
+        """Returns the rating buttons of a screen, all reset to the unselected colour."""
+        buttons = self._buttons[key]
+        for button in buttons:
+            button['rect'].fillColor = 'lightgrey'
+        return buttons
+
+    def warm_up(self, language_pack=None, extra_stimuli=(), heights=(20, 28, 30, 40, 50)):
+        """
+        Draws every registered stimulus and the extra_stimuli (e.g. the circles
+        and images of the trials) once and, if language_pack is given, a
+        stimulus with all characters of the language file (and the digits of the
+        feedback) at each text height of the task, then clears the back buffer
+        without flipping. This fills the font atlas before the first trial.
+        """
+        for stimuli in self.screens.values():
+            for stim in stimuli:
+                stim.draw()
+        for stim in extra_stimuli:
+            stim.draw()
+        if language_pack is not None:
+            characters = set('0123456789.,:%-+ ')
+            for text in language_pack.values():
+                characters.update(text)
+            glyphs = ''.join(sorted(c for c in characters if not c.isspace()))
+            for height in heights:
+                self._text(glyphs, height=height).draw()
+        self.win.clearBuffer()
+
+    @classmethod
+    def build(cls, win, language_pack, fg_color='black', mw_testing_involved=True, run_quiz=False, warm_up=True):
+        """Builds (and unless warm_up is False, warms up) the registry of all text screens of a session."""
+        build_start = time.perf_counter()
+        registry = cls(win, fg_color)
+        registry.add_block_screens()
+        if mw_testing_involved:
+            registry.add_mw_probe()
+            registry.add_mw_instructions()
+            if run_quiz:
+                registry.add_quiz()
+        if warm_up:
+            registry.warm_up(language_pack)
+        num_stimuli = len({id(stim) for stimuli in registry.screens.values() for stim in stimuli})
+        print(f"Stimulus registry: {len(registry.screens)} screens, {num_stimuli} stimuli built in "
+              f"{(time.perf_counter() - build_start) * 1000:.1f} ms")
+        return registry
+
+    def _text(self, text, height, pos=(0, 0), wrap_width=1600, color=None):
+        return visual.TextStim(self.win, text=text, color=color or self.fg_color, height=height, pos=pos,
+                               wrapWidth=wrap_width, font=FONT)
+
+    def _make_buttons(self, labels, y_pos, label_offset, wrap_width):
+        buttons = []
+        for (option, default), x in zip(labels, BUTTON_X_POSITIONS):
+            rating = option[-1]
+            rect = visual.Rect(win=self.win, width=150, height=100, pos=(x, y_pos),
+                               fillColor='lightgrey', lineColor=self.fg_color, lineWidth=3)
+            number_stim = self._text(rating, height=50, pos=(x, y_pos), wrap_width=None, color='black')
+            label_stim = self._text(get_text_with_newlines('MW_Probe_Content', option, default=default), height=20,
+                                    pos=(x, y_pos - label_offset), wrap_width=wrap_width)
+            buttons.append({'rect': rect, 'number': number_stim, 'label': label_stim, 'rating': rating})
+        return buttons
+
+    def _make_quiz_buttons(self, choices):
+        buttons = []
+        for choice, key, x in zip(choices, QUIZ_CHOICE_KEYS, QUIZ_CHOICE_X_POSITIONS):
+            y_pos = -50
+            rect = visual.Rect(win=self.win, width=400, height=150, pos=(x, y_pos),
+                               fillColor='lightgrey', lineColor=self.fg_color, lineWidth=3)
+            key_label = get_text_with_newlines('Quiz', f"quiz_label_key_{key}", default=f"Key {key}")
+            key_stim = self._text(key_label, height=20, pos=(x, y_pos + 50), wrap_width=None, color='black')
+            choice_stim = self._text(choice, height=25, pos=(x, y_pos - 20), wrap_width=380, color='black')
+            buttons.append({'rect': rect, 'number': key_stim, 'label': choice_stim, 'rating': key})
+        return buttons
@@ -0,0 +1,67 @@
+NA_MW_RATING = 'NA'
+
+# Column order of the session data file
+TRIAL_FIELDNAMES = (
+    'participant', 'session', 'block_number', 'trial_number', 'trial_in_block_num', 'trial_type', 'triplet_type',
+    'sequence_used', 'stimulus_position_num', 'rt_non_cumulative_s', 'rt_cumulative_s', 'correct_key_pressed',
+    'response_key_pressed', 'correct_response', 'is_nogo', 'is_practice', 'epoch', 'is_first_response',
+    'mind_wandering_rating_1', 'mind_wandering_rating_2', 'mind_wandering_rating_3', 'mind_wandering_rating_4'
+)
+
+
+class BlockInfo:
+    """
+    The fields shared by all rows of a block, stored once per block.
+
+    The mind-wandering ratings are NA until the probe at the end of the block
+    sets them (set_mw_ratings); every row of the block reads them from here.
+    """
+    __slots__ = ('participant', 'session', 'sequence_used', 'block_number', 'is_practice', 'epoch', 'mw_ratings')
+
+    def __init__(self, participant, session, sequence_used, block_number, is_practice, epoch):
+        self.participant = participant
+        self.session = session
+        self.sequence_used = sequence_used
+        self.block_number = block_number
+        self.is_practice = is_practice
+        self.epoch = epoch
+        self.mw_ratings = (NA_MW_RATING,) * 4
+
+    def set_mw_ratings(self, ratings):
+        """Sets the block's four mind-wandering ratings (one write for all its rows)."""
+        self.mw_ratings = tuple(ratings)
+
+
+class TrialRecord:
+    """
+    One response (or withheld no-go response) of a trial. Only the per-response
+    fields are stored; the rest comes from the BlockInfo the record points to.
+    """
+    __slots__ = ('block', 'trial_number', 'trial_in_block_num', 'trial_type', 'triplet_type', 'stimulus_position_num',
+                 'rt_non_cumulative_s', 'rt_cumulative_s', 'correct_key_pressed', 'response_key_pressed',
+                 'correct_response', 'is_nogo', 'is_first_response')
+
+    def __init__(self, block, trial_number, trial_in_block_num, trial_type, triplet_type, stimulus_position_num,
+                 rt_non_cumulative_s, rt_cumulative_s, correct_key_pressed, response_key_pressed,
+                 correct_response, is_nogo, is_first_response):
+        self.block = block
+        self.trial_number = trial_number
+        self.trial_in_block_num = trial_in_block_num
+        self.trial_type = trial_type
+        self.triplet_type = triplet_type
+        self.stimulus_position_num = stimulus_position_num
+        self.rt_non_cumulative_s = rt_non_cumulative_s
+        self.rt_cumulative_s = rt_cumulative_s
+        self.correct_key_pressed = correct_key_pressed
+        self.response_key_pressed = response_key_pressed
+        self.correct_response = correct_response
+        self.is_nogo = is_nogo
+        self.is_first_response = is_first_response
+
+    def as_row(self):
+        """Returns the values of the record in TRIAL_FIELDNAMES order."""
+        block = self.block
+        return (block.participant, block.session, block.block_number, self.trial_number, self.trial_in_block_num,
+                self.trial_type, self.triplet_type, block.sequence_used, self.stimulus_position_num,
+                self.rt_non_cumulative_s, self.rt_cumulative_s, self.correct_key_pressed, self.response_key_pressed,
+                self.correct_response, self.is_nogo, block.is_practice, block.epoch, self.is_first_response) + block.mw_ratings
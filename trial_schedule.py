@@ -0,0 +1,235 @@
+import random
+import numpy as np
+from nogo_logic import NogoSampler
+
+# --- Schedule record layout ---
+# One row per trial, practice blocks first, in presentation order.
+# Row i is the trial with trial_number == i + 1.
+SCHEDULE_DTYPE = np.dtype([
+    ('trial_number', np.int32),
+    ('block_number', np.int16),
+    ('trial_in_block_num', np.int16),
+    ('epoch', np.int16),
+    ('is_practice', np.bool_),
+    ('trial_type', 'U1'),
+    ('triplet_type', 'U1'),
+    ('stimulus_position_num', np.int8),
+    ('is_nogo', np.bool_),
+    ('trigger', np.uint8),
+])
+
+BLOCKS_PER_EPOCH = 5
+
+
+def get_epoch(block_num):
+    """Returns the epoch (group of five blocks) a main block belongs to."""
+    return ((block_num - 1) // BLOCKS_PER_EPOCH) + 1
+
+
+def get_block_pattern_sequence(pattern_sequence, epoch, interference_epoch_enabled, interference_epoch_num):
+    """
+    Returns the pattern sequence used in a given epoch. During the interference
+    epoch the participant's pattern sequence is reversed.
+    """
+    current_pattern_sequence = list(pattern_sequence)
+    if interference_epoch_enabled and epoch == interference_epoch_num:
+        current_pattern_sequence.reverse()
+    return current_pattern_sequence
+
+
+def classify_triplet(trial_type, trial_in_block_num, target_pos, pos_minus_1, pos_minus_2, current_pattern_sequence):
+    """
+    Classifies a main-block trial as High (H), Low (L), Trill (T), Repetition (R)
+    or first-trials-of-block (X) based on the two preceding positions.
+    """
+    if trial_in_block_num <= 2:
+        return 'X'
+    if trial_type == 'P':
+        return 'H'
+    if pos_minus_2 is None:
+        return 'L'
+
+    cur_idx = current_pattern_sequence.index(target_pos)
+    if pos_minus_2 == current_pattern_sequence[(cur_idx - 1) % len(current_pattern_sequence)]:
+        return 'H'
+    if pos_minus_2 == target_pos:
+        return 'R' if pos_minus_1 == target_pos else 'T'
+    return 'L'
+
+
+def get_trial_trigger(trial_type, triplet_type, target_pos, is_nogo, is_practice=False):
+    """Returns the stimulus onset trigger code of a trial (see documentation/triggers.pdf)."""
+    if is_practice:
+        return (251 if is_nogo else 151) + target_pos
+
+    trigger_offset = 200 if is_nogo else 100
+    if trial_type == 'P' and triplet_type == 'H':
+        return trigger_offset + 1 + target_pos
+    if trial_type == 'R' and triplet_type == 'H':
+        return trigger_offset + 11 + target_pos
+    if triplet_type == 'L':
+        return trigger_offset + 21 + target_pos
+    if triplet_type == 'T':
+        return trigger_offset + 31 + target_pos
+    if triplet_type == 'R':
+        return trigger_offset + 41 + target_pos
+    return trigger_offset + 51 + target_pos
+
+
+def check_schedule_feasibility(pattern_sequence, trials_per_block, num_blocks, num_practice_blocks, no_go_trials_enabled, num_no_go_trials, num_positions=4):
+    """
+    Checks that the settings describe a session that can be built.
+
+    Raises:
+        ValueError: If the settings cannot produce a complete schedule.
+    """
+    if sorted(pattern_sequence) != list(range(1, num_positions + 1)):
+        raise ValueError(f"Pattern sequence {pattern_sequence} is not a permutation of positions 1-{num_positions}.")
+    if trials_per_block < 1 or num_blocks < 0 or num_practice_blocks < 0:
+        raise ValueError("Number of trials and blocks must not be negative (and at least one trial per block).")
+
+    if num_practice_blocks > 0 and trials_per_block % num_positions != 0:
+        raise ValueError(f"Practice blocks need a number of trials divisible by {num_positions} "
+                         f"(positions per stimulus), got {trials_per_block}.")
+
+    num_random_trials = trials_per_block - (trials_per_block // 2)
+    if num_blocks > 0 and num_random_trials % num_positions != 0:
+        raise ValueError(f"Main blocks need a number of random trials divisible by {num_positions} "
+                         f"(positions per stimulus), got {num_random_trials} random trials in {trials_per_block}.")
+
+    if no_go_trials_enabled:
+        if num_no_go_trials < 0:
+            raise ValueError("Number of no-go trials must not be negative.")
+        # Exact check: counts the valid no-go placements of each block layout
+        _nogo_samplers(trials_per_block, num_blocks, num_practice_blocks, num_no_go_trials)
+
+
+def _practice_pre_block_trials(trials_per_block):
+    return [{'trial_in_block_num': t + 1, 'trial_type': 'R'} for t in range(trials_per_block)]
+
+
+def _main_pre_block_trials(trials_per_block):
+    return [{'trial_in_block_num': t + 1, 'trial_type': 'P' if (t + 1) % 2 == 0 else 'R'} for t in range(trials_per_block)]
+
+
+def _nogo_samplers(trials_per_block, num_blocks, num_practice_blocks, num_no_go_trials):
+    """
+    Returns the no-go samplers of the practice and the main block layout (None if
+    there are no such blocks). Main blocks get half of the no-go trials on pattern
+    trials (rounded down) and the rest on random trials.
+
+    Raises:
+        ValueError: If the no-go trials cannot be placed in one of the layouts.
+    """
+    practice_sampler = main_sampler = None
+    try:
+        if num_practice_blocks > 0:
+            practice_sampler = NogoSampler(_practice_pre_block_trials(trials_per_block), 0, num_no_go_trials)
+    except ValueError as e:
+        raise ValueError(f"No-go selection failed in practice blocks: {e}") from e
+    try:
+        if num_blocks > 0:
+            main_sampler = NogoSampler(_main_pre_block_trials(trials_per_block), num_no_go_trials // 2,
+                                       num_no_go_trials - (num_no_go_trials // 2))
+    except ValueError as e:
+        raise ValueError(f"No-go selection failed in main blocks: {e}") from e
+    return practice_sampler, main_sampler
+
+
+def compile_session_schedule(pattern_sequence, trials_per_block, num_blocks, num_practice_blocks=0,
+                             no_go_trials_enabled=False, num_no_go_trials=0,
+                             interference_epoch_enabled=False, interference_epoch_num=1,
+                             num_positions=4, rng=random):
+    """
+    Builds the full trial schedule of a session before the task starts, so
+    that the trial loop only has to index into it.
+
+    Args:
+        pattern_sequence (list): The participant's pattern sequence (e.g. [1, 2, 3, 4]).
+        trials_per_block (int): Number of trials in every block.
+        num_blocks (int): Number of main blocks.
+        num_practice_blocks (int): Number of practice blocks (0 if practice is disabled).
+        no_go_trials_enabled (bool): Whether no-go trials are placed in the blocks.
+        num_no_go_trials (int): Number of no-go trials per block.
+        interference_epoch_enabled (bool): Whether the pattern is reversed in an epoch.
+        interference_epoch_num (int): The epoch in which the pattern is reversed.
+        num_positions (int): Number of stimulus positions.
+        rng: Source of randomness (the `random` module or a `random.Random` instance).
+
+    Returns:
+        numpy.ndarray: Structured array with SCHEDULE_DTYPE, one row per trial.
+
+    Raises:
+        ValueError: If the settings cannot produce a complete schedule.
+    """
+    check_schedule_feasibility(pattern_sequence, trials_per_block, num_blocks, num_practice_blocks,
+                               no_go_trials_enabled, num_no_go_trials, num_positions)
+
+    schedule = np.zeros((num_practice_blocks + num_blocks) * trials_per_block, dtype=SCHEDULE_DTYPE)
+    row = 0
+
+    # No-go trials of all blocks, drawn uniformly from the valid placements
+    practice_nogo = [set() for _ in range(num_practice_blocks)]
+    main_nogo = [set() for _ in range(num_blocks)]
+    if no_go_trials_enabled:
+        practice_sampler, main_sampler = _nogo_samplers(trials_per_block, num_blocks, num_practice_blocks, num_no_go_trials)
+        if practice_sampler:
+            practice_nogo = [set(indices) for indices in practice_sampler.sample_blocks(num_practice_blocks, rng)]
+        if main_sampler:
+            main_nogo = [set(indices) for indices in main_sampler.sample_blocks(num_blocks, rng)]
+
+    # --- Practice blocks: random positions only ---
+    for practice_block_num in range(1, num_practice_blocks + 1):
+        nogo_indices = practice_nogo[practice_block_num - 1]
+
+        practice_positions_list = []
+        positions_per_stim = trials_per_block // num_positions
+        for pos_num in range(1, num_positions + 1):
+            practice_positions_list.extend([pos_num] * positions_per_stim)
+        rng.shuffle(practice_positions_list)
+
+        for trial_in_block in range(trials_per_block):
+            is_nogo = trial_in_block in nogo_indices
+            target_pos = practice_positions_list[trial_in_block]
+            schedule[row] = (row + 1, practice_block_num, trial_in_block + 1, 0, True, 'R', 'X', target_pos, is_nogo,
+                             get_trial_trigger('R', 'X', target_pos, is_nogo, is_practice=True))
+            row += 1
+
+    # --- Main blocks: alternating random (odd) and pattern (even) trials ---
+    for block_num in range(1, num_blocks + 1):
+        epoch = get_epoch(block_num)
+        current_pattern_sequence = get_block_pattern_sequence(pattern_sequence, epoch, interference_epoch_enabled, interference_epoch_num)
+
+        num_random_trials = trials_per_block - (trials_per_block // 2)
+        random_positions_list = []
+        positions_per_stim = num_random_trials // num_positions
+        for pos_num in range(1, num_positions + 1):
+            random_positions_list.extend([pos_num] * positions_per_stim)
+        rng.shuffle(random_positions_list)
+
+        nogo_indices = main_nogo[block_num - 1]
+
+        pattern_index = 0
+        random_list_index = 0
+        pos_minus_1 = None
+        pos_minus_2 = None
+        for trial_in_block in range(trials_per_block):
+            trial_in_block_num = trial_in_block + 1
+            is_nogo = trial_in_block in nogo_indices
+            if trial_in_block_num % 2 == 0:
+                target_pos = current_pattern_sequence[pattern_index]
+                pattern_index = (pattern_index + 1) % len(current_pattern_sequence)
+                trial_type = 'P'
+            else:
+                target_pos = random_positions_list[random_list_index]
+                random_list_index += 1
+                trial_type = 'R'
+
+            triplet_type = classify_triplet(trial_type, trial_in_block_num, target_pos, pos_minus_1, pos_minus_2, current_pattern_sequence)
+            schedule[row] = (row + 1, block_num, trial_in_block_num, epoch, False, trial_type, triplet_type, target_pos, is_nogo,
+                             get_trial_trigger(trial_type, triplet_type, target_pos, is_nogo))
+            pos_minus_2, pos_minus_1 = pos_minus_1, target_pos
+            row += 1
+
+    return schedule
+
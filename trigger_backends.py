@@ -0,0 +1,206 @@
+import socket
+import time
+
+# One preallocated bytes object per trigger code, so a write allocates nothing
+_CODE_BYTES = tuple(bytes([value]) for value in range(256))
+
+
+class TriggerBackend:
+    """
+    Where the trigger codes of a TriggerDispatcher go.
+
+    A backend is opened once (open may block, e.g. on a serial port or a TCP
+    connection, and can run on a startup worker thread), gets every code with
+    write(value, timestamp) and is closed when the task quits. timestamp is the
+    time of the write on the PsychoPy clock.
+
+    holds_line tells the dispatcher whether a code stays on an output line until
+    it is reset to 0 (a parallel or serial trigger line). Backends that send
+    events (a marker stream) or nothing at all get only the codes, no resets.
+
+    This base class is the null backend: codes are only logged by the dispatcher.
+    """
+    name = 'null'
+    holds_line = False
+
+    def open(self):
+        pass
+
+    def write(self, value, timestamp):
+        pass
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return self.name
+
+
+class NullTriggerBackend(TriggerBackend):
+    """Sends nothing. Used when no trigger hardware is connected or the configured backend cannot be opened."""
+
+
+class SerialTriggerBackend(TriggerBackend):
+    """
+    Writes each code as one byte to a serial port (e.g. a USB trigger box),
+    which holds it on its output until the 0 that ends the pulse.
+
+    Every write is a single call with a preallocated byte. With flush=True
+    (the default) the write also waits until the byte has left the driver's
+    buffer, so the logged write time is the time the code reached the line.
+    """
+    name = 'serial'
+    holds_line = True
+
+    def __init__(self, port_name='COM3', baudrate=115200, flush=True):
+        self.port_name = port_name
+        self.baudrate = baudrate
+        self.flush = flush
+        self.port = None
+        self._write = None
+        self._flush = None
+
+    def open(self):
+        """Opens the port and sets its line to 0. pyserial is imported here, on the thread that opens the port."""
+        import serial
+        self.port = serial.Serial(port=self.port_name, baudrate=self.baudrate, timeout=1)
+        self.port.reset_input_buffer()
+        self.port.reset_output_buffer()
+        self._write = self.port.write
+        self._flush = self.port.flush if self.flush else None
+        self.write(0, None)
+
+    def write(self, value, timestamp):
+        self._write(_CODE_BYTES[value])
+        if self._flush:
+            self._flush()
+
+    def close(self):
+        if self.port is not None:
+            self.port.close()
+
+    def describe(self):
+        return f"serial {self.port_name} ({self.baudrate} baud{', flushed' if self.flush else ''})"
+
+
+class FileTriggerBackend(TriggerBackend):
+    """
+    Records every write, resets included, to a CSV file (timestamp_s, value) as
+    it happens, in place of a trigger line. The whole trigger path runs as with
+    a serial port, so it can be tested and timed without hardware.
+    """
+    name = 'file'
+    holds_line = True
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = None
+
+    def open(self):
+        self._file = open(self.filename, 'w', newline='')
+        self._file.write('timestamp_s,value\n')
+
+    def write(self, value, timestamp):
+        self._file.write(f"{timestamp:.6f},{value}\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def describe(self):
+        return f"file {self.filename}"
+
+
+class MarkerStreamBackend(TriggerBackend):
+    """
+    Sends each code to a marker recorder on this computer over UDP (one datagram
+    per code) or TCP (one line per code). A message is one ASCII line:
+
+        seq,value,clock_s,monotonic_ns
+
+    seq counts the codes from 0, clock_s is the write time on the PsychoPy clock
+    and monotonic_ns is time.monotonic_ns() at the send, which the recorder can
+    compare with its own clock. No resets are sent.
+
+    A failing send is reported once and counted; the task goes on.
+    """
+    holds_line = False
+
+    def __init__(self, protocol='udp', host='127.0.0.1', port=5005, connect_timeout=1.0):
+        if protocol not in ('udp', 'tcp'):
+            raise ValueError(f"Unknown marker stream protocol '{protocol}'. Use 'udp' or 'tcp'.")
+        self.name = protocol
+        self.protocol = protocol
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.sent_count = 0
+        self.error_count = 0
+        self._socket = None
+        self._send = None
+
+    def open(self):
+        if self.protocol == 'udp':
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.connect((self.host, self.port))
+        else:
+            self._socket = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._socket.settimeout(None)
+        self._send = self._socket.sendall
+
+    def write(self, value, timestamp):
+        try:
+            self._send(f"{self.sent_count},{value},{timestamp:.6f},{time.monotonic_ns()}\n".encode('ascii'))
+        except OSError as e:
+            if not self.error_count:
+                print(f"Error sending trigger {value} to the marker stream {self.describe()}: {e}")
+            self.error_count += 1
+        self.sent_count += 1
+
+    def close(self):
+        if self.error_count:
+            print(f"Marker stream {self.describe()}: {self.error_count} of {self.sent_count} codes could not be sent")
+        if self._socket is not None:
+            self._socket.close()
+
+    def describe(self):
+        return f"{self.protocol}://{self.host}:{self.port}"
+
+
+TRIGGER_BACKENDS = ('serial', 'null', 'file', 'udp', 'tcp')
+
+
+def create_trigger_backend(name, serial_port='COM3', serial_baudrate=115200, serial_flush=True,
+                           filename=None, marker_host='127.0.0.1', marker_port=5005):
+    """
+    Creates (but does not open) the trigger backend selected in [Triggers] backend.
+
+    Raises:
+        ValueError: If the backend name is unknown or the file backend has no filename.
+    """
+    if name == 'serial':
+        return SerialTriggerBackend(serial_port, serial_baudrate, flush=serial_flush)
+    if name == 'null':
+        return NullTriggerBackend()
+    if name == 'file':
+        if not filename:
+            raise ValueError("The file trigger backend needs a filename.")
+        return FileTriggerBackend(filename)
+    if name in ('udp', 'tcp'):
+        return MarkerStreamBackend(name, marker_host, marker_port)
+    raise ValueError(f"Unknown trigger backend '{name}'. Use one of: {', '.join(TRIGGER_BACKENDS)}.")
+
+
+def open_trigger_backend(backend):
+    """
+    Opens a backend. If it cannot be opened the error is printed and a null
+    backend is returned, so the session runs on with the triggers only logged.
+    """
+    try:
+        backend.open()
+        print(f"Trigger backend: {backend.describe()}")
+        return backend
+    except Exception as e:
+        print(f"Trigger backend {backend.describe()} cannot be opened: {e}. Triggers are only logged.")
+        return NullTriggerBackend()
@@ -0,0 +1,152 @@
+import csv
+import threading
+import time
+from collections import deque
+from psychopy import core
+
+
+def wait_until(deadline, clock=core.getTime, spin_margin=0.002):
+    """
+    Waits until clock() reaches deadline. Sleeps while the deadline is further
+    away than spin_margin and busy-waits for the last stretch, which keeps the
+    CPU mostly idle without relying on the coarse OS sleep resolution.
+    """
+    while True:
+        remaining = deadline - clock()
+        if remaining <= 0:
+            return
+        if remaining > spin_margin:
+            time.sleep(remaining - spin_margin)
+
+
+class TriggerDispatcher:
+    """
+    Sends trigger pulses to a trigger backend (see trigger_backends) without
+    blocking the caller.
+
+    The onset byte is written immediately on the calling thread; the reset to 0
+    after pulse_duration is done by a dedicated thread. A pulse requested while
+    another one is still high is queued and sent after the line has been low for
+    min_gap seconds, so every code stays a separate, complete pulse. Backends
+    without a line to hold (a marker stream, the null backend) and a
+    pulse_duration of 0 (a trigger device that resets its output itself) get
+    only the codes, with one write per trigger.
+    Every write is recorded in write_log as (timestamp, value) on the PsychoPy clock.
+    """
+    def __init__(self, backend, pulse_duration=0.05, min_gap=0.002, clock=core.getTime):
+        self.backend = backend
+        self.holds_line = backend.holds_line and pulse_duration > 0
+        self.pulse_duration = pulse_duration
+        self.min_gap = min_gap
+        self.clock = clock
+        self.write_log = []
+        self.queued_count = 0
+
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._line_high = False
+        self._reset_deadline = 0.0
+        self._closed = False
+        self._backend_closed = False
+        self._thread = threading.Thread(target=self._reset_loop, name='TriggerReset', daemon=True)
+        self._thread.start()
+
+    def pulse(self, trigger_value):
+        """
+        Starts a pulse now, or queues it if the previous pulse is still running.
+
+        Returns:
+            float: When the onset byte was written (PsychoPy clock), or None if the pulse was queued or dropped.
+        """
+        if not self.holds_line:
+            # No line to hold high: one write, nothing to reset
+            if self._closed:
+                return None
+            return self._write(trigger_value)
+        write_time = None
+        with self._cond:
+            if self._closed:
+                return None
+            if self._line_high or self._pending:
+                self._pending.append(trigger_value)
+                self.queued_count += 1
+            else:
+                write_time = self._start_pulse(trigger_value)
+            self._cond.notify()
+        return write_time
+
+    def close(self):
+        """
+        Sends any queued pulses, returns the line to 0, stops the reset thread and
+        closes the backend. If the reset thread has not finished when the join
+        times out, the pulses still queued are dropped, the line is set to 0 and
+        the backend is closed here; the thread writes nothing after that.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=self.pulse_duration * (len(self._pending) + 2) + 1.0)
+        with self._cond:
+            if self._thread.is_alive():
+                print(f"Trigger reset thread still running at close: {len(self._pending)} queued pulses dropped")
+                self._pending.clear()
+                if self._line_high:
+                    self._write(0)
+                    self._line_high = False
+            self._backend_closed = True
+            try:
+                self.backend.close()
+            except Exception as e:
+                print(f"Error closing the trigger backend: {e}")
+
+    def save_write_log(self, filename):
+        """Writes every trigger write (timestamp, value) to a CSV file for auditing pulse widths."""
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['timestamp_s', 'value'])
+            writer.writerows((f"{t:.6f}", v) for t, v in self.write_log)
+
+    def _start_pulse(self, trigger_value):
+        write_time = self._write(trigger_value)
+        self._line_high = True
+        self._reset_deadline = self.clock() + self.pulse_duration
+        return write_time
+
+    def _write(self, value):
+        write_time = self.clock()
+        try:
+            self.backend.write(value, write_time)
+        except Exception as e:
+            print(f"Error writing trigger {value} to {self.backend.describe()}: {e}")
+        self.write_log.append((write_time, value))
+        return write_time
+
+    def _reset_loop(self):
+        while True:
+            with self._cond:
+                while not self._line_high and not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._backend_closed or (not self._line_high and not self._pending):
+                    return
+                line_high = self._line_high
+                deadline = self._reset_deadline
+
+            if line_high:
+                wait_until(deadline, self.clock)
+                with self._cond:
+                    if self._backend_closed:
+                        return
+                    self._write(0)
+                    self._line_high = False
+
+            with self._cond:
+                has_pending = bool(self._pending)
+            if has_pending:
+                wait_until(self.clock() + self.min_gap, self.clock)
+                with self._cond:
+                    if self._backend_closed:
+                        return
+                    if self._pending:
+                        self._start_pulse(self._pending.popleft())